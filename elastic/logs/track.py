@@ -34,7 +34,7 @@ from shared.runners.ilm import create_ilm
 from shared.runners.pipelines import create_pipeline
 from shared.runners.remote_cluster import ConfigureRemoteCluster, FollowIndexRunner
 from shared.runners.slm import create_slm
-from shared.schedulers.indexing import TimestampThrottler
+from shared.schedulers.indexing import PidThrottler, TimestampThrottler
 from shared.schedulers.query import WorkflowScheduler
 from shared.track_processors import data_generator
 from shared.track_processors.track_id_generator import TrackIdGenerator
@@ -68,6 +68,7 @@ def register(registry):
 
     registry.register_scheduler("workflow-scheduler", WorkflowScheduler)
     registry.register_scheduler("timestamp-throttler", TimestampThrottler)
+    registry.register_scheduler("pid-throttler", PidThrottler)
 
     registry.register_param_source("workflow-selector", WorkflowSelectorParamSource)
 
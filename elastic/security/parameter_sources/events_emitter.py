@@ -135,6 +135,7 @@ class EventsEmitterParamSource:
         self.index = params.get("index", None)
         self.bulk_batch_size = params.get("bulk-batch-size", 100)
         self.request_timeout = params.get("request-timeout", None)
+        self.json_codec = params.get("json-codec", "auto")
         self.number_of_alerts = params["number-of-alerts"]
         index_stats = {}
 
@@ -187,4 +188,5 @@ class EventsEmitterParamSource:
         return {
             "doc-batches": doc_batches,
             "request-timeout": self.request_timeout,
+            "json-codec": self.json_codec,
         }
@@ -15,21 +15,23 @@
 # specific language governing permissions and limitations
 # under the License.
 
-import json
 import logging
 
+from shared.utils.codec import AUTO, get_codec
+
 logger = logging.getLogger(__name__)
 
 
 async def emit_events(es, params):
     count = 0
+    codec = get_codec(params.get("json-codec", AUTO))
 
     for batch in params["doc-batches"]:
         bulk = []
 
         for event in batch:
-            bulk.append(json.dumps({"create": {"_index": event.meta["index"]}}))
-            bulk.append(json.dumps(event.doc))
+            bulk.append(codec.encode({"create": {"_index": event.meta["index"]}}))
+            bulk.append(codec.encode(event.doc))
 
         ret = await es.bulk(body="\n".join(bulk), request_timeout=params["request-timeout"])
         errors = [item["create"] for item in ret["items"] if item["create"]["status"] != 201]
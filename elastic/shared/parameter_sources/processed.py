@@ -17,21 +17,44 @@
 import copy
 import logging
 import math
+import os
 import random
 import time
+from array import array
 from datetime import datetime, timezone
 from typing import Tuple
 
 from esrally.track import exceptions
 from esrally.track.params import IndexIdConflict
-from esrally.utils import io
 from shared.parameter_sources import DEFAULT_END_DATE, DEFAULT_START_DATE
 from shared.ts_generators import get_ts_generator
-from shared.utils.corpus import bounds, convert_to_gib
-from shared.utils.file import BulkFileReader, CorpusReader, WrappingSlice
-from shared.utils.time import parse_date_time
+from shared.utils.cache import GeneratedCorpusCache
+from shared.utils.compression import BlockCompressedSource, compression_for_file
+from shared.utils.corpus import VolumeTarget, bounds, convert_to_gib
+from shared.utils.file import (
+    BulkFileReader,
+    CorpusReader,
+    LiveCorpusReader,
+    Prefetcher,
+    SharedMmapSource,
+    SpliceFileReader,
+    SpliceIndex,
+    SpliceSlice,
+    WrappingSlice,
+)
+from shared.utils.time import (
+    MICROS_PER_SECOND,
+    TimestampFormatter,
+    from_epoch_micros,
+    parse_date_time,
+    to_epoch_micros,
+)
 from shared.utils.track import mandatory
 
+# sentinels for the minimum and maximum timestamp before any doc has been processed
+MAX_EPOCH_MICROS = to_epoch_micros(datetime.max.replace(tzinfo=timezone.utc))
+MIN_EPOCH_MICROS = to_epoch_micros(datetime.min.replace(tzinfo=timezone.utc))
+
 
 class MagicNumbers:
     # The following magic markers are used as fixed positions in the json docstring to speed up bulk indexing
@@ -79,6 +102,8 @@ class ProcessedCorpusParamSource:
         self._volume_per_day_gb = convert_to_gib(raw_volume_per_day)
         self.start_time = int(time.perf_counter())
         self._profile = params.get("profile", "fixed_interval")
+        # parameters of the profile, e.g. the histogram of the "replay" profile
+        self._profile_params = params.get("profile-params", track.selected_challenge_or_default.parameters.get("profile-params", {}))
         now = datetime.utcnow().replace(tzinfo=timezone.utc)
 
         def utc_now():
@@ -136,22 +161,98 @@ class ProcessedCorpusParamSource:
             raise exceptions.InvalidSyntax('Mandatory parameter "bulk-size" is missing')
         except ValueError:
             raise exceptions.InvalidSyntax('"bulk-size" must be numeric')
+        try:
+            # the number of bulks which are read and processed ahead in a background thread (0 disables prefetching)
+            self._prefetch_bulks = int(
+                params.get("prefetch-bulks", track.selected_challenge_or_default.parameters.get("prefetch-bulks", 0))
+            )
+            if self._prefetch_bulks < 0:
+                raise exceptions.InvalidSyntax(f'"prefetch-bulks" must not be negative but was {self._prefetch_bulks}')
+        except ValueError:
+            raise exceptions.InvalidSyntax('"prefetch-bulks" must be numeric')
+        # whether to stop after the bulk which reaches the number of docs or exactly at the number of docs or raw bytes
+        self._volume_target_mode = params.get(
+            "volume-target", track.selected_challenge_or_default.parameters.get("volume-target", "approximate")
+        )
+        if self._volume_target_mode not in VolumeTarget.MODES:
+            raise exceptions.InvalidSyntax(
+                f'"volume-target" must be one of [{", ".join(VolumeTarget.MODES)}] but was [{self._volume_target_mode}]'
+            )
         self.corpus = next(
             (c for c in track.corpora if c.meta_data.get("generated", False)),
             None,
         )
+        # docs are generated on the fly from the source corpora instead of being read from the generated corpus
+        self._live = track.selected_challenge_or_default.parameters.get("data-generation-mode", "files") == "live"
         self._reset_timestamps()
         # TODO: Validate this exists and has files
         self.current_docs = 0
+        self.current_size_in_bytes = 0
+        # docs and raw bytes read so far, ahead of those handed out in bulks if bulks are prefetched
+        self._read_docs = 0
+        self._read_size_in_bytes = 0
+        self.bytes_per_client = None
         # Set to 1 to avoid division by zero if percent_completed is called before this parameter has
         # been initialized to its actual value (i.e. before the first call to #params()),
         self.docs_per_client = 1
 
     def _reset_timestamps(self):
-        self.min_timestamp = datetime.max.replace(tzinfo=timezone.utc)
-        self.max_timestamp = datetime.min.replace(tzinfo=timezone.utc)
+        # timestamps are tracked as epoch microseconds, separately for the docs read so far and the docs handed out in
+        # bulks so far as these differ if bulks are prefetched
+        self._min_timestamp = MAX_EPOCH_MICROS
+        self._max_timestamp = MIN_EPOCH_MICROS
+        self._read_min_timestamp = MAX_EPOCH_MICROS
+        self._read_max_timestamp = MIN_EPOCH_MICROS
+        self._timestamps = array("q")
+        self._timestamp_pos = 0
+        self._timestamp_formatter = TimestampFormatter()
         self.event_time_span = 0
 
+    @property
+    def client_index(self):
+        return self._params.get("client_index", 0)
+
+    @property
+    def client_count(self):
+        return self._params.get("client_count", 1)
+
+    @property
+    def min_timestamp(self):
+        return from_epoch_micros(self._min_timestamp)
+
+    @property
+    def max_timestamp(self):
+        return from_epoch_micros(self._max_timestamp)
+
+    def _next_timestamp(self) -> int:
+        """
+        :return: The timestamp for the next doc as epoch microseconds. Timestamps are drawn from the timestamp generator
+                 in batches of the bulk size.
+        """
+        if self._timestamp_pos == len(self._timestamps):
+            self._timestamps = self._ts_generator.next_timestamps(self.bulk_size)
+            self._timestamp_pos = 0
+        timestamp = self._timestamps[self._timestamp_pos]
+        self._timestamp_pos += 1
+        # we assume date order - maybe speed this up for a boolean check on first request?
+        if timestamp < self._read_min_timestamp:
+            self._read_min_timestamp = timestamp
+        self._read_max_timestamp = timestamp
+        return timestamp
+
+    def _read_bulk(self):
+        if self.volume_target.reached(self._read_docs, self._read_size_in_bytes):
+            # only reached if bulks are prefetched as the consumer stops after the last bulk
+            raise StopIteration()
+        bulk_size = self.corpus_reader.bulk_size // 2
+        limited_bulk_size = self.volume_target.batch_size(bulk_size, self._read_docs, self._read_size_in_bytes)
+        if limited_bulk_size < bulk_size:
+            self.corpus_reader.set_bulk_size(limited_bulk_size * 2)
+        num_docs, lines, raw_size_in_bytes = next(self.corpus_reader)
+        self._read_docs += num_docs
+        self._read_size_in_bytes += raw_size_in_bytes
+        return num_docs, lines, raw_size_in_bytes, self._read_min_timestamp, self._read_max_timestamp
+
     def partition(self, partition_index, total_partitions):
         self.logger.info("[%s]/[%s]", partition_index, total_partitions)
         seed = partition_index * self._random_seed if self._random_seed else None
@@ -166,11 +267,7 @@ class ProcessedCorpusParamSource:
         if line_num % 2 == 0:
             return doc, 0
         # adds the timestamp to docs not metadata lines which will be in generated files
-        timestamp = self._ts_generator.next_timestamp()
-        # we assume date order - maybe speed this up for a boolean check on first request?
-        if timestamp < self.min_timestamp:
-            self.min_timestamp = timestamp
-        self.max_timestamp = timestamp
+        timestamp = self._next_timestamp()
 
         # see ProcessedCorpusParamSource for more details
         rallyts_start_pos = int(doc[MagicNumbers.RALLYTS_BEGIN_IDX : MagicNumbers.TS_BEGIN_IDX], 16)
@@ -188,13 +285,7 @@ class ProcessedCorpusParamSource:
                 rallyts_start_pos + MagicNumbers.RALLYTS_FORMAT_BEGIN : rallyts_start_pos + MagicNumbers.RALLYTS_FORMAT_BEGIN + rallyts_len
             ]
 
-            # %s is spuriously supported/implemented, depending on the platform's implementation of strftime. Here we specifically implement handling to mean
-            # timezone-less interpretation of the epoch
-            if ts_format == "%s":
-                # turns out float.__trunc__ is faster than builtins.int(<float>) per microbenchmark
-                formatted_ts = timestamp.timestamp().__trunc__()
-            else:
-                formatted_ts = time.strftime(ts_format, timestamp.timetuple())
+            formatted_ts = self._timestamp_formatter.strftime(ts_format, timestamp)
 
             # replace _RALLYTSNNN<...> with generated timestamp in the right format
             # and omit the "markers" key
@@ -211,14 +302,7 @@ class ProcessedCorpusParamSource:
             ts_value_start_pos = int(doc[MagicNumbers.TS_BEGIN_IDX : MagicNumbers.TS_END_IDX], 16)
             ts_value_end_pos = int(doc[MagicNumbers.TS_END_IDX : MagicNumbers.MSGLEN_BEGIN_IDX], 16)
 
-            formatted_ts = "%04d-%02d-%02dT%02d:%02d:%02d" % (
-                timestamp.year,
-                timestamp.month,
-                timestamp.day,
-                timestamp.hour,
-                timestamp.minute,
-                timestamp.second,
-            )
+            formatted_ts = self._timestamp_formatter.isoformat_seconds(timestamp)
 
             # prevent Elasticsearch achieving unrealistically high compression levels
             # by varying the millisecond suffix in the timestamp with minimal cpu overhead
@@ -235,6 +319,33 @@ class ProcessedCorpusParamSource:
 
         return doc, msgsize
 
+    def _splice_processor(self, source: SpliceSlice, record: int, line_num: int) -> Tuple[bytes, int]:
+        """
+        Equivalent to ``_json_processor`` for generated files with a splice index: the doc is assembled from slices of the
+        memory-mapped file, using the positions in its record, without decoding it.
+        """
+        index = source.index
+        timestamp = self._next_timestamp()
+
+        format_id = index[record + SpliceIndex.FORMAT_ID]
+        if format_id == SpliceIndex.ISO_FORMAT_ID:
+            # see _json_processor()
+            LARGEINT = 123132434 + line_num
+            formatted_ts = f"{self._timestamp_formatter.isoformat_seconds(timestamp)}.{LARGEINT % 1000}Z"
+        else:
+            formatted_ts = self._timestamp_formatter.strftime(source.formats[format_id], timestamp)
+
+        data = source.data
+        doc = b"".join(
+            (
+                data[index[record + SpliceIndex.DOC_START] : index[record + SpliceIndex.SPLICE_START]],
+                formatted_ts.encode("utf-8"),
+                data[index[record + SpliceIndex.SPLICE_END] : index[record + SpliceIndex.TAIL_END]],
+                b"}}",
+            )
+        )
+        return doc, index[record + SpliceIndex.MESSAGE_SIZE]
+
     def create_bulk_corpus_reader(self, corpus, bulk_size, processor, num_clients, client_index):
         readers = []
         for docs in corpus.documents:
@@ -260,9 +371,14 @@ class ProcessedCorpusParamSource:
                     corpus.name,
                     docs.document_file,
                 )
-                # multiple offset and num docs by 2 to account for meta lines
-                source = WrappingSlice(io.MmapSource, offset * 2, num_docs * 2)
-                readers.append(BulkFileReader(docs.document_file, source, processor, corpus.name))
+                if SpliceIndex.exists(docs.document_file):
+                    readers.append(SpliceFileReader(docs.document_file, SpliceSlice(offset, num_docs), self._splice_processor, corpus.name))
+                else:
+                    # block compressed files are decompressed on the fly, uncompressed files are mapped once per process
+                    source_class = BlockCompressedSource if compression_for_file(docs.document_file) else SharedMmapSource
+                    # multiple offset and num docs by 2 to account for meta lines
+                    source = WrappingSlice(source_class, offset * 2, num_docs * 2)
+                    readers.append(BulkFileReader(docs.document_file, source, processor, corpus.name))
             else:
                 self.logger.info(
                     "Task-relative clients at index [%d-%d] skip [%s] (no documents to read).",
@@ -274,9 +390,13 @@ class ProcessedCorpusParamSource:
 
     def _doc_generator(self, num_clients, client_index):
         report_size = self.bulk_size * 10
+        if self._live:
+            self.corpus_reader = LiveCorpusReader(
+                self._live_generator.live_batches(), self._processor, self.lines_per_bulk, self.track.name
+            )
         # if each client needs more than the total number of docs in corpus we might as well have each client loop over
         # all of them
-        if self.docs_per_client > self.total_corpus_docs:
+        elif self.docs_per_client > self.total_corpus_docs:
             self.corpus_reader = self.create_bulk_corpus_reader(
                 self.corpus,
                 self.lines_per_bulk,
@@ -294,22 +414,29 @@ class ProcessedCorpusParamSource:
                 client_index,
             )
         params = self._params.copy()
-        with self.corpus_reader:
+        with self.corpus_reader, Prefetcher(self._read_bulk, self._prefetch_bulks, f"prefetch-client-{client_index}") as bulks:
             while not self._complete:
-                num_docs, lines, raw_size_in_bytes = next(self.corpus_reader)
-                if self.current_docs + num_docs >= self.docs_per_client:
+                # a StopIteration must not escape a generator (PEP 479)
+                bulk = next(bulks, None)
+                if bulk is None:
+                    self.logger.info("Corpus reader exhausted after [%s] docs", self.current_docs)
+                    break
+                num_docs, lines, raw_size_in_bytes, self._min_timestamp, self._max_timestamp = bulk
+                if self.volume_target.reached(self.current_docs + num_docs, self.current_size_in_bytes + raw_size_in_bytes):
                     self._complete = True
-                    self.logger.info("Completed with [%s] docs", self.docs_per_client)
-                    # we deliberately don't trim the last batch to get the exact number of documents. This would break
-                    # encapsulation and this shouldn't be an issue on larger datasets
+                    self.logger.info("Completed with [%s] docs", self.current_docs + num_docs)
+                    # unless the volume target is exact, we deliberately don't trim the last batch to get the exact
+                    # number of documents. This shouldn't be an issue on larger datasets
                 elif self.current_docs > 0 and self.current_docs % report_size == 0:
                     self.logger.debug("[%s] docs indexed", self.current_docs)
                 self.current_docs += num_docs
+                self.current_size_in_bytes += raw_size_in_bytes
                 params["body"] = lines
                 params["unit"] = "docs"
                 params["action-metadata-present"] = True
                 params["bulk-size"] = num_docs
-                self.event_time_span = (self.max_timestamp - self.min_timestamp).total_seconds()
+                # datetimes are only created for the stats of each bulk
+                self.event_time_span = (self._max_timestamp - self._min_timestamp) / MICROS_PER_SECOND
                 relative_time = int(time.perf_counter()) - self.start_time
                 params["param-source-stats"] = {
                     "client": client_index,
@@ -325,27 +452,59 @@ class ProcessedCorpusParamSource:
     def _init_internal_params(self):
         self._client_count = self._params["client_count"]
         self._client_index = self._params["client_index"]
-        self.total_corpus_docs = 0
-        self.total_corpus_bytes = 0
-        for docs in self.corpus.documents:
-            self.total_corpus_docs += docs.number_of_documents
-            self.total_corpus_bytes += docs.message_size
-        self.total_docs_per_day = math.ceil(
-            self.total_corpus_docs * ((self._volume_per_day_gb * 1024 * 1024 * 1024) / self.total_corpus_bytes)
-        )
+        if self._live:
+            self._init_live_params()
+        else:
+            self._use_generated_corpus()
+            self.total_corpus_docs = 0
+            self.total_corpus_bytes = 0
+            for docs in self.corpus.documents:
+                self.total_corpus_docs += docs.number_of_documents
+                self.total_corpus_bytes += docs.message_size
+            self.total_docs_per_day = math.ceil(
+                self.total_corpus_docs * ((self._volume_per_day_gb * 1024 * 1024 * 1024) / self.total_corpus_bytes)
+            )
         self.total_docs = self.total_docs_per_day * self._number_of_days
         if self._client_index == 0:
             self.logger.info(f"Total Docs: [{self.total_docs}]")
             self.logger.info(f"Docs per Day: [{self.total_docs_per_day}]")
         _, self.docs_per_client = bounds(self.total_docs, self._client_index, self._client_count)
-        self._ts_generator = get_ts_generator(self._profile, self.total_docs_per_day, self._start_date, self._client_count)
+        if self._volume_target_mode == "bytes":
+            total_bytes = int(self._volume_per_day_gb * 1024 * 1024 * 1024 * self._number_of_days)
+            _, self.bytes_per_client = bounds(total_bytes, self._client_index, self._client_count)
+        self.volume_target = VolumeTarget(self._volume_target_mode, self.docs_per_client, self.bytes_per_client)
+        self._ts_generator = get_ts_generator(
+            self._profile, self.total_docs_per_day, self._start_date, self._client_count, **self._profile_params
+        )
         self.logger.info(f"Docs for client [{self._client_count}]: [{self.docs_per_client}]")
         self.logger.info(f"Initializing client [{self._client_index}/{self._client_count}]")
         self.doc_generator = self._doc_generator(self._client_count, self._client_index)
 
+    def _use_generated_corpus(self):
+        # generated corpora are below {cache dir}/{track id} and must not be evicted while they are read during the race
+        corpus_folder = os.path.dirname(self.corpus.documents[0].document_file)
+        if os.path.exists(os.path.join(corpus_folder, GeneratedCorpusCache.MANIFEST)):
+            GeneratedCorpusCache(os.path.dirname(corpus_folder)).use(os.path.basename(corpus_folder))
+
+    def _init_live_params(self):
+        # imported here as the data generator depends on this module
+        from shared.track_processors.data_generator import live_generator
+
+        # set by the data generator when the track is prepared
+        track_data_root = self.track.selected_challenge_or_default.parameters.get("track-data-root")
+        if track_data_root is None:
+            raise exceptions.TrackConfigError(
+                'Live data generation requires the parameter "track-data-root" which is set by the data generator track processor'
+            )
+        # each client generates the same docs as the data generation client with the same index
+        self._live_generator = live_generator(self.track, track_data_root, self._client_index, self._client_count)
+        self.total_docs_per_day = self._live_generator.docs_for_volume(self._volume_per_day_gb)
+
     @property
     def percent_completed(self):
         if not self._complete:
+            if self.bytes_per_client:
+                return self.current_size_in_bytes / self.bytes_per_client
             return self.current_docs / self.docs_per_client
         return 1.0
 
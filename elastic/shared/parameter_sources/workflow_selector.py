@@ -36,6 +36,110 @@ from shared.utils.time import (
 from shared.utils.track import mandatory
 
 
+class ActionIndex:
+    """
+    The locations of the operations and query handlers of an action, found in a single pass over the action. Locations
+    are paths of keys and list indices from the root of the action, so that operations and query handler bodies can be
+    accessed directly instead of walking the action again:
+
+    * ``operation_paths`` - paths to every operation, i.e. every object with an ``operation-type``
+    * ``handler_paths`` - paths to the body of every registered query handler, in document order. The last key of a
+      path is the name of the handler. Query handler bodies are not searched for further handlers.
+    """
+
+    def __init__(self, action):
+        self.action = action
+        self.operation_paths = []
+        self.handler_paths = []
+        self._index(action, ())
+
+    def _index(self, value, path):
+        if isinstance(value, dict):
+            if "operation-type" in value:
+                self.operation_paths.append(path)
+            for key, item in value.items():
+                # extend here if we want to support more query types in the future
+                if is_query_handler(key):
+                    self.handler_paths.append(path + (key,))
+                else:
+                    self._index(item, path + (key,))
+        elif isinstance(value, list):
+            for index, item in enumerate(value):
+                self._index(item, path + (index,))
+
+    @staticmethod
+    def get(action, path):
+        for key in path:
+            action = action[key]
+        return action
+
+    def operations(self, operation_type=None):
+        """
+        :param operation_type: If set, only operations of this type are returned.
+        :return: The operations of the action.
+        """
+        operations = (ActionIndex.get(self.action, path) for path in self.operation_paths)
+        return [operation for operation in operations if operation_type is None or operation["operation-type"] == operation_type]
+
+    def query_handlers(self):
+        """
+        :return: A new query handler for every query handler body of the action, in the order of ``handler_paths``.
+        """
+        return [get_query_handler(path[-1], ActionIndex.get(self.action, path)) for path in self.handler_paths]
+
+
+class ActionTemplate:
+    """
+    An action compiled to JSON once, with a hole for the body of every query handler. ``render()`` fills the holes and
+    parses the result, so that every request gets a new action without copying or walking the loaded action and without
+    modifying state shared between requests. Only objects on the paths to query handlers are compiled piecewise, all
+    other values are serialized as a whole.
+    """
+
+    def __init__(self, action_index):
+        self.query_handlers = action_index.query_handlers()
+        self._holes = set(action_index.handler_paths)
+        self._hole_ancestors = {path[:length] for path in action_index.handler_paths for length in range(len(path))}
+        self._parts = []
+        current_part = []
+        self._compile(action_index.action, (), current_part)
+        self._parts.append("".join(current_part))
+
+    def _compile(self, value, path, current_part):
+        if path in self._holes:
+            self._parts.append("".join(current_part))
+            current_part.clear()
+        elif path not in self._hole_ancestors:
+            current_part.append(json.dumps(value))
+        elif isinstance(value, dict):
+            current_part.append("{")
+            for index, (key, item) in enumerate(value.items()):
+                if index > 0:
+                    current_part.append(", ")
+                current_part.append(f"{json.dumps(key)}: ")
+                self._compile(item, path + (key,), current_part)
+            current_part.append("}")
+        else:
+            current_part.append("[")
+            for index, item in enumerate(value):
+                if index > 0:
+                    current_part.append(", ")
+                self._compile(item, path + (index,), current_part)
+            current_part.append("]")
+
+    def render(self, bodies):
+        """
+        :param bodies: The bodies of the holes, in the order of ``query_handlers``.
+        :return: A new action.
+        """
+        parts = self._parts
+        chunks = [parts[0]]
+        for index, body in enumerate(bodies, start=1):
+            chunks.append(json.dumps(body))
+            chunks.append(parts[index])
+        return json.loads("".join(chunks))
+
+
 class WorkflowSelectorParamSource:
 
     _file_sort_numeric_pattern = re.compile("([0-9]+)")
@@ -47,6 +151,7 @@ class WorkflowSelectorParamSource:
         self.infinite = True
         self.workflows = []
         self.workflow_handlers = {}
+        self.workflow_templates = {}
         workflow_folder = os.path.join(track.root, params.get("workflows-folder", "workflows"))
         self.workflow = mandatory(params, "workflow", "composite")
         # prefer the seed passed by partition if more than 1 client
@@ -91,21 +196,23 @@ class WorkflowSelectorParamSource:
                     self.workflow,
                 )
                 self.workflows.append((action_id, action))
+                action_index = ActionIndex(action)
                 if self._detailed_results:
                     # enable detailed results on every query
-                    self.set_detailed_results(action)
+                    self.set_detailed_results(action_index)
                 if self._workflow_target:
                     # override captured query targets with enabled integrations
-                    self.set_target_index(action)
+                    self.set_target_index(action_index)
                 request_params = params.get("request-params", {})
                 WorkflowSelectorParamSource.stringify_bool(request_params)
                 if request_params:
-                    self.set_request_params(action, request_params)
-                query_handlers = self.get_query_handlers(action, queries=[])
-                time_interval = WorkflowSelectorParamSource.get_max_time_interval(query_handlers)
+                    self.set_request_params(action_index, request_params)
+                template = ActionTemplate(action_index)
+                time_interval = WorkflowSelectorParamSource.get_max_time_interval(template.query_handlers)
                 if time_interval and time_interval > self._max_time_interval:
                     self._max_time_interval = time_interval
-                self.workflow_handlers[action_id] = query_handlers
+                self.workflow_templates[action_id] = template
+                self.workflow_handlers[action_id] = template.query_handlers
 
         if len(self.workflows) == 0:
             raise exceptions.TrackConfigError(f"No actions loaded. " f"[{workflow_folder}] contains no " f"action files")
@@ -162,44 +269,23 @@ class WorkflowSelectorParamSource:
             if isinstance(value, bool):
                 request_params[key] = "true" if value else "false"
 
-    def set_target_index(self, action):
-        if isinstance(action, dict):
-            if "operation-type" in action and action["operation-type"] == "search":
-                action["index"] = self._workflow_target
-            else:
-                for key, value in action.items():
-                    self.set_target_index(value)
-        elif isinstance(action, list):
-            for value in action:
-                self.set_target_index(value)
-
-    def set_detailed_results(self, action):
-        if isinstance(action, dict):
-            if "operation-type" in action and action["operation-type"] == "search":
-                action["detailed-results"] = True
-            else:
-                for key, value in action.items():
-                    self.set_detailed_results(value)
-        elif isinstance(action, list):
-            for value in action:
-                self.set_detailed_results(value)
-
-    def set_request_params(self, action, request_params):
-        if isinstance(action, dict):
-            if "operation-type" in action:
-                if "request-params" in action and action["request-params"]:
-                    action["request-params"] = {
-                        **action["request-params"],
-                        **request_params,
-                    }
-                else:
-                    action["request-params"] = request_params
+    def set_target_index(self, action_index):
+        for operation in action_index.operations("search"):
+            operation["index"] = self._workflow_target
+
+    def set_detailed_results(self, action_index):
+        for operation in action_index.operations("search"):
+            operation["detailed-results"] = True
+
+    def set_request_params(self, action_index, request_params):
+        for operation in action_index.operations():
+            if "request-params" in operation and operation["request-params"]:
+                operation["request-params"] = {
+                    **operation["request-params"],
+                    **request_params,
+                }
             else:
-                for _, value in action.items():
-                    self.set_request_params(value, request_params)
-        elif isinstance(action, list):
-            for value in action:
-                self.set_request_params(value, request_params)
+                operation["request-params"] = request_params
 
     @staticmethod
     def get_max_time_interval(query_handlers):
@@ -210,19 +296,6 @@ class WorkflowSelectorParamSource:
                 max_time_interval = interval
         return max_time_interval
 
-    def get_query_handlers(self, action, queries=[]):
-        if isinstance(action, dict):
-            for key, value in action.items():
-                # extend here if we want to support more query types in the future
-                if is_query_handler(key):
-                    queries.append(get_query_handler(key, value))
-                else:
-                    self.get_query_handlers(value, queries=queries)
-        elif isinstance(action, list):
-            for value in action:
-                self.get_query_handlers(value, queries=queries)
-        return queries
-
     # provides a natural sort order for filenames
     def natural_sort_key(self, filename):
         return [int(text) if text.isdigit() else text.lower() for text in self._file_sort_numeric_pattern.split(filename)]
@@ -252,6 +325,7 @@ class WorkflowSelectorParamSource:
             # all dates for the action should be the same
             query_max_date = self._max_date_start + (self._utc_now().replace(tzinfo=timezone.utc) - self._init_date)
 
+        bodies = []
         for query_handler in self.workflow_handlers[action_id]:
             # scale the duration based on the max if set
             duration = None
@@ -271,10 +345,9 @@ class WorkflowSelectorParamSource:
                 )
 
             date_data = DateTimeValues(min_date=self._min_date, max_date=query_max_date, duration=duration)
-            # this modifies these changes by ref - not thread safe
-            query_handler.process(date_data)
-        # always clone the dictionary as we dont' have guarantees of order in rally - deepcopy
-        return deepcopy(action)
+            bodies.append(query_handler.render(date_data))
+        # rendering always returns a new action as we don't have guarantees of order in rally
+        return self.workflow_templates[action_id].render(bodies)
 
     # currently we sequentially consume the workflow's actions until its complete
     def params(self):
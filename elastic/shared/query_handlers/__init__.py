@@ -18,7 +18,9 @@
 from enum import Enum
 
 from esrally import exceptions
+from shared.query_handlers.composite import CompositeHandler
 from shared.query_handlers.date_histogram import DateHistogramHandler
+from shared.query_handlers.date_range import DateRangeHandler
 from shared.query_handlers.range_query import RangeQueryHandler
 
 """
@@ -34,14 +36,16 @@ from shared.query_handlers.range_query import RangeQueryHandler
         "boost": 2.0
     }
     
-    The class implementation is responsible for persisting this dictionary body. It should also implement a "process" 
-    method that should modify the dictionary in place when called. This method takes one argument - the current time. 
-    This is left to the user to decide how this operator should be handled. 
+    The class implementation is responsible for persisting this dictionary body. It should also implement a "render" 
+    method that returns a new body without modifying the persisted one, and a "process" method that modifies the 
+    dictionary in place. Both take one argument - the DateTimeValues of the current request. This is left to the user 
+    to decide how this operator should be handled. 
     The QueryHandler must be registered via the register_handler method.
     
-    Before a query is sent to Elasticsearch, the body is parsed and a check made for each operator to see if has a 
-    QueryHandler implemented via the is_query_handler. If so, an instance is instantiated via the get_query_handler 
-    method. This instance is passed the body and the process method called.
+    When an action is loaded, the body is parsed and a check made for each operator to see if has a QueryHandler 
+    implemented via the is_query_handler. If so, an instance is instantiated via the get_query_handler method and the 
+    operator's body becomes a hole of the action's template (see ActionTemplate). Before the action is sent to 
+    Elasticsearch, the holes are filled with the bodies returned by render.
     
 """
 
@@ -51,6 +55,8 @@ __QUERY_HANDLERS = {}
 class HandlerType(Enum):
     Range = 1
     Date_Histogram = 2
+    Date_Range = 3
+    Composite = 4
 
 
 def register_handler(query_name, handler):
@@ -70,4 +76,6 @@ def is_query_handler(query_name):
 
 register_handler(HandlerType.Range.name.lower(), RangeQueryHandler)
 register_handler(HandlerType.Date_Histogram.name.lower(), DateHistogramHandler)
+register_handler(HandlerType.Date_Range.name.lower(), DateRangeHandler)
+register_handler(HandlerType.Composite.name.lower(), CompositeHandler)
 # register new query handlers here
@@ -0,0 +1,70 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+from datetime import datetime, timezone
+
+from shared.query_handlers.range_query import RangeQueryHandler
+from shared.utils.time import TimeParsingError
+
+
+class CompositeHandler:
+    """
+    Handles composite aggregations with date_histogram sources. Composite aggregations do not have bounds themselves but
+    the after key of a paginated request refers to a bucket of the captured time range, i.e. after the time range of the
+    request has been moved, it would skip all or most buckets. The after key is therefore removed, so that requests
+    fetch the first page of the current time range instead. Like with range queries, this is limited to keys of
+    date_histogram sources in epoch milliseconds, the default, or in strict_date_optional_time or epoch_millis formats.
+    Other composite aggregations are passed through unaffected.
+    """
+
+    def __init__(self, request_body):
+        self.request_body = request_body
+        # formats of the keys of date_histogram sources by source name
+        self.date_sources = {}
+        self.read_sources()
+
+    def read_sources(self):
+        for source in self.request_body.get("sources", []):
+            for name, value_source in source.items():
+                if "date_histogram" in value_source:
+                    self.date_sources[name] = value_source["date_histogram"].get("format", "epoch_millis").split("||")
+
+    @staticmethod
+    def is_date_key(value, formats):
+        try:
+            bound_format = RangeQueryHandler.parse_bound(value, formats, datetime.now(tz=timezone.utc))[1]
+        except (TimeParsingError, TypeError):
+            return False
+        # keys are never relative to now
+        return bound_format[0] != "date_math" and RangeQueryHandler.can_format_bound(bound_format, formats)
+
+    def has_date_after_key(self):
+        after_key = self.request_body.get("after", {})
+        return any(
+            name in after_key and CompositeHandler.is_date_key(after_key[name], formats) for name, formats in self.date_sources.items()
+        )
+
+    def render(self, date_data):
+        if self.has_date_after_key():
+            return {key: value for key, value in self.request_body.items() if key != "after"}
+        return self.request_body
+
+    def process(self, date_data):
+        if self.has_date_after_key():
+            del self.request_body["after"]
+
+    def get_time_interval(self):
+        return None
@@ -50,16 +50,24 @@ class DateHistogramHandler:
                 )
 
     # limited currently to epoch times in extended bounds
-    def process(self, date_data):
+    def render(self, date_data):
+        request_body = dict(self.request_body)
         if self.max_bound and self.min_bound:
             new_min, new_max = date_data.generate_new_bounds(self.min_bound, self.max_bound)
-            self.extended_bounds["max"] = int(new_max.timestamp() * 1000)
-            self.extended_bounds["min"] = int(new_min.timestamp() * 1000)
+            request_body["extended_bounds"] = {
+                **self.extended_bounds,
+                "max": int(new_max.timestamp() * 1000),
+                "min": int(new_min.timestamp() * 1000),
+            }
         # interval customizations are provided on best-effort basis; only if generate_new_bounds was invoked previously
-        if "calendar_interval" in self.request_body and date_data.calendar_interval:
-            self.request_body["calendar_interval"] = date_data.calendar_interval
-        if "fixed_interval" in self.request_body and date_data.fixed_interval:
-            self.request_body["fixed_interval"] = date_data.fixed_interval
+        if "calendar_interval" in request_body and date_data.calendar_interval:
+            request_body["calendar_interval"] = date_data.calendar_interval
+        if "fixed_interval" in request_body and date_data.fixed_interval:
+            request_body["fixed_interval"] = date_data.fixed_interval
+        return request_body
+
+    def process(self, date_data):
+        self.request_body.update(self.render(date_data))
 
     def get_time_interval(self):
         if self.max_bound and self.min_bound:
@@ -0,0 +1,76 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+from datetime import datetime, timezone
+
+from shared.query_handlers.range_query import RangeQueryHandler
+from shared.utils.time import TimeParsingError
+
+
+class DateRangeHandler:
+    def __init__(self, request_body):
+        self.request_body = request_body
+        self.max_bound = None
+        self.min_bound = None
+        # (index of range, key, point in time, format as returned by RangeQueryHandler.parse_bound()) of every bound
+        self.bounds = []
+        self.read_ranges()
+
+    # like range queries, bounds are only moved if they are relative to now or if they use strict_date_optional_time or
+    # epoch_millis formats. Otherwise, e.g. with custom formats, the aggregation is passed through unaffected
+    def read_ranges(self):
+        formats = self.request_body.get("format", "").split("||")
+        self.formats = formats
+        now = datetime.now(tz=timezone.utc)
+        bounds = []
+        for index, date_range in enumerate(self.request_body.get("ranges", [])):
+            for key in ["from", "to"]:
+                if key in date_range:
+                    try:
+                        point, bound_format = RangeQueryHandler.parse_bound(date_range[key], formats, now)
+                    except (TimeParsingError, TypeError):
+                        return
+                    if not RangeQueryHandler.can_format_bound(bound_format, formats):
+                        return
+                    bounds.append((index, key, point, bound_format))
+        self.bounds = bounds
+        if self.bounds:
+            self.min_bound = min(point for _, _, point, _ in self.bounds)
+            self.max_bound = max(point for _, _, point, _ in self.bounds)
+
+    # all bounds are moved so that the latest one is the new max date. With a different duration, the bounds are scaled
+    # proportionally to their distance from the latest one.
+    def render(self, date_data):
+        if not self.bounds:
+            return self.request_body
+        if self.max_bound > self.min_bound:
+            new_min, new_max = date_data.generate_new_bounds(self.min_bound, self.max_bound)
+            scale = (new_max - new_min) / (self.max_bound - self.min_bound)
+        else:
+            new_max = date_data.max_date
+            scale = 1
+        ranges = [dict(date_range) for date_range in self.request_body["ranges"]]
+        for index, key, point, bound_format in self.bounds:
+            ranges[index][key] = RangeQueryHandler.format_bound(new_max - (self.max_bound - point) * scale, bound_format, self.formats)
+        return {**self.request_body, "ranges": ranges}
+
+    def process(self, date_data):
+        self.request_body.update(self.render(date_data))
+
+    def get_time_interval(self):
+        if self.max_bound and self.min_bound and self.max_bound > self.min_bound:
+            return self.max_bound - self.min_bound
+        return None
@@ -14,8 +14,16 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+from datetime import datetime, timezone
+
 from esrally import exceptions
-from shared.utils.time import parse_date_optional_time
+from shared.utils.time import (
+    format_date_optional_time,
+    from_epoch_millis,
+    parse_date_optional_time,
+    parse_relative_date_math,
+    to_epoch_millis,
+)
 
 
 class RangeQueryHandler:
@@ -25,24 +33,45 @@ class RangeQueryHandler:
         self.upper_inclusive = True
         self.lower_bound = None
         self.lower_inclusive = True
+        # how the bounds are represented in the query, see parse_bound()
+        self._lower_format = None
+        self._upper_format = None
+        self._formats = []
         self.read_ranges()
 
     def read_ranges(self):
         fields = list(self.request_body.keys())
         if len(fields) == 1:
-            self.query_range = self.request_body[fields[0]]
-            # we require date queries to use strict_date_optional_time vs trying to figure out the format
-            if "format" in self.query_range and self.query_range["format"] == "strict_date_optional_time":
-                if "gte" in self.query_range:
-                    self.lower_bound = parse_date_optional_time(self.query_range["gte"])
-                elif "gt" in self.query_range:
-                    self.lower_bound = parse_date_optional_time(self.query_range["gt"])
-                    self.lower_inclusive = False
-                if "lte" in self.query_range:
-                    self.upper_bound = parse_date_optional_time(self.query_range["lte"])
-                elif "lt" in self.query_range:
-                    self.upper_bound = parse_date_optional_time(self.query_range["lt"])
-                    self.upper_inclusive = False
+            self.field = fields[0]
+            self.query_range = self.request_body[self.field]
+            lower_key = "gte" if "gte" in self.query_range else "gt"
+            upper_key = "lte" if "lte" in self.query_range else "lt"
+            self.lower_inclusive = lower_key == "gte"
+            self.upper_inclusive = upper_key == "lte"
+            lower = self.query_range.get(lower_key)
+            upper = self.query_range.get(upper_key)
+            formats = self.query_range.get("format", "").split("||")
+            self._formats = formats
+            now = datetime.now(tz=timezone.utc)
+            lower_relative = parse_relative_date_math(lower, now)
+            upper_relative = parse_relative_date_math(upper, now)
+            # relative ranges, e.g. from "now-15m" to "now", are only supported with both bounds relative and a format
+            # which the bounds can be written back in
+            if lower_relative and upper_relative:
+                lower_bound, lower_format = RangeQueryHandler.parse_bound(lower, formats, now)
+                upper_bound, upper_format = RangeQueryHandler.parse_bound(upper, formats, now)
+                if RangeQueryHandler.can_format_bound(lower_format, formats) and RangeQueryHandler.can_format_bound(upper_format, formats):
+                    self.lower_bound, self._lower_format = lower_bound, lower_format
+                    self.upper_bound, self._upper_format = upper_bound, upper_format
+            # ranges with one relative and one absolute bound depend on the time the track is loaded and pass through
+            elif (lower_relative or upper_relative) and lower is not None and upper is not None:
+                pass
+            # we require date queries to use strict_date_optional_time or epoch_millis vs trying to figure out the format
+            elif "strict_date_optional_time" in formats or "epoch_millis" in formats:
+                if lower is not None:
+                    self.lower_bound, self._lower_format = RangeQueryHandler.parse_bound(lower, formats, now)
+                if upper is not None:
+                    self.upper_bound, self._upper_format = RangeQueryHandler.parse_bound(upper, formats, now)
                 if not self.upper_bound or not self.lower_bound:
                     raise exceptions.TrackConfigError(
                         f'Range query for date does not have both "gte" or "gt" ' f'and "lte" or "lt" key - [{self.request_body}]'
@@ -50,13 +79,67 @@ class RangeQueryHandler:
         else:
             raise exceptions.TrackConfigError(f"More than one field in range query [{fields}]")
 
-    # limited currently to date ranges using strict_date_optional_time that have both a gte **and** lte.
-    # If either is missing we error. We let other range types pass through unaffected
-    def process(self, date_data):
+    @staticmethod
+    def parse_bound(value, formats, now):
+        """
+        :return: A tuple of (point: datetime, format) where format is one of ``("epoch_millis", type)`` for epoch
+                 milliseconds as int or string, ``("date_math", rounding)`` for date math relative to ``now`` and
+                 ``("strict_date_optional_time", None)``.
+        """
+        relative = parse_relative_date_math(value, now)
+        if relative:
+            point, rounding = relative
+            return point, ("date_math", rounding)
+        if "epoch_millis" in formats and (isinstance(value, int) or (isinstance(value, str) and value.isdigit())):
+            return from_epoch_millis(int(value)), ("epoch_millis", type(value))
+        return parse_date_optional_time(value), ("strict_date_optional_time", None)
+
+    @staticmethod
+    def can_format_bound(bound_format, formats):
+        """
+        :return: Whether a bound in ``bound_format`` as returned by ``parse_bound()`` is formatted by ``format_bound()`` so
+                 that it can be parsed with ``formats`` again. Relative bounds need the default format of the field if
+                 ``formats`` is empty.
+        """
+        kind, _ = bound_format
+        if kind == "date_math":
+            return formats == [""] or "strict_date_optional_time" in formats or "epoch_millis" in formats
+        return kind in formats
+
+    @staticmethod
+    def format_bound(point, bound_format, formats):
+        """
+        :return: ``point`` in the format of a bound as returned by ``parse_bound()``.
+        """
+        kind, detail = bound_format
+        if kind == "epoch_millis":
+            return detail(to_epoch_millis(point))
+        if kind == "date_math":
+            # relative bounds are replaced by absolute ones, keeping their rounding
+            if "epoch_millis" in formats and "strict_date_optional_time" not in formats:
+                anchor = str(to_epoch_millis(point))
+            else:
+                anchor = format_date_optional_time(point)
+            return f"{anchor}||/{detail}" if detail else anchor
+        return format_date_optional_time(point)
+
+    # limited currently to date ranges using strict_date_optional_time, epoch_millis or date math relative to now that
+    # have both a gte **and** lte. If either is missing we error. We let other range types pass through unaffected
+    def render(self, date_data):
         if self.upper_bound and self.lower_bound:
             new_lower, new_upper = date_data.generate_new_bounds(self.lower_bound, self.upper_bound)
-            self.query_range["gte" if self.lower_inclusive else "gt"] = f"{new_lower.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}Z"
-            self.query_range["lte" if self.upper_inclusive else "lt"] = f"{new_upper.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}Z"
+            query_range = dict(self.query_range)
+            query_range["gte" if self.lower_inclusive else "gt"] = RangeQueryHandler.format_bound(
+                new_lower, self._lower_format, self._formats
+            )
+            query_range["lte" if self.upper_inclusive else "lt"] = RangeQueryHandler.format_bound(
+                new_upper, self._upper_format, self._formats
+            )
+            return {self.field: query_range}
+        return self.request_body
+
+    def process(self, date_data):
+        self.request_body.update(self.render(date_data))
 
     def get_time_interval(self):
         if self.upper_bound and self.lower_bound:
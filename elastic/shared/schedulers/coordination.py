@@ -0,0 +1,118 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+
+class SharedThrottleState:
+    """
+    Throttling state shared by all clients of a task on the same host via a memory-mapped file with one slot per client.
+    Each client publishes the time of its first request and the event time span it has covered so far, and reads the
+    aggregate of all clients so that throttling follows the data timeline of all clients together instead of each
+    client following its own.
+
+    Times of first requests are based on ``time.perf_counter()`` which is system-wide on Linux. The file starts with the
+    id of the current run, a random number which client 0 writes when it starts, and each slot holds the id of the run it
+    has been written in. Slots of other runs, e.g. of a previous or aborted benchmark, and slots which have not been
+    updated for ``timeout`` seconds are ignored.
+    """
+
+    # id of the current run
+    HEADER = struct.Struct("<Q")
+    # time of the first request, event time span, wall clock time of the last update, pid of the client and run id
+    SLOT = struct.Struct("<dddqQ")
+
+    def __init__(self, file_name, client_index, client_count, timeout=30):
+        self.logger = logging.getLogger(__name__)
+        self.file_name = file_name
+        self.client_index = client_index
+        self.timeout = timeout
+        size = SharedThrottleState.HEADER.size + SharedThrottleState.SLOT.size * client_count
+        os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, "a+b") as f:
+            # all clients of a task have the same client count so the file is only ever extended to the same size
+            if os.fstat(f.fileno()).st_size < size:
+                os.ftruncate(f.fileno(), size)
+            self._mm = mmap.mmap(f.fileno(), size)
+        self._client_count = client_count
+        if client_index == 0:
+            # starts a new run; clients which have started before client 0 join it with their next update
+            SharedThrottleState.HEADER.pack_into(self._mm, 0, int.from_bytes(os.urandom(SharedThrottleState.HEADER.size), "little"))
+
+    def _run_id(self):
+        return SharedThrottleState.HEADER.unpack_from(self._mm, 0)[0]
+
+    def _slot_offset(self, client_index):
+        return SharedThrottleState.HEADER.size + client_index * SharedThrottleState.SLOT.size
+
+    @staticmethod
+    def default_file_name(task_name):
+        return os.path.join(tempfile.gettempdir(), f"rally-throttle-{task_name}.state")
+
+    def update(self, start_time, event_time_span):
+        SharedThrottleState.SLOT.pack_into(
+            self._mm, self._slot_offset(self.client_index), start_time, event_time_span, time.time(), os.getpid(), self._run_id()
+        )
+
+    def aggregate(self):
+        """
+        :return: A tuple of the time of the first request of any client and the mean event time span of all clients
+                 which have updated their slot in the current run within the timeout.
+        """
+        now = time.time()
+        run_id = self._run_id()
+        start_times = []
+        event_time_spans = []
+        for client_index in range(self._client_count):
+            start_time, event_time_span, updated, pid, slot_run_id = SharedThrottleState.SLOT.unpack_from(
+                self._mm, self._slot_offset(client_index)
+            )
+            if pid != 0 and slot_run_id == run_id and now - updated <= self.timeout:
+                start_times.append(start_time)
+                event_time_spans.append(event_time_span)
+        return min(start_times), sum(event_time_spans) / len(event_time_spans)
+
+    def close(self):
+        self._mm.close()
+
+
+class ThrottleCoordinator:
+    """
+    Calculates the error of a throttler, i.e. the time since the first request minus the event time span covered so far,
+    across all clients of the task (see ``SharedThrottleState``) if the task parameter ``coordinated`` is set. The state
+    is shared via ``coordination-file`` which defaults to a file per task name in the temp directory.
+    """
+
+    def __init__(self, task):
+        self.coordinated = task.params.get("coordinated", False)
+        self.file_name = task.params.get("coordination-file", SharedThrottleState.default_file_name(task.name))
+        self.timeout = task.params.get("coordination-timeout-secs", 30)
+        self._state = None
+
+    def error(self, now, start_time, parameter_source):
+        if not self.coordinated:
+            return now - start_time - parameter_source.event_time_span
+        if self._state is None:
+            # the parameter source is only injected after the scheduler has been created
+            self._state = SharedThrottleState(self.file_name, parameter_source.client_index, parameter_source.client_count, self.timeout)
+        self._state.update(start_time, parameter_source.event_time_span)
+        global_start_time, event_time_span = self._state.aggregate()
+        return now - global_start_time - event_time_span
@@ -15,8 +15,11 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import json
 import logging
+import weakref
 
+from shared.schedulers.coordination import ThrottleCoordinator
 from shared.utils.track import mandatory
 
 
@@ -28,7 +31,10 @@ class TimestampThrottler:
 
     This works by calculating an error representing the relative time we are ahead or behind the data.
     This is based on the difference between the timespan the data has covered (tracked from the first event to the
-    most recent) and the time that has passed since the first time before_request was called.
+    most recent) and the time that has passed since the first time before_request was called. If the task parameter
+    ``coordinated`` is set, the error is calculated across all clients of the task on the same host instead, from the
+    first request of any client and the mean timespan covered by all clients (see ``ThrottleCoordinator``), so that
+    the aggregate indexing rate follows the data rather than each client on its own.
 
     Our target is effectively error = 0. If we achieve error == 0 then we know we are tracking the data's datetime
     profile i.e. we are indexing the data the rate determined by the time between the `@timestamp` fields on the
@@ -109,6 +115,7 @@ class TimestampThrottler:
         self.last_error = 0
         self.first_request = True
         self.start_time = 0
+        self.coordinator = ThrottleCoordinator(task)
 
     def throttle(self, weight):
         self.logger.debug("Throttling...")
@@ -163,8 +170,7 @@ class TimestampThrottler:
         self.last_state = self.weight
 
     def after_request(self, now, weight, unit, request_meta_data):
-        since_start = now - self.start_time
-        error = since_start - self.parameter_source.event_time_span
+        error = self.coordinator.error(now, self.start_time, self.parameter_source)
         self.logger.debug("Error is [%s]s, Last Error was [%s]s", error, self.last_error)
         new_bulk_size = weight
         change_in_error = abs(error) - abs(self.last_error)
@@ -193,3 +199,163 @@ class TimestampThrottler:
             return next_time
         # un-throttled
         return 0
+
+
+class ConvergenceStats:
+    """
+    Tracks how well a throttler follows the data datetime profile, based on the error after each request, i.e. the
+    time since the first request minus the event time span covered so far:
+
+    * ``mean-abs-error`` and ``max-abs-error`` - in seconds
+    * ``oscillations`` - the number of times the error swung from more than ``tolerance`` seconds on one side of zero to
+      the other side
+    * ``settled-since`` - the time since the first request from which on the absolute error has stayed within
+      ``tolerance`` seconds or ``None`` if it is currently outside
+    """
+
+    def __init__(self, tolerance):
+        self.tolerance = tolerance
+        self.samples = 0
+        self.sum_abs_error = 0
+        self.max_abs_error = 0
+        self.oscillations = 0
+        self.settled_since = None
+        self._last_sign = 0
+
+    def add(self, elapsed, error):
+        self.samples += 1
+        self.sum_abs_error += abs(error)
+        self.max_abs_error = max(self.max_abs_error, abs(error))
+        sign = (error > self.tolerance) - (error < -self.tolerance)
+        if sign != 0:
+            if self._last_sign != 0 and sign != self._last_sign:
+                self.oscillations += 1
+            self._last_sign = sign
+        if abs(error) <= self.tolerance:
+            if self.settled_since is None:
+                self.settled_since = elapsed
+        else:
+            self.settled_since = None
+
+    def as_dict(self):
+        return {
+            "samples": self.samples,
+            "mean-abs-error": self.sum_abs_error / self.samples if self.samples else 0,
+            "max-abs-error": self.max_abs_error,
+            "oscillations": self.oscillations,
+            "settled-since": self.settled_since,
+        }
+
+
+class PidThrottler:
+    """
+    An alternative to ``TimestampThrottler`` which throttles indexing with a PID controller. The error is the same, i.e.
+    the time since the first request minus the event time span covered so far, but the controller adjusts the bulk size
+    and rate after every request in proportion to the error (``kp``), its integral (``ki``) and its derivative (``kd``)
+    instead of waiting for the absolute error to grow.
+
+    The controller drives a single actuator position between 0 and 2 which is mapped onto both actuators of
+    ``TimestampThrottler``, again preferring large bulks:
+
+    * Between 1 and 2, bulks have the maximum bulk size and the delay between requests decreases linearly from
+      ``max-delay-secs`` to 0 (un-throttled).
+    * Between 0 and 1, the delay is ``max-delay-secs`` and the bulk size decreases linearly from the maximum bulk size
+      to 1.
+
+    The controller uses the velocity form, i.e. it calculates the change of the position, so that the integral term
+    cannot wind up while the position is at either end. Indexing starts un-throttled. Like ``TimestampThrottler``, the
+    error can be calculated across all clients with ``coordinated``.
+
+    Convergence stats (see ``ConvergenceStats``) are logged every ``stats-interval`` requests. If ``trace-file`` is set,
+    the service time, bulk size and event time span of each request are appended to it as JSON lines so that the run can
+    be replayed offline with ``shared.schedulers.simulation``. The file is opened once and written with buffering; it is
+    flushed along with the convergence stats and closed by ``close()`` or when the throttler is collected at the latest.
+    """
+
+    MAX_POSITION = 2
+
+    def __init__(self, task):
+        self.logger = logging.getLogger(__name__)
+        self.max_delay = task.params.get("max-delay-secs", 1)
+        self.max_bulk_size = mandatory(task.operation.params, "bulk-size", task.operation.type)
+        self.kp = task.params.get("kp", 0.1)
+        self.ki = task.params.get("ki", 0.01)
+        self.kd = task.params.get("kd", 0)
+        self.stats_interval = task.params.get("stats-interval", 100)
+        self.trace_file = task.params.get("trace-file")
+        self._trace = None
+        self.convergence = ConvergenceStats(task.params.get("tolerance-secs", 1))
+        self.position = self.MAX_POSITION
+        self.rate = 0
+        self.bulk_size = self.max_bulk_size
+        self.parameter_source = None
+        self.first_request = True
+        self.start_time = 0
+        self.request_start = 0
+        self.last_time = 0
+        self.last_error = 0
+        self.previous_error = 0
+        self.coordinator = ThrottleCoordinator(task)
+
+    def _control(self, error, dt):
+        if dt <= 0:
+            return
+        change = (
+            self.kp * (error - self.last_error) + self.ki * error * dt + self.kd * (error - 2 * self.last_error + self.previous_error) / dt
+        )
+        self.position = min(max(self.position + change, 0), self.MAX_POSITION)
+
+    def _actuate(self, weight):
+        if self.position >= 1:
+            self.rate = round(self.max_delay * (self.MAX_POSITION - self.position), 6)
+            bulk_size = self.max_bulk_size
+        else:
+            self.rate = self.max_delay
+            bulk_size = max(int(round(self.max_bulk_size * self.position)), 1)
+        if bulk_size != self.bulk_size:
+            self.logger.debug("Adjusting bulk size from [%s] to [%s]", weight, bulk_size)
+            self.parameter_source.set_bulk_size(bulk_size)
+            self.bulk_size = bulk_size
+
+    def after_request(self, now, weight, unit, request_meta_data):
+        since_start = now - self.start_time
+        error = self.coordinator.error(now, self.start_time, self.parameter_source)
+        self._control(error, now - self.last_time)
+        self._actuate(weight)
+        self.logger.debug("Error is [%s]s, position is [%s], rate is [%s]s", error, self.position, self.rate)
+        self.previous_error = self.last_error
+        self.last_error = error
+        self.last_time = now
+        self.convergence.add(since_start, error)
+        if self.trace_file:
+            if self._trace is None:
+                self._trace = open(self.trace_file, "a")
+                # schedulers are not closed by Rally
+                weakref.finalize(self, self._trace.close)
+            record = {
+                "service-time": now - self.request_start,
+                "weight": weight,
+                "event-time-span": self.parameter_source.event_time_span,
+            }
+            self._trace.write(f"{json.dumps(record)}\n")
+        if self.convergence.samples % self.stats_interval == 0:
+            self.logger.info("Convergence stats: [%s]", self.convergence.as_dict())
+            if self._trace is not None:
+                self._trace.flush()
+
+    def close(self):
+        if self._trace is not None:
+            self._trace.close()
+
+    def before_request(self, now):
+        if self.first_request:
+            self.start_time = now
+            self.last_time = now
+            self.first_request = False
+        self.request_start = now
+
+    def next(self, current):
+        if self.rate > 0:
+            return current + self.rate
+        # un-throttled
+        return 0
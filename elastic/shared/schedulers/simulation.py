@@ -0,0 +1,242 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import heapq
+import json
+import random
+
+from shared.schedulers.indexing import ConvergenceStats
+
+"""
+    Offline simulation of schedulers (e.g. ``TimestampThrottler``, ``PidThrottler`` and ``WorkflowScheduler``) so that
+    they can be tuned and compared without a cluster. There are two ways to simulate:
+
+    * ``simulate()`` replays a trace of a single client. A trace is a list of requests as recorded by ``PidThrottler``
+      with ``trace-file``, each with the service time of the request, the number of docs (``weight``) and the event time
+      span covered after the request. Traces are replayed with the bulk sizes and delays chosen by the simulated
+      throttler, assuming that the service time and event time span of a request are proportional to its number of docs.
+    * ``Simulator`` runs any number of clients as a discrete-event simulation against a synthetic model of a cluster
+      (see ``ClusterModel``) and reports convergence, oscillation and throughput.
+
+    Schedulers are driven like Rally does: the next request of a client is issued at the point in time returned by
+    ``next()``, relative to the start of the simulation, but not before the client's previous request has finished.
+"""
+
+
+def read_trace(file_name):
+    with open(file_name, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def request_costs(trace):
+    """
+    :return: A list of tuples of the service time and event time span per doc of each request in the trace.
+    """
+    costs = []
+    event_time_span = 0
+    for record in trace:
+        if record["weight"] > 0:
+            costs.append((record["service-time"] / record["weight"], (record["event-time-span"] - event_time_span) / record["weight"]))
+        event_time_span = record["event-time-span"]
+    return costs
+
+
+class SimulatedParameterSource:
+    def __init__(self, bulk_size):
+        self.bulk_size = bulk_size
+        self.event_time_span = 0
+
+    def set_bulk_size(self, bulk_size):
+        self.bulk_size = bulk_size
+
+
+def simulate(throttler, trace, tolerance=1):
+    """
+    Replays a trace with a throttler. Time starts at 0 and the throttler's delays are applied like Rally does, i.e. the
+    next request is not issued before the point in time returned by ``next()`` but also not before the previous request
+    has finished.
+
+    :param throttler: A throttler which has not been used yet.
+    :param trace: The requests to replay, see ``read_trace()``.
+    :param tolerance: The tolerance of the returned convergence stats in seconds.
+    :return: Convergence stats of the simulated run (see ``ConvergenceStats``).
+    """
+    parameter_source = SimulatedParameterSource(throttler.max_bulk_size)
+    throttler.parameter_source = parameter_source
+    convergence = ConvergenceStats(tolerance)
+    now = 0
+    scheduled = 0
+    for service_time_per_doc, event_time_span_per_doc in request_costs(trace):
+        scheduled = throttler.next(scheduled)
+        now = max(now, scheduled)
+        throttler.before_request(now)
+        docs = parameter_source.bulk_size
+        now += service_time_per_doc * docs
+        parameter_source.event_time_span += event_time_span_per_doc * docs
+        throttler.after_request(now, docs, "docs", {})
+        convergence.add(now, now - parameter_source.event_time_span)
+    return convergence
+
+
+class ClusterModel:
+    """
+    A synthetic model of a cluster. The latency of a request is ``base_latency`` plus ``latency_per_unit`` per unit of
+    weight (e.g. per doc), varied by up to +/- ``jitter`` (relative). In addition, the cluster processes at most
+    ``max_throughput`` units per second across all clients. Requests which exceed this capacity are queued in order of
+    arrival, so that latencies grow once clients send more than the cluster can handle.
+    """
+
+    def __init__(self, base_latency=0.01, latency_per_unit=0.0, max_throughput=None, jitter=0.0, seed=13):
+        self.base_latency = base_latency
+        self.latency_per_unit = latency_per_unit
+        self.max_throughput = max_throughput
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._busy_until = 0
+
+    def complete(self, now, weight):
+        """
+        :return: The point in time at which a request with the given weight issued at ``now`` completes.
+        """
+        latency = self.base_latency + self.latency_per_unit * weight
+        if self.jitter:
+            latency *= 1 + self._random.uniform(-self.jitter, self.jitter)
+        if self.max_throughput:
+            self._busy_until = max(self._busy_until, now) + weight / self.max_throughput
+            return self._busy_until + latency
+        return now + latency
+
+
+class SimulatedIndexingSource(SimulatedParameterSource):
+    """
+    A parameter source of an indexing client for the simulator in which each doc covers ``event_time_span_per_doc``
+    seconds of the data timeline.
+    """
+
+    unit = "docs"
+
+    def __init__(self, bulk_size, event_time_span_per_doc, client_index=0, client_count=1):
+        super().__init__(bulk_size)
+        self.event_time_span_per_doc = event_time_span_per_doc
+        self.client_index = client_index
+        self.client_count = client_count
+
+    def weight(self):
+        return self.bulk_size
+
+    def complete(self, weight):
+        self.event_time_span += weight * self.event_time_span_per_doc
+
+
+class SimulatedWorkflowSource:
+    """
+    A parameter source of a query client for the simulator (see ``WorkflowSelectorParamSource``) which executes
+    workflows of ``number_of_actions`` actions.
+    """
+
+    unit = "ops"
+
+    def __init__(self, number_of_actions, random_seed=13, task_offset=0, number_of_tasks=1):
+        self.number_of_actions = number_of_actions
+        self.random_seed = random_seed
+        self.task_offset = task_offset
+        self.number_of_tasks = number_of_tasks
+        self.current_index = 0
+
+    def weight(self):
+        return 1
+
+    def complete(self, weight):
+        self.current_index = (self.current_index + 1) % self.number_of_actions
+
+
+class Simulator:
+    """
+    A discrete-event simulation of clients, each with a scheduler and a simulated parameter source (see
+    ``SimulatedIndexingSource`` and ``SimulatedWorkflowSource``), against a ``ClusterModel``. Constants of schedulers,
+    e.g. ``ALPHA`` of ``TimestampThrottler``, can be tuned by overriding them on the scheduler instances. Coordinated
+    throttlers should use a separate ``coordination-file`` per simulation.
+    """
+
+    def __init__(self, cluster, tolerance=1):
+        self.cluster = cluster
+        self.tolerance = tolerance
+        self._clients = []
+
+    def add_client(self, scheduler, parameter_source):
+        scheduler.parameter_source = parameter_source
+        self._clients.append((scheduler, parameter_source))
+
+    def run(self, duration):
+        """
+        Runs all clients for ``duration`` seconds of simulated time.
+
+        :return: A dict with the throughput (``throughput``, units per second), the mean latency (``mean-latency``) and
+                 the number of requests (``requests``). If there are indexing clients, also the error of all indexing
+                 clients together, i.e. the time since the start minus the mean event time span of the clients, as
+                 ``convergence`` (see ``ConvergenceStats``) and ``oscillation-amplitude``, half the difference between
+                 the largest and smallest error in the second half of the simulation.
+        """
+        # events are tuples of the point in time, a sequence number to break ties, the client and whether the request
+        # completes (or starts)
+        events = []
+        scheduled = [0] * len(self._clients)
+        issued = [0] * len(self._clients)
+        sequence = 0
+        for client in range(len(self._clients)):
+            scheduled[client] = self._clients[client][0].next(0)
+            heapq.heappush(events, (scheduled[client], sequence, client, False))
+            sequence += 1
+        indexing_sources = [source for _, source in self._clients if source.unit == "docs"]
+        convergence = ConvergenceStats(self.tolerance)
+        errors = []
+        total_weight = 0
+        total_latency = 0
+        requests = 0
+        while events:
+            now, _, client, completes = heapq.heappop(events)
+            if now > duration:
+                break
+            scheduler, source = self._clients[client]
+            if not completes:
+                issued[client] = now
+                scheduler.before_request(now)
+                weight = source.weight()
+                heapq.heappush(events, (self.cluster.complete(now, weight), sequence, client, True))
+            else:
+                weight = source.weight()
+                source.complete(weight)
+                scheduler.after_request(now, weight, source.unit, {})
+                requests += 1
+                total_weight += weight
+                total_latency += now - issued[client]
+                if source.unit == "docs":
+                    error = now - sum(s.event_time_span for s in indexing_sources) / len(indexing_sources)
+                    convergence.add(now, error)
+                    errors.append((now, error))
+                scheduled[client] = scheduler.next(scheduled[client])
+                heapq.heappush(events, (max(now, scheduled[client]), sequence, client, False))
+            sequence += 1
+        result = {
+            "requests": requests,
+            "throughput": total_weight / duration,
+            "mean-latency": total_latency / requests if requests else None,
+        }
+        if indexing_sources:
+            result["convergence"] = convergence.as_dict()
+            steady_errors = [error for point_in_time, error in errors if point_in_time >= duration / 2]
+            result["oscillation-amplitude"] = (max(steady_errors) - min(steady_errors)) / 2 if steady_errors else None
+        return result
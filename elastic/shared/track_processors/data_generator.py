@@ -15,33 +15,80 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import contextlib
 import glob
 import json
 import logging
 import os
 import random
+import re
+import shutil
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import accumulate
 
 from esrally import exceptions
 from esrally.track import DocumentCorpus, Documents
 from esrally.track.loader import DocumentSetPreparator
 from esrally.utils import io
 from shared.parameter_sources import DEFAULT_END_DATE, DEFAULT_START_DATE, utc_now
+from shared.parameter_sources.processed import MagicNumbers
+from shared.utils.cache import GeneratedCorpusCache
+from shared.utils.codec import AUTO, get_codec
+from shared.utils.compression import BlockCompressedWriter, get_compression
 from shared.utils.corpus import (
+    CorpusSelector,
+    VolumeTarget,
     bounds,
     calculate_corpus_counts,
     calculate_integration_ratios,
     convert_to_gib,
 )
 from shared.utils.file import (
+    Checkpoint,
     CorporaReader,
     CorpusReader,
     FileMetadata,
     JsonFileReader,
+    LineIndex,
+    SpliceIndex,
     WrappingSlice,
 )
+from shared.utils.sampling import CorpusStats, CorpusStatsIndex, sample_lines
 from shared.utils.time import parse_date_time
 from shared.utils.track import mandatory
 
+TS_KEY = '"@timestamp"'
+TS_TOKEN = '@timestamp": "'
+RALLY_TOKEN = '"rally": {'
+# matches the separator between key and value of "@timestamp" up to the opening quote of the value
+TS_VALUE_PATTERN = re.compile(r'\s*:\s*"')
+# matches the separator between key and value of "msglen", the value and any trailing whitespace
+MSGLEN_VALUE_PATTERN = re.compile(r"\s*:\s*(\d+)\s*")
+# matches a JSON string including escaped characters
+JSON_STRING_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"')
+# "files" writes generated corpora to disk before indexing while "live" generates docs on the fly while indexing
+DATA_GENERATION_MODES = ["files", "live"]
+
+
+def is_live_data_generation(track):
+    """
+    :return: ``True`` if docs are generated on the fly while indexing instead of being written to disk upfront.
+    """
+    mode = track.selected_challenge_or_default.parameters.get("data-generation-mode", "files")
+    if mode not in DATA_GENERATION_MODES:
+        raise exceptions.TrackConfigError(f'"data-generation-mode" must be one of [{", ".join(DATA_GENERATION_MODES)}] but was [{mode}]')
+    return mode == "live"
+
+
+def data_file_name(file_index, compression_type=None):
+    """
+    :return: The name of a generated data file, including the extension of the compression if any.
+    """
+    if compression_type:
+        return f"{file_index}.json{get_compression(compression_type).file_extension}"
+    return f"{file_index}.json"
+
 
 class LazyMetadataDocuments(Documents):
     def __init__(self, document_file):
@@ -61,7 +108,8 @@ class LazyMetadataDocuments(Documents):
 
     @property
     def metadata(self):
-        return FileMetadata.read(self.document_file[: -len(".json")])
+        # the file name might have an additional extension for compressed files
+        return FileMetadata.read(self.document_file[: self.document_file.rindex(".json")])
 
     @property
     def number_of_documents(self):
@@ -84,6 +132,40 @@ class LazyMetadataDocuments(Documents):
             return 0
 
 
+def _create_file_offset_table(track_name, document_file_path, expected_number_of_lines):
+    DocumentSetPreparator(track_name, None, None).create_file_offset_table(document_file_path, expected_number_of_lines)
+
+
+class _PooledDecompressor:
+    """
+    Delegates decompression to a process pool so that archives of multiple document sets are decompressed in parallel.
+    """
+
+    def __init__(self, decompressor, process_pool):
+        self.decompressor = decompressor
+        self.process_pool = process_pool
+
+    def decompress(self, archive_path, documents_path, uncompressed_size):
+        self.process_pool.submit(self.decompressor.decompress, archive_path, documents_path, uncompressed_size).result()
+
+
+class ParallelDocumentSetPreparator(DocumentSetPreparator):
+    """
+    A ``DocumentSetPreparator`` for use by multiple threads which decompresses document sets and creates their file
+    offset tables in a process pool, if any. Downloads are done in the calling thread.
+    """
+
+    def __init__(self, track_name, downloader, decompressor, process_pool=None):
+        super().__init__(track_name, downloader, _PooledDecompressor(decompressor, process_pool) if process_pool else decompressor)
+        self.process_pool = process_pool
+
+    def create_file_offset_table(self, document_file_path, expected_number_of_lines):
+        if self.process_pool:
+            self.process_pool.submit(_create_file_offset_table, self.track_name, document_file_path, expected_number_of_lines).result()
+        else:
+            super().create_file_offset_table(document_file_path, expected_number_of_lines)
+
+
 class DataGenerator:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -94,15 +176,19 @@ class DataGenerator:
     def on_after_load_track(self, track):
         if not track.selected_challenge_or_default.parameters.get("generate-data", True):
             return
+        # docs are generated on the fly by the param source in live mode so there is no generated corpus
+        if is_live_data_generation(track):
+            return
         # inject a generated corpus
         track_id = track.selected_challenge_or_default.parameters["track-id"]
         client_count = track.selected_challenge_or_default.parameters.get("data-generation-clients", 2)
+        compression_type = track.selected_challenge_or_default.parameters.get("data-generation-compression", None)
         documents = []
         for client_id in range(client_count):
             # only use a relative path; the absolute path will be set by Rally on the target machine
             documents.append(
                 LazyMetadataDocuments(
-                    document_file=os.path.join("generated", track_id, f"{client_id}.json"),
+                    document_file=os.path.join("generated", track_id, data_file_name(client_id, compression_type)),
                 )
             )
 
@@ -114,6 +200,7 @@ class DataGenerator:
         if not track.selected_challenge_or_default.parameters.get("generate-data", True):
             return []
         track_data_root = os.path.join(data_root_dir, track.name)
+        document_sets = []
         for corpus in track.corpora:
             if not corpus.meta_data.get("generated", False):
                 data_root = os.path.join(track_data_root, corpus.name)
@@ -123,17 +210,33 @@ class DataGenerator:
                     track.name,
                     data_root,
                 )
-                # only set for real benchmarks, not in unit tests
-                if self.downloader and self.decompressor:
-                    prep = DocumentSetPreparator(track.name, self.downloader, self.decompressor)
-
-                    for document_set in corpus.documents:
-                        prep.prepare_document_set(document_set, data_root)
+                document_sets.extend((corpus.name, document_set, data_root) for document_set in corpus.documents)
+        # only set for real benchmarks, not in unit tests
+        if self.downloader and self.decompressor and document_sets:
+            self._prepare_document_sets(track, document_sets)
 
         # data is now available locally, proceed with generating data
         client_count = track.selected_challenge_or_default.parameters.get("data-generation-clients", 2)
-        track_id = track.selected_challenge_or_default.parameters["track-id"]
-        track.selected_challenge_or_default.parameters["output-folder"] = os.path.join(track_data_root, "generated", track_id)
+        live = is_live_data_generation(track)
+        if live:
+            # the data root of the source corpora for the param sources which generate docs on the fly
+            track.selected_challenge_or_default.parameters["track-data-root"] = track_data_root
+        else:
+            track_id = track.selected_challenge_or_default.parameters["track-id"]
+            track.selected_challenge_or_default.parameters["output-folder"] = os.path.join(track_data_root, "generated", track_id)
+        sampling = track.selected_challenge_or_default.parameters.get("data-generation-sampling")
+        if sampling in ["index", "random"]:
+            # calculated once here instead of by all generation (or indexing) clients in parallel, which then only read
+            # the stats and, for random sampling, find the checksums of the corpus files cached by size and modification time
+            generator = CorpusGenerator(track, track_data_root, client_index=0, client_count=client_count)
+            if sampling == "index":
+                for corpus in generator.corpora:
+                    generator.corpus_stats_index(corpus)
+            else:
+                generator.include_doc_size_with_metadata = True
+                generator._sample_random_corpus_stats()
+        if live:
+            return []
         retval = []
         for client_id in range(client_count):
             generator_params = {
@@ -145,27 +248,89 @@ class DataGenerator:
             retval.append((generate, generator_params))
         return retval
 
+    def _prepare_document_sets(self, track, document_sets):
+        """
+        Downloads document sets in a bounded thread pool while archives are decompressed and file offset tables are
+        created in a process pool.
+
+        :param document_sets: A list of tuples of corpus name, document set and data root.
+        """
+        parameters = track.selected_challenge_or_default.parameters
+        threads = parameters.get("data-preparation-threads", min(8, len(document_sets)))
+        if threads < 1:
+            raise exceptions.TrackConfigError(f'"data-preparation-threads" must be at least 1 but was [{threads}]')
+        processes = parameters.get("data-preparation-processes", min(threads, os.cpu_count() or 1))
+        if processes < 1:
+            raise exceptions.TrackConfigError(f'"data-preparation-processes" must be at least 1 but was [{processes}]')
+        self.logger.info(
+            "Preparing [%d] document sets using [%d] threads and [%d] processes.",
+            len(document_sets),
+            threads,
+            processes,
+        )
+        remaining = {}
+        for corpus_name, _, _ in document_sets:
+            remaining[corpus_name] = remaining.get(corpus_name, 0) + 1
+        with ProcessPoolExecutor(max_workers=processes) if processes > 1 else contextlib.nullcontext() as process_pool:
+            prep = ParallelDocumentSetPreparator(track.name, self.downloader, self.decompressor, process_pool)
+            with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="prepare-document-sets") as executor:
+                futures = {
+                    executor.submit(prep.prepare_document_set, document_set, data_root): corpus_name
+                    for corpus_name, document_set, data_root in document_sets
+                }
+                try:
+                    for future in as_completed(futures):
+                        # re-raises any error that occurred during preparation
+                        future.result()
+                        corpus_name = futures[future]
+                        remaining[corpus_name] -= 1
+                        if remaining[corpus_name] == 0:
+                            self.logger.info("Document corpus [%s] is prepared.", corpus_name)
+                        else:
+                            self.logger.info(
+                                "Prepared a document set of corpus [%s], [%d] remaining.",
+                                corpus_name,
+                                remaining[corpus_name],
+                            )
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+
 
 class CorpusGenerator:
-    def __init__(self, track, track_data_root, client_index="*", client_count=None):
+    def __init__(self, track, track_data_root, client_index="*", client_count=None, shard_index=None):
         self.logger = logging.getLogger(__name__)
         self.include_doc_size_with_metadata = False
         self.corpora = []
         self.track = track
         self._random_seed = track.selected_challenge_or_default.parameters.get("random-seed", None)
         self.track_data_root = track_data_root
-        # check if output folder exists and contains files. If it does, we complete early unless force=True
-        self.output_folder = track.selected_challenge_or_default.parameters["output-folder"]
+        # check if output folder exists and contains files. If it does, we complete early unless force=True. There is no
+        # output folder for live data generation (see live_batches()).
+        self.output_folder = track.selected_challenge_or_default.parameters.get("output-folder")
         self.logger.info("Using output folder [%s]", self.output_folder)
         self.complete = False
-        if not track.selected_challenge_or_default.parameters.get("force-data-generation"):
-            file_pattern = f"{client_index}.json"
-            if len(glob.glob(os.path.join(self.output_folder, file_pattern))) > 0:
+        # write the generated data compressed in blocks which can be decompressed independently
+        self._compression_type = track.selected_challenge_or_default.parameters.get("data-generation-compression", None)
+        self._compression = get_compression(self._compression_type) if self._compression_type else None
+        self._force_generation = track.selected_challenge_or_default.parameters.get("force-data-generation", False)
+        if not self._force_generation and self.output_folder:
+            file_pattern = data_file_name(client_index, self._compression_type)
+            if any(self._is_complete(output_file) for output_file in glob.glob(os.path.join(self.output_folder, file_pattern))):
                 self.complete = True
                 self.logger.info("Skipping data generation as files are present and force-data-generation is set to false.")
 
         self._client_index = client_index
         self._client_count = client_count
+        # each client's output can be split into shards which are generated in parallel and merged once complete. A
+        # generator either produces the (merged) output for a client or, if shard_index is set, a single shard of it.
+        self.shard_count = track.selected_challenge_or_default.parameters.get("data-generation-shards", 1)
+        if self.shard_count < 1:
+            raise exceptions.TrackConfigError(f'"data-generation-shards" must be at least 1 but was [{self.shard_count}]')
+        self._shard_index = shard_index
+        self._generation_processes = track.selected_challenge_or_default.parameters.get(
+            "data-generation-processes", min(self.shard_count, os.cpu_count() or 1)
+        )
 
         self._integration_ratios = mandatory(
             track.selected_challenge_or_default.parameters,
@@ -203,23 +368,33 @@ class CorpusGenerator:
             raise exceptions.TrackConfigError(f'"start-date" cannot be greater than "end-date" for data generation.')
         # number of days to run the test for - used to calculate the amount of data to generate
         number_of_days = (end_date - start_date).total_seconds() / 86400
-        self._max_generation_size_gb = convert_to_gib(
-            mandatory(
-                track.selected_challenge_or_default.parameters,
-                "max-generated-corpus-size",
-                "generate-data",
-            )
-        )
         raw_volume_per_day = mandatory(
             track.selected_challenge_or_default.parameters,
             "raw-data-volume-per-day",
             "generate-data",
         )
-        self._data_generation_gb = min(
-            convert_to_gib(raw_volume_per_day) * number_of_days,
-            self._max_generation_size_gb,
-        )
+        if is_live_data_generation(track):
+            # nothing is written to disk so the corpus size is not limited
+            max_generation_size = track.selected_challenge_or_default.parameters.get("max-generated-corpus-size")
+        else:
+            max_generation_size = mandatory(
+                track.selected_challenge_or_default.parameters,
+                "max-generated-corpus-size",
+                "generate-data",
+            )
+        # 0 means no limit (see calculate_corpus_counts())
+        self._max_generation_size_gb = convert_to_gib(max_generation_size) if max_generation_size else 0
+        self._data_generation_gb = convert_to_gib(raw_volume_per_day) * number_of_days
+        if self._max_generation_size_gb > 0:
+            self._data_generation_gb = min(self._data_generation_gb, self._max_generation_size_gb)
         self.logger.info("[%s]GB of raw data to be generated", self._data_generation_gb)
+        # write a splice index along with the generated data to speed up bulk indexing
+        self._splice_index = track.selected_challenge_or_default.parameters.get("data-generation-splice-index", False)
+        if self._splice_index and self._compression:
+            raise exceptions.TrackConfigError('"data-generation-splice-index" cannot be used with "data-generation-compression"')
+        # write source docs as they are instead of serializing them again after processing
+        self._passthrough = track.selected_challenge_or_default.parameters.get("data-generation-passthrough", False)
+        self._codec = get_codec(track.selected_challenge_or_default.parameters.get("json-codec", AUTO))
         self._processor = self._json_processor
 
         # mainly for unit testing but can be modified and might be worth making this a factor of num clients later
@@ -238,6 +413,20 @@ class CorpusGenerator:
         # number of lines to sample from each corpus to identify the raw->json factor each corpus.
         # Principally for testing.
         self._sample_size = track.selected_challenge_or_default.parameters.get("sample-size", 10000)
+        # "sequential" samples the first docs of the client's share of each corpus, "random" samples docs across the
+        # whole corpus and "index" uses stats of all docs of each corpus
+        self._sampling = track.selected_challenge_or_default.parameters.get("data-generation-sampling", "sequential")
+        if self._sampling not in ["sequential", "random", "index"]:
+            raise exceptions.TrackConfigError(
+                f'"data-generation-sampling" must be one of [sequential, random, index] but was [{self._sampling}]'
+            )
+        # whether to stop after the batch which reaches the number of docs or exactly at the number of docs or raw bytes
+        self._volume_target_mode = track.selected_challenge_or_default.parameters.get("volume-target", "approximate")
+        if self._volume_target_mode not in VolumeTarget.MODES:
+            raise exceptions.TrackConfigError(
+                f'"volume-target" must be one of [{", ".join(VolumeTarget.MODES)}] but was [{self._volume_target_mode}]'
+            )
+        self.bytes_per_client = None
         for integration_name, integration in self._integration_ratios.items():
             for corpus_name, ratio in integration["corpora"].items():
                 corpus = next((c for c in track.corpora if c.name == corpus_name), None)
@@ -257,37 +446,123 @@ class CorpusGenerator:
                     integration["corpora"][corpus_name] = ratio / ratio_total
             self.logger.info(f"Corpus ratios recalculated to:\n {self._integration_ratios}")
 
+    def output_files(self, output_folder=None):
+        """
+        :param output_folder: The folder of the corpus, by default the output folder of this generator.
+        :return: The names of all files with generated data of the client, relative to the output folder.
+        """
+        if output_folder is None:
+            output_folder = self.output_folder
+        data_file = data_file_name(self._client_index, self._compression_type)
+        file_names = [data_file, f"{data_file}.offset", f"{self._client_index}.metadata"]
+        if not self._compression:
+            file_names.append(LineIndex.file_name(data_file))
+        if self._splice_index:
+            file_names.extend([SpliceIndex.index_file_name(data_file), SpliceIndex.formats_file_name(data_file)])
+        # there is no checkpoint for the merged output of shards
+        if Checkpoint.exists(os.path.join(output_folder, data_file)):
+            file_names.append(Checkpoint.file_name(data_file))
+        return file_names
+
+    @staticmethod
+    def _is_complete(output_file):
+        # data files are written incrementally and only complete once their metadata has been written. Incomplete files
+        # of an interrupted generation have a checkpoint from which generation is resumed.
+        checkpoint = Checkpoint.read(output_file)
+        metadata_file = f"{output_file[: output_file.rindex('.json')]}.metadata"
+        return os.path.exists(metadata_file) and (checkpoint is None or checkpoint["complete"])
+
     def _json_processor(self, doc_bytes, _, corpus_name):
         # add any additional doc work here
-        doc = json.loads(doc_bytes.decode("utf-8"))
-        message_size = int(doc.pop("msglen", 0))
         remove_fields = self._exclude_properties.get(corpus_name, [])
+        if self._passthrough and len(remove_fields) == 0:
+            processed = self._passthrough_processor(doc_bytes.decode("utf-8").strip())
+            if processed:
+                return processed
+        doc = self._codec.loads(doc_bytes)
+        message_size = int(doc.pop("msglen", 0))
         if len(remove_fields) > 0:
             for field in remove_fields:
                 if field in doc:
                     del doc[field]
             # doc size after field removal! careful with whitespace
-        doc_size = len(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
-        doc["rally"] = {}
-        # Note: we rely on insertion order here for later efficient parsing - as of python 3.7 this is preserved
-        if message_size == 0:
-            # message_size is used for the throughput calculations
-            # if msglen is included in corpus data then calculated message_size is based on raw data and traffic
-            # throughput will be calculated on raw message size.  Otherwise traffic throughput will be assumed
-            # calculated from document size.
-            doc["rally"]["message_size"] = doc_size
+        # serialized docs are ASCII only (ensure_ascii) so the length in characters equals the length in bytes
+        doc_size = len(self._codec.dumps_compact(doc))
+        # generated data, as stored on disk, uses the default separators i.e. ', ' and ': '
+        raw_doc = self._codec.dumps(doc)
+        ts_start_idx = raw_doc.find(TS_TOKEN) + len(TS_TOKEN)
+        return self._add_rally_properties(raw_doc, len(doc) == 0, doc_size, message_size, ts_start_idx), message_size or doc_size
+
+    def _passthrough_processor(self, line):
+        """
+        Processes a source document without parsing it: the source document is written as is, apart from the removal
+        of ``msglen``, with ``doc_size`` being its size as found in the source corpus. Falls back to regular processing
+        (by returning ``None``) if the document cannot be processed safely on string level.
+        """
+        # non-ASCII characters would otherwise need to be escaped as by json.dumps
+        if not line.isascii() or not line.endswith("}") or '"rally"' in line:
+            return None
+        message_size = 0
+        raw_doc = line
+        # a quote within a string value is always escaped, i.e. an unescaped quoted "msglen" is a key
+        msglen_idx = line.find('"msglen"')
+        if msglen_idx != -1:
+            if line[msglen_idx - 1] == "\\" or line.find('"msglen"', msglen_idx + 1) != -1:
+                return None
+            # only msglen of the top-level object is removed, e.g. not the one of {"nested": {"msglen": 5, ...}}
+            head = JSON_STRING_PATTERN.sub('""', line[:msglen_idx])
+            if head.count("{") - head.count("}") != 1 or head.count("[") != head.count("]"):
+                return None
+            match = MSGLEN_VALUE_PATTERN.match(line, msglen_idx + len('"msglen"'))
+            if not match:
+                return None
+            message_size = int(match.group(1))
+            if line[match.end()] == ",":
+                raw_doc = f"{line[:msglen_idx]}{line[match.end() + 1 :].lstrip()}"
+            elif match.end() == len(line) - 1:
+                # msglen is the last key, remove the separator in front of it instead
+                head = line[:msglen_idx].rstrip()
+                if not head.endswith(","):
+                    return None
+                raw_doc = f"{head[:-1]}{line[match.end():]}"
+            else:
+                return None
+        doc_size = len(raw_doc)
+        ts_start_idx = raw_doc.find(TS_KEY)
+        if ts_start_idx != -1 and (match := TS_VALUE_PATTERN.match(raw_doc, ts_start_idx + len(TS_KEY))):
+            ts_start_idx = match.end()
         else:
-            doc["rally"]["message_size"] = message_size
-        doc["rally"]["doc_size"] = doc_size
+            ts_start_idx = raw_doc.find(TS_TOKEN) + len(TS_TOKEN)
+        empty = raw_doc[:-1].rstrip().endswith("{")
+        return self._add_rally_properties(raw_doc, empty, doc_size, message_size, ts_start_idx), message_size or doc_size
+
+    def _add_rally_properties(self, raw_doc, empty, doc_size, message_size, ts_start_idx):
+        """
+        Appends the ``rally`` object to a serialized doc. This is equivalent to adding it to the doc and serializing it
+        with the default separators but avoids serializing the doc (multiple times) after it has been processed.
+        """
+        # message_size is used for the throughput calculations
+        # if msglen is included in corpus data then calculated message_size is based on raw data and traffic
+        # throughput will be calculated on raw message size.  Otherwise traffic throughput will be assumed
+        # calculated from document size.
+        if message_size == 0:
+            message_size = doc_size
+        # Note: we rely on the order of keys here for later efficient parsing
+        rally = f'"rally": {{"message_size": {message_size}, "doc_size": {doc_size}'
         # the following is not used for enriched data stored on disk, only for _sample_corpus_stats()
-        # size with the rally meta, assign the doc size and timestamp temporarily so its included
+        # size with the rally meta, i.e. the size of the doc serialized without whitespace including the rally object
+        # with doc_size_with_meta set to doc_size.
         # Note: the doc size is only an estimate. It will often be modified by ingest pipelines so in subject to change.
         if self.include_doc_size_with_metadata:
-            doc["rally"]["doc_size_with_meta"] = doc_size
-            doc["rally"]["doc_size_with_meta"] = len(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+            compact_rally = f'"rally":{{"message_size":{message_size},"doc_size":{doc_size},"doc_size_with_meta":{doc_size}}}}}'
+            doc_size_with_meta = doc_size + len(compact_rally) - (1 if empty else 0)
+            rally = f'{rally}, "doc_size_with_meta": {doc_size_with_meta}'
+        raw_doc = f"{raw_doc[:-1]}{'' if empty else ', '}{rally}}}}}"
+        return f'{raw_doc[:-2]}, "markers": "{self._doc_markers(raw_doc, ts_start_idx)}"}}}}'
 
-        self._append_doc_markers(doc)
-        return doc, doc["rally"]["message_size"]
+    def _rally_properties(self, raw_doc):
+        # the rally object is always the last key of a generated doc
+        return self._codec.loads(raw_doc[raw_doc.rfind(RALLY_TOKEN) + len(RALLY_TOKEN) - 1 : -1])
 
     @staticmethod
     def _append_doc_markers(doc):
@@ -315,21 +590,25 @@ class CorpusGenerator:
 
         # generated data, as stored on disk, uses the default separators i.e. ', ' and ': '
         raw_string = json.dumps(doc)
+        doc["rally"]["markers"] = CorpusGenerator._doc_markers(raw_string, raw_string.find(TS_TOKEN) + len(TS_TOKEN))
 
+    @staticmethod
+    def _doc_markers(raw_string, ts_start_idx):
+        """
+        :param raw_string: A generated doc, serialized without the "markers" key.
+        :param ts_start_idx: The index where the *value* for `@timestamp` starts.
+        :return: The markers for the doc (see ``_append_doc_markers()``).
+        """
         _rallyts_token = "_RALLYTS"
         _rallyts_start_idx = raw_string.find(_rallyts_token)
 
-        _ts_token = '@timestamp": "'
-        _ts_start_idx = raw_string.find(_ts_token) + len(_ts_token)
-        _ts_end_idx = _ts_start_idx + raw_string[_ts_start_idx:].find('"')
+        _ts_end_idx = ts_start_idx + raw_string[ts_start_idx:].find('"')
 
         _msgsize_token = '"rally": {"message_size": '
         _msgsize_start_idx = raw_string.find(_msgsize_token) + len(_msgsize_token)
         _msgsize_end_idx = _msgsize_start_idx + raw_string[_msgsize_start_idx:].find(",")
 
-        doc["rally"][
-            "markers"
-        ] = f"{_rallyts_start_idx:010x}{_ts_start_idx:010x}{_ts_end_idx:010x}{_msgsize_start_idx:010x}{_msgsize_end_idx:010x}"
+        return f"{_rallyts_start_idx:010x}{ts_start_idx:010x}{_ts_end_idx:010x}{_msgsize_start_idx:010x}{_msgsize_end_idx:010x}"
 
     def create_corpus_reader(self, corpus, num_clients, client_index, bulk_size, processor):
         readers = []
@@ -371,13 +650,12 @@ class CorpusGenerator:
             readers[corpus.name] = self.create_corpus_reader(corpus, num_clients, client_index, self._batch_size, self._processor)
         return readers
 
-    def _reader_generator(self, used_corpora, weights):
+    def _reader_generator(self, corpus_selector):
         # select a random corpus
         # grab the readers for that corpus
         # consume the next doc from the latest reader
         # assumes readers are open
-        while True:
-            corpus_name = random.choices(used_corpora, weights=weights)[0]
+        for corpus_name in corpus_selector:
             corpus_reader = self.readers[corpus_name]
             num_docs, docs, size = next(corpus_reader)
             yield num_docs, docs, size
@@ -387,35 +665,91 @@ class CorpusGenerator:
         # sequentially until exhausted and then reset them
         used_corpora = list(self._corpora_doc_ratios.keys())
         weights = list(self._corpora_doc_ratios.values())
-        os.makedirs(self.output_folder, exist_ok=True)
 
-        current_docs = 0
-        current_lines = 0
-        total_size_in_bytes = 0
-        self.logger.info(
-            "Generator [%d] is starting to generate [%d] docs",
-            self._client_index,
-            self.docs_per_client,
-        )
-        output_file = os.path.join(self.output_folder, f"{self._client_index}.json")
+        data_folder, file_index = self._data_location()
+        os.makedirs(data_folder, exist_ok=True)
+        output_file = os.path.join(data_folder, data_file_name(file_index, self._compression_type))
         offset_file = f"{output_file}.offset"
-        current_increment = self._offset_increment
-        with open(output_file, "wt") as data_file, open(offset_file, mode="wt", encoding="utf-8") as offset_file:
+        # normalized like a checkpoint read from disk to allow comparing it
+        self._fingerprint = json.loads(json.dumps(self._checkpoint_fingerprint()))
+        checkpoint = self._resumable_checkpoint(output_file)
+        if checkpoint and checkpoint["complete"] and self._has_target(checkpoint):
+            self.logger.info("Generator [%s] skips generation as [%s] is complete.", self._name, output_file)
+            # the checkpoint is not copied along with a complete corpus of another track id
+            if not Checkpoint.exists(output_file):
+                Checkpoint.write(output_file, checkpoint)
+            return
+        if checkpoint:
+            current_docs = checkpoint["docs"]
+            current_lines = checkpoint["lines"]
+            total_size_in_bytes = checkpoint["size-in-bytes"]
+            current_increment = checkpoint["next-offset"]
+            current_bytes = checkpoint["bytes"]
+            splice_formats = {ts_format: format_id for format_id, ts_format in enumerate(checkpoint["splice-formats"])}
+            self._truncate_to_checkpoint(output_file, checkpoint)
+            version, internal_state, gauss_next = checkpoint["random-state"]
+            self._random.setstate((version, tuple(internal_state), gauss_next))
+            self.logger.info(
+                "Generator [%s] resumes generating [%d] docs after [%d] docs",
+                self._name,
+                self.docs_per_client,
+                current_docs,
+            )
+        else:
+            current_docs = 0
+            current_lines = 0
+            total_size_in_bytes = 0
+            current_increment = self._offset_increment
+            # an index from a previous run would not match the generated data
+            SpliceIndex.remove(output_file)
+            splice_formats = {}
+            # all lines are ASCII only, their length in characters equals their length in bytes
+            current_bytes = 0
+            self.logger.info(
+                "Generator [%s] is starting to generate [%d] docs",
+                self._name,
+                self.docs_per_client,
+            )
+        # when resuming, all files have been truncated to the checkpoint
+        mode = "a" if checkpoint else "w"
+        # positions in compressed files are only known for the start of blocks so there is no line index for these
+        with (
+            BlockCompressedWriter(output_file, self._compression, append=checkpoint is not None)
+            if self._compression
+            else open(output_file, f"{mode}t")
+        ) as data_file, open(offset_file, mode=f"{mode}t", encoding="utf-8") as offset_file, (
+            open(LineIndex.file_name(output_file), f"{mode}b") if not self._compression else contextlib.nullcontext()
+        ) as line_index_file, (
+            open(SpliceIndex.index_file_name(output_file), f"{mode}b") if self._splice_index else contextlib.nullcontext()
+        ) as splice_file:
+            output_files = [data_file, offset_file, line_index_file, splice_file]
+            # corpora are drawn ahead in blocks, checkpoints store the random state of the next selection
+            self._corpus_selector = CorpusSelector(used_corpora, weights, rng=self._random)
             with CorporaReader(self.readers.values()):
-                for num_docs, lines, raw_size_in_bytes in self._reader_generator(used_corpora, weights):
-                    if current_docs + num_docs >= self.docs_per_client:
+                if checkpoint:
+                    for corpus_name, position in checkpoint["readers"].items():
+                        self.readers[corpus_name].seek(position)
+                else:
+                    # marks the data file as incomplete until generation has finished
+                    self._write_checkpoint(output_file, output_files, False, 0, 0, 0, current_increment, splice_formats)
+                self._limit_batch_size(current_docs, total_size_in_bytes)
+                for num_docs, lines, raw_size_in_bytes in self._reader_generator(self._corpus_selector):
+                    if self.volume_target.reached(current_docs + num_docs, total_size_in_bytes + raw_size_in_bytes):
                         self.complete = True
-                        # we deliberately don't trim the last batch to get the exact number of documents. This would break
-                        # encapsulation and this shouldn't be an issue on larger datasets
+                        # unless the volume target is exact, we deliberately don't trim the last batch to get the exact
+                        # number of documents. This shouldn't be an issue on larger datasets
                     elif current_docs % 1000 == 0:
                         self.logger.debug(
-                            "Generator [%d] has written [%d] docs so far.",
-                            self._client_index,
+                            "Generator [%s] has written [%d] docs so far.",
+                            self._name,
                             current_docs,
                         )
                     # getting chunks of lines which might be less than the batch sizes (cannot be greater) so we output
                     # when we pass the increment and update the offsets. We then shift the increment.
                     if current_lines >= current_increment:
+                        if self._compression:
+                            # offsets of compressed files point to the start of a block
+                            data_file.start_block()
                         print(
                             "%d;%d" % (current_lines, data_file.tell()),
                             file=offset_file,
@@ -424,23 +758,406 @@ class CorpusGenerator:
                     current_docs += num_docs
                     current_lines += len(lines)
                     total_size_in_bytes += raw_size_in_bytes
-                    data_file.writelines([json.dumps(line) + "\n" for line in lines])
+                    # docs are already serialized, only the action and meta-data lines need to be
+                    lines = [(line if isinstance(line, str) else self._codec.dumps(line)) + "\n" for line in lines]
+                    if splice_file:
+                        records, _ = self._splice_records(lines, current_bytes, splice_formats)
+                        records.tofile(splice_file)
+                    if line_index_file:
+                        line_positions = array(LineIndex.TYPECODE, accumulate(map(len, lines), initial=current_bytes))
+                        current_bytes = line_positions.pop()
+                        line_positions.tofile(line_index_file)
+                    data_file.writelines(lines)
                     if self.complete:
                         self.logger.info(
-                            "Generator [%d] has completed generating [%d] docs with [%d] bytes.",
-                            self._client_index,
+                            "Generator [%s] has completed generating [%d] docs with [%d] bytes.",
+                            self._name,
                             current_docs,
                             total_size_in_bytes,
                         )
+                        if line_index_file:
+                            # the line index ends with the size of the data file
+                            array(LineIndex.TYPECODE, [current_bytes]).tofile(line_index_file)
+                        if splice_file:
+                            # format ids are assigned in insertion order
+                            SpliceIndex.write_formats(output_file, list(splice_formats.keys()))
                         FileMetadata.write(
-                            self.output_folder,
-                            self._client_index,
+                            data_folder,
+                            file_index,
+                            current_docs,
+                            total_size_in_bytes,
+                        )
+                        # kept to allow extending the corpus later on
+                        self._write_checkpoint(
+                            output_file,
+                            output_files,
+                            True,
                             current_docs,
+                            current_lines,
                             total_size_in_bytes,
+                            current_increment,
+                            splice_formats,
                         )
                         break
+                    if current_lines >= current_increment:
+                        # the next batch starts at an offset (and thus a block of compressed files) which is where
+                        # generation can be resumed
+                        self._write_checkpoint(
+                            output_file,
+                            output_files,
+                            False,
+                            current_docs,
+                            current_lines,
+                            total_size_in_bytes,
+                            current_increment,
+                            splice_formats,
+                        )
+                    self._limit_batch_size(current_docs, total_size_in_bytes)
+
+    def _limit_batch_size(self, docs, size_in_bytes):
+        batch_size = self.volume_target.batch_size(self._batch_size, docs, size_in_bytes)
+        if batch_size < self._batch_size:
+            # applied lazily by the readers on their next read
+            for corpus_reader in self.readers.values():
+                corpus_reader.set_bulk_size(batch_size)
+
+    def _checkpoint_fingerprint(self):
+        """
+        :return: All parameters which determine the sequence of generated docs. Generation can only be resumed from a
+                 checkpoint with the same fingerprint. The number of docs is not included as a corpus with fewer docs
+                 is a prefix of one with more docs.
+        """
+        return {
+            "seed": self._seed(),
+            "corpora-doc-ratios": self._corpora_doc_ratios,
+            "batch-size": self._batch_size,
+            "offset-increment": self._offset_increment,
+            "exclude-properties": self._exclude_properties,
+            "passthrough": self._passthrough,
+            "splice-index": self._splice_index,
+            "compression": self._compression_type,
+            "volume-target": self.volume_target.mode,
+            "readers": {
+                corpus_name: [
+                    [reader.data_file, reader.file_source.offset, reader.file_source.number_of_lines] for reader in corpus_reader.readers
+                ]
+                for corpus_name, corpus_reader in self.readers.items()
+            },
+        }
+
+    def _is_resumable(self, output_file, checkpoint):
+        if checkpoint is None or checkpoint["fingerprint"] != self._fingerprint:
+            return False
+        # the data file might have been modified after the checkpoint has been written
+        if not os.path.exists(output_file) or os.path.getsize(output_file) < checkpoint["bytes"]:
+            return False
+        if checkpoint["complete"] and self._has_target(checkpoint):
+            return True
+        # the last batch of a complete corpus with an exact target has been trimmed so it cannot be extended
+        if checkpoint["complete"] and self.volume_target.mode != "approximate":
+            return False
+        return not self.volume_target.reached(checkpoint["docs"], checkpoint["size-in-bytes"])
+
+    def _has_target(self, checkpoint):
+        return checkpoint["docs-target"] == self.docs_per_client and checkpoint.get("bytes-target") == self.bytes_per_client
+
+    def _resumable_checkpoint(self, output_file):
+        """
+        :return: The checkpoint from which the generation of ``output_file`` can be continued or ``None`` if generation
+                 has to start from scratch.
+        """
+        if self._force_generation:
+            return None
+        checkpoint = Checkpoint.read(output_file)
+        if self._is_resumable(output_file, checkpoint):
+            return checkpoint
+        # A corpus generated with identical parameters apart from the number of docs, e.g. for an earlier end date, is
+        # extended instead. Shards are not considered as their docs depend on the number of docs of the client.
+        if self._shard_index is None:
+            cache = GeneratedCorpusCache(os.path.dirname(self.output_folder))
+            for previous_output_file in glob.glob(os.path.join(os.path.dirname(self.output_folder), "*", os.path.basename(output_file))):
+                if previous_output_file == output_file:
+                    continue
+                previous_output_folder = os.path.dirname(previous_output_file)
+                previous_track_id = os.path.basename(previous_output_folder)
+                # the corpus must neither be generated nor evicted while it is copied. Corpora which are locked by
+                # another process are skipped instead of waiting as that process might wait for this one.
+                with cache.generation_lock(previous_track_id, self._client_index, blocking=False) as locked:
+                    if not locked:
+                        continue
+                    checkpoint = Checkpoint.read(previous_output_file)
+                    if not self._is_resumable(previous_output_file, checkpoint) or not checkpoint["complete"]:
+                        continue
+                    if not cache.verify(previous_track_id, self.output_files(previous_output_folder)):
+                        self.logger.warning("Generator [%s] does not extend [%s] as it is invalid.", self._name, previous_output_file)
+                        continue
+                    self.logger.info("Generator [%s] extends [%s] with [%d] docs.", self._name, previous_output_file, checkpoint["docs"])
+                    self._copy_generated_files(previous_output_file, output_file)
+                    return checkpoint
+        return None
+
+    def _copy_generated_files(self, source_file, target_file):
+        shutil.copyfile(source_file, target_file)
+        shutil.copyfile(f"{source_file}.offset", f"{target_file}.offset")
+        # needed if the copied corpus is already complete
+        shutil.copyfile(f"{source_file[: source_file.rindex('.json')]}.metadata", f"{target_file[: target_file.rindex('.json')]}.metadata")
+        if not self._compression:
+            shutil.copyfile(LineIndex.file_name(source_file), LineIndex.file_name(target_file))
+        if self._splice_index:
+            shutil.copyfile(SpliceIndex.index_file_name(source_file), SpliceIndex.index_file_name(target_file))
+            shutil.copyfile(SpliceIndex.formats_file_name(source_file), SpliceIndex.formats_file_name(target_file))
+
+    def _truncate_to_checkpoint(self, output_file, checkpoint):
+        """
+        Removes everything that has been written to the data file and its sidecar files after the checkpoint.
+        """
+        os.truncate(output_file, checkpoint["bytes"])
+        with open(f"{output_file}.offset", mode="rt", encoding="utf-8") as offset_file:
+            offsets = [line for line in offset_file if int(line.split(";")[0]) < checkpoint["lines"]]
+        with open(f"{output_file}.offset", mode="wt", encoding="utf-8") as offset_file:
+            offset_file.writelines(offsets)
+        if not self._compression:
+            os.truncate(LineIndex.file_name(output_file), checkpoint["lines"] * LineIndex.ITEM_SIZE)
+        if self._splice_index:
+            record_size_in_bytes = SpliceIndex.RECORD_SIZE * array(SpliceIndex.TYPECODE).itemsize
+            os.truncate(SpliceIndex.index_file_name(output_file), checkpoint["docs"] * record_size_in_bytes)
+
+    def _write_checkpoint(self, output_file, output_files, complete, docs, lines, size_in_bytes, next_offset, splice_formats):
+        data_file = output_files[0]
+        if self._compression:
+            # compressed files can only be resumed at the start of a block
+            data_file.start_block()
+        for f in output_files:
+            if f:
+                f.flush()
+        Checkpoint.write(
+            output_file,
+            {
+                "fingerprint": self._fingerprint,
+                "complete": complete,
+                "docs-target": self.docs_per_client,
+                "bytes-target": self.bytes_per_client,
+                "docs": docs,
+                "lines": lines,
+                "size-in-bytes": size_in_bytes,
+                "bytes": data_file.tell(),
+                "next-offset": next_offset,
+                "splice-formats": list(splice_formats.keys()),
+                "random-state": self._corpus_selector.random_state(),
+                "readers": {corpus_name: corpus_reader.position() for corpus_name, corpus_reader in self.readers.items()},
+            },
+        )
+
+    @staticmethod
+    def _splice_records(lines, current_bytes, formats):
+        """
+        Creates the splice index records (see ``SpliceIndex``) for serialized action and meta-data and doc lines.
+
+        :param lines: Pairs of action and meta-data and doc lines, each including the trailing newline.
+        :param current_bytes: The position in the data file where the first line starts.
+        :param formats: Timestamp formats by id. Formats which are not present yet are added.
+        :return: A tuple of the records and the position in the data file after the last line.
+        """
+        records = array(SpliceIndex.TYPECODE)
+        for i in range(0, len(lines), 2):
+            meta_start = current_bytes
+            doc_start = meta_start + len(lines[i])
+            doc = lines[i + 1][:-1]
+            current_bytes = doc_start + len(doc) + 1
+            rallyts_start = int(doc[MagicNumbers.RALLYTS_BEGIN_IDX : MagicNumbers.TS_BEGIN_IDX], 16)
+            if rallyts_start != -1:
+                rallyts_len = int(doc[rallyts_start + MagicNumbers.RALLYTS_LEN : rallyts_start + MagicNumbers.RALLYTSDATA_LEN_END], 10)
+                ts_format_end = rallyts_start + MagicNumbers.RALLYTS_FORMAT_BEGIN + rallyts_len
+                splice_start = rallyts_start
+                # including the closing ">"
+                splice_end = ts_format_end + 1
+                format_id = formats.setdefault(doc[rallyts_start + MagicNumbers.RALLYTS_FORMAT_BEGIN : ts_format_end], len(formats))
+            else:
+                splice_start = int(doc[MagicNumbers.TS_BEGIN_IDX : MagicNumbers.TS_END_IDX], 16)
+                splice_end = int(doc[MagicNumbers.TS_END_IDX : MagicNumbers.MSGLEN_BEGIN_IDX], 16)
+                format_id = SpliceIndex.ISO_FORMAT_ID
+            msgsize_start = int(doc[MagicNumbers.MSGLEN_BEGIN_IDX : MagicNumbers.MSGLEN_END_IDX], 16)
+            msgsize_end = int(doc[MagicNumbers.MSGLEN_END_IDX : MagicNumbers.MSGLEN_END_IDX + 10], 16)
+            records.extend(
+                (
+                    meta_start,
+                    doc_start,
+                    doc_start + splice_start,
+                    doc_start + splice_end,
+                    doc_start + len(doc) + MagicNumbers.MARKER_IDX,
+                    int(doc[msgsize_start:msgsize_end], 10),
+                    format_id,
+                )
+            )
+        return records, current_bytes
+
+    @property
+    def _name(self):
+        if self._shard_index is None:
+            return str(self._client_index)
+        return f"{self._client_index}/{self._shard_index}"
+
+    def _parts_folder(self):
+        return os.path.join(self.output_folder, f"{self._client_index}.parts")
+
+    def _data_location(self):
+        """
+        :return: A tuple of the folder and the file index (i.e. the file name without extension) this generator writes to.
+        """
+        if self._shard_index is None:
+            return self.output_folder, self._client_index
+        return self._parts_folder(), self._shard_index
+
+    def _seed(self):
+        if not self._random_seed:
+            return None
+        # avoid zero seeds because of client_index == 0
+        seed = (self._client_index + 1) * self._random_seed
+        if self._shard_index is None:
+            return seed
+        # unique per client and shard, independent of the number of processes used for generation
+        return seed * self.shard_count + self._shard_index
+
+    def _generate_shards(self):
+        shard_params = []
+        for shard_index in range(self.shard_count):
+            _, docs_per_shard = bounds(self.docs_per_client, shard_index, self.shard_count)
+            bytes_per_shard = bounds(self.bytes_per_client, shard_index, self.shard_count)[1] if self.bytes_per_client else None
+            shard_params.append(
+                {
+                    "track": self.track,
+                    "track_data_root": self.track_data_root,
+                    "client_index": self._client_index,
+                    "client_count": self._client_count,
+                    "shard_index": shard_index,
+                    "corpora_doc_ratios": self._corpora_doc_ratios,
+                    "docs_per_shard": docs_per_shard,
+                    "bytes_per_shard": bytes_per_shard,
+                }
+            )
+        processes = min(self._generation_processes, self.shard_count)
+        self.logger.info(
+            "Generator [%s] is generating [%d] shards using [%d] processes.",
+            self._name,
+            self.shard_count,
+            processes,
+        )
+        # parts of an interrupted run are resumed or, if they are stale, generated again
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                futures = [executor.submit(generate_shard, **params) for params in shard_params]
+                for future in futures:
+                    # re-raises any error that occurred during generation of the shard
+                    future.result()
+        else:
+            for params in shard_params:
+                generate_shard(**params)
+        self._merge_shards()
+
+    def _merge_shards(self):
+        """
+        Concatenates all shards of a client in shard order to the client's output file. Line numbers and byte positions
+        in the shards' offset files are relative to the start of the shard and are shifted accordingly. As the merged
+        output only depends on the contents of the shards, it is identical irrespective of how many processes were used.
+        """
+        parts_folder = self._parts_folder()
+        output_file = os.path.join(self.output_folder, data_file_name(self._client_index, self._compression_type))
+        total_docs = 0
+        total_size_in_bytes = 0
+        current_lines = 0
+        SpliceIndex.remove(output_file)
+        splice_formats = {}
+        with open(f"{output_file}.tmp", "wb") as data_file, open(f"{output_file}.offset.tmp", mode="wt", encoding="utf-8") as offset_file, (
+            open(f"{LineIndex.file_name(output_file)}.tmp", "wb") if not self._compression else contextlib.nullcontext()
+        ) as line_index_file, (
+            open(f"{SpliceIndex.index_file_name(output_file)}.tmp", "wb") if self._splice_index else contextlib.nullcontext()
+        ) as splice_file:
+            for shard_index in range(self.shard_count):
+                shard_docs, shard_size_in_bytes = FileMetadata.read(os.path.join(parts_folder, str(shard_index)))
+                shard_file = os.path.join(parts_folder, data_file_name(shard_index, self._compression_type))
+                # compressed shards consist of complete blocks, i.e. a shard always starts with a new block
+                start_bytes = data_file.tell()
+                if current_lines > 0:
+                    print("%d;%d" % (current_lines, start_bytes), file=offset_file)
+                with open(f"{shard_file}.offset", mode="rt", encoding="utf-8") as shard_offsets:
+                    for line in shard_offsets:
+                        line_number, offset_in_bytes = [int(i) for i in line.strip().split(";")]
+                        print("%d;%d" % (current_lines + line_number, start_bytes + offset_in_bytes), file=offset_file)
+                with open(shard_file, "rb") as shard_data:
+                    shutil.copyfileobj(shard_data, data_file)
+                if line_index_file:
+                    self._merge_line_index(shard_file, start_bytes, line_index_file)
+                if splice_file:
+                    self._merge_splice_index(shard_file, start_bytes, splice_file, splice_formats)
+                # each document is preceded by an action and meta-data line
+                current_lines += shard_docs * 2
+                total_docs += shard_docs
+                total_size_in_bytes += shard_size_in_bytes
+            if line_index_file:
+                array(LineIndex.TYPECODE, [data_file.tell()]).tofile(line_index_file)
+        os.replace(f"{output_file}.offset.tmp", f"{output_file}.offset")
+        os.replace(f"{output_file}.tmp", output_file)
+        if not self._compression:
+            os.replace(f"{LineIndex.file_name(output_file)}.tmp", LineIndex.file_name(output_file))
+        if self._splice_index:
+            SpliceIndex.write_formats(output_file, list(splice_formats.keys()))
+            os.replace(f"{SpliceIndex.index_file_name(output_file)}.tmp", SpliceIndex.index_file_name(output_file))
+        FileMetadata.write(self.output_folder, self._client_index, total_docs, total_size_in_bytes)
+        shutil.rmtree(parts_folder)
+        self.logger.info(
+            "Generator [%s] has merged [%d] shards with [%d] docs and [%d] bytes.",
+            self._name,
+            self.shard_count,
+            total_docs,
+            total_size_in_bytes,
+        )
+
+    @staticmethod
+    def _merge_line_index(shard_file, start_bytes, line_index_file):
+        # positions in the shard's index are relative to the start of the shard and its last entry (the size of the shard)
+        # is superseded by the start of the next shard
+        with open(LineIndex.file_name(shard_file), "rb") as shard_line_index_file:
+            remaining_bytes = os.fstat(shard_line_index_file.fileno()).st_size - LineIndex.ITEM_SIZE
+            while remaining_bytes > 0:
+                # read in chunks of 64k positions
+                chunk = shard_line_index_file.read(min(remaining_bytes, LineIndex.ITEM_SIZE * 65536))
+                remaining_bytes -= len(chunk)
+                line_positions = array(LineIndex.TYPECODE)
+                line_positions.frombytes(chunk)
+                array(LineIndex.TYPECODE, [position + start_bytes for position in line_positions]).tofile(line_index_file)
+
+    @staticmethod
+    def _merge_splice_index(shard_file, start_bytes, splice_file, formats):
+        # positions in the shard's index are relative to the start of the shard and format ids to the shard's formats
+        shard_format_ids = [formats.setdefault(ts_format, len(formats)) for ts_format in SpliceIndex.read_formats(shard_file)]
+        position_fields = [
+            SpliceIndex.META_START,
+            SpliceIndex.DOC_START,
+            SpliceIndex.SPLICE_START,
+            SpliceIndex.SPLICE_END,
+            SpliceIndex.TAIL_END,
+        ]
+        with open(SpliceIndex.index_file_name(shard_file), "rb") as shard_splice_file:
+            while True:
+                records = array(SpliceIndex.TYPECODE)
+                # read in chunks of 64k records
+                chunk = shard_splice_file.read(records.itemsize * SpliceIndex.RECORD_SIZE * 65536)
+                if not chunk:
+                    break
+                records.frombytes(chunk)
+                for record in range(0, len(records), SpliceIndex.RECORD_SIZE):
+                    for field in position_fields:
+                        records[record + field] += start_bytes
+                    format_id = records[record + SpliceIndex.FORMAT_ID]
+                    if format_id != SpliceIndex.ISO_FORMAT_ID:
+                        records[record + SpliceIndex.FORMAT_ID] = shard_format_ids[format_id]
+                records.tofile(splice_file)
 
     def _sample_corpus_stats(self):
+        if self._sampling == "random":
+            return self._sample_random_corpus_stats()
+        if self._sampling == "index":
+            return self._indexed_corpus_stats()
         corpus_stats = {}
         self.logger.info("Sampling corpora...")
         for integration_name, integration in self._integration_ratios.items():
@@ -463,8 +1180,9 @@ class CorpusGenerator:
                         total_message_size += message_size
                         for doc in docs:
                             if line_num % 2 == 1:
-                                total_doc_size += doc["rally"]["doc_size"]
-                                total_doc_size_with_meta += doc["rally"]["doc_size_with_meta"]
+                                rally = self._rally_properties(doc)
+                                total_doc_size += rally["doc_size"]
+                                total_doc_size_with_meta += rally["doc_size_with_meta"]
                             line_num += 1
                     corpus_stats[corpus_name] = {
                         "sampled_docs": sampled_docs,
@@ -480,29 +1198,179 @@ class CorpusGenerator:
                     )
         return corpus_stats
 
-    def _init_internal_params(self):
-        # avoid zero seeds because of client_index == 0
-        seed = (self._client_index + 1) * self._random_seed if self._random_seed else None
-        random.seed(seed)
+    def _sample_random_corpus_stats(self):
+        """
+        Samples docs at random positions across all files of each corpus (see ``sample_lines()``). In contrast to
+        sequential sampling, the stats do not depend on the client and are cached along with the corpus.
+        """
+        corpus_stats = {}
+        self.logger.info("Sampling corpora at random positions...")
+        for integration_name, integration in self._integration_ratios.items():
+            for corpus_name in integration["corpora"].keys():
+                corpus = next(c for c in self.corpora if c.name == corpus_name)
+                corpus_folder = os.path.join(self.track_data_root, corpus.name)
+                data_files = [os.path.join(corpus_folder, docs.document_file) for docs in corpus.documents]
+                key = CorpusStats.key(
+                    corpus_folder,
+                    data_files,
+                    {
+                        "sample-size": self._sample_size,
+                        "exclude-properties": self._exclude_properties.get(corpus_name, []),
+                        "passthrough": self._passthrough,
+                    },
+                )
+                corpus_stats[corpus_name] = CorpusStats.read(corpus_folder, key)
+                if corpus_stats[corpus_name] is not None:
+                    self.logger.info("Using cached stats for corpus [%s]: [%s]", corpus_name, json.dumps(corpus_stats[corpus_name]))
+                    continue
+                self.logger.info("Sampling [%s] docs from corpus [%s]", self._sample_size, corpus_name)
+                total_message_size = 0
+                total_doc_size = 0
+                total_doc_size_with_meta = 0
+                for line_num, doc_bytes in enumerate(sample_lines(data_files, self._sample_size)):
+                    doc, message_size = self._processor(doc_bytes, line_num, corpus_name)
+                    rally = self._rally_properties(doc)
+                    total_message_size += message_size
+                    total_doc_size += rally["doc_size"]
+                    total_doc_size_with_meta += rally["doc_size_with_meta"]
+                corpus_stats[corpus_name] = {
+                    "sampled_docs": self._sample_size,
+                    "avg_message_size": total_message_size / self._sample_size,
+                    "avg_doc_size": total_doc_size / self._sample_size,
+                    "avg_doc_size_with_meta": total_doc_size_with_meta / self._sample_size,
+                    "raw_json_ratio": total_doc_size / total_message_size,
+                }
+                CorpusStats.write(corpus_folder, key, corpus_stats[corpus_name])
+                self.logger.info("Stats for corpora [%s]: [%s]", corpus_name, json.dumps(corpus_stats[corpus_name]))
+        return corpus_stats
+
+    def _indexed_corpus_stats(self):
+        corpus_stats = {}
+        for integration_name, integration in self._integration_ratios.items():
+            for corpus_name in integration["corpora"].keys():
+                stats = self.corpus_stats_index(next(c for c in self.corpora if c.name == corpus_name))
+                number_of_documents = stats["number-of-documents"]
+                corpus_stats[corpus_name] = {
+                    "sampled_docs": number_of_documents,
+                    "avg_message_size": stats["total-message-size"] / number_of_documents,
+                    "avg_doc_size": stats["total-doc-size"] / number_of_documents,
+                    "avg_doc_size_with_meta": stats["total-doc-size-with-meta"] / number_of_documents,
+                    "raw_json_ratio": stats["total-doc-size"] / stats["total-message-size"],
+                    "p50_message_size": CorpusStatsIndex.percentile(stats["message-size-histogram"], 50),
+                    "p99_message_size": CorpusStatsIndex.percentile(stats["message-size-histogram"], 99),
+                }
+                self.logger.info("Stats for corpora [%s]: [%s]", corpus_name, json.dumps(corpus_stats[corpus_name]))
+        return corpus_stats
+
+    def corpus_stats_index(self, corpus):
+        """
+        :return: The stats of all docs of a corpus (see ``CorpusStatsIndex``). Stats of files are only calculated if
+                 they are not present or stale.
+        """
+        corpus_folder = os.path.join(self.track_data_root, corpus.name)
+        parameters = {
+            "exclude-properties": self._exclude_properties.get(corpus.name, []),
+            "passthrough": self._passthrough,
+        }
+        file_stats = []
+        for docs in corpus.documents:
+            data_file = os.path.join(corpus_folder, docs.document_file)
+            stats = CorpusStatsIndex.read(corpus_folder, data_file, parameters)
+            if stats is None:
+                self.logger.info("Calculating stats for [%s] of corpus [%s].", data_file, corpus.name)
+                stats = self._file_stats(data_file, corpus.name)
+                CorpusStatsIndex.write(corpus_folder, data_file, parameters, stats)
+            file_stats.append(stats)
+        return CorpusStatsIndex.merge(file_stats)
+
+    def _file_stats(self, data_file, corpus_name):
+        # sizes with meta-data are only available with include_doc_size_with_metadata which is only set temporarily
+        include_doc_size_with_metadata = self.include_doc_size_with_metadata
+        self.include_doc_size_with_metadata = True
+        stats = CorpusStatsIndex.merge([])
+        try:
+            with open(data_file, "rb") as f:
+                for line_num, doc_bytes in enumerate(f):
+                    doc, message_size = self._processor(doc_bytes, line_num, corpus_name)
+                    rally = self._rally_properties(doc)
+                    stats["number-of-documents"] += 1
+                    stats["total-message-size"] += message_size
+                    stats["total-doc-size"] += rally["doc_size"]
+                    stats["total-doc-size-with-meta"] += rally["doc_size_with_meta"]
+                    for key, value in [("message-size-histogram", message_size), ("doc-size-histogram", rally["doc_size"])]:
+                        bucket = str(CorpusStatsIndex.bucket(value))
+                        stats[key][bucket] = stats[key].get(bucket, 0) + 1
+                    for field in self._codec.loads(doc_bytes).keys():
+                        stats["field-presence"][field] = stats["field-presence"].get(field, 0) + 1
+        finally:
+            self.include_doc_size_with_metadata = include_doc_size_with_metadata
+        return stats
+
+    def _init_random(self):
+        seed = self._seed()
+        # an instance of its own so that generators in the same process, e.g. for live data generation, don't interfere
+        self._random = random.Random(seed)
         self.logger.info(
-            "Initializing generator [%d/%d] with seed [%d].",
-            self._client_index,
+            "Initializing generator [%s/%d] with seed [%s].",
+            self._name,
             self._client_count,
             seed,
         )
 
-        self.readers = self._create_readers(self._client_count, self._client_index)
-        corpus_stats = self._sample_corpus_stats()
-        # we will be sampling our corpora based on required doc ratios to satisfy the total gb.
-        # Larger corpus need a smaller ratio of lines to satisfy the original user specified ratios in gb
-        corpora_ratios = {
+    def _init_shard_params(self, corpora_doc_ratios, docs_per_shard, bytes_per_shard=None):
+        self._init_random()
+        # shards of a client read disjoint sections of the client's share of the source corpora
+        self.readers = self._create_readers(
+            self._client_count * self.shard_count, self._client_index * self.shard_count + self._shard_index
+        )
+        for corpus in self.corpora:
+            # small corpora might not have enough documents to be split across all shards
+            if len(self.readers[corpus.name].readers) == 0:
+                self.readers[corpus.name] = self.create_corpus_reader(
+                    corpus, self._client_count, self._client_index, self._batch_size, self._processor
+                )
+        self._corpora_doc_ratios = corpora_doc_ratios
+        self.docs_per_client = docs_per_shard
+        self.bytes_per_client = bytes_per_shard
+        self.volume_target = VolumeTarget(self._volume_target_mode, self.docs_per_client, self.bytes_per_client)
+
+    def _corpora_ratios(self):
+        return {
             corpus_name: ratio
             for integration_name, integration in self._integration_ratios.items()
             for corpus_name, ratio in integration["corpora"].items()
         }
+
+    def docs_for_volume(self, raw_volume_gb):
+        """
+        :return: The number of docs with the given raw data volume according to the sampled corpus stats. Requires an
+                 initialized generator (see ``live_generator()``).
+        """
+        return sum(calculate_corpus_counts(self.corpus_stats, self._corpora_ratios(), raw_volume_gb).values())
+
+    def live_batches(self):
+        """
+        Generates the same docs as ``_doc_generator()`` but yields them instead of writing them to the output folder. As
+        there is no output, the generator never completes. Requires an initialized generator (see ``live_generator()``).
+
+        :return: A generator of tuples of the number of docs, the action and meta-data and doc lines as they would be
+                 written to the output file (without trailing newlines) and the raw size of the docs in bytes.
+        """
+        corpus_selector = CorpusSelector(list(self._corpora_doc_ratios.keys()), list(self._corpora_doc_ratios.values()), rng=self._random)
+        dumps = self._codec.dumps
+        with CorporaReader(self.readers.values()):
+            for num_docs, lines, raw_size_in_bytes in self._reader_generator(corpus_selector):
+                yield num_docs, [line if isinstance(line, str) else dumps(line) for line in lines], raw_size_in_bytes
+
+    def _init_internal_params(self):
+        self._init_random()
+        self.readers = self._create_readers(self._client_count, self._client_index)
+        self.corpus_stats = self._sample_corpus_stats()
+        # we will be sampling our corpora based on required doc ratios to satisfy the total gb.
+        # Larger corpus need a smaller ratio of lines to satisfy the original user specified ratios in gb
         corpora_doc_counts = calculate_corpus_counts(
-            corpus_stats,
-            corpora_ratios,
+            self.corpus_stats,
+            self._corpora_ratios(),
             self._data_generation_gb,
             self._max_generation_size_gb,
         )
@@ -515,9 +1383,30 @@ class CorpusGenerator:
 
         # last client gets a little more from bounds function
         _, self.docs_per_client = bounds(self.total_docs, self._client_index, self._client_count)
+        if self._volume_target_mode == "bytes":
+            total_bytes = int(self._data_generation_gb * 1024 * 1024 * 1024)
+            _, self.bytes_per_client = bounds(total_bytes, self._client_index, self._client_count)
+        self.volume_target = VolumeTarget(self._volume_target_mode, self.docs_per_client, self.bytes_per_client)
 
 
 def generate(track, track_data_root, client_index=None, client_count=None):
+    output_folder = track.selected_challenge_or_default.parameters["output-folder"]
+    cache_size = track.selected_challenge_or_default.parameters.get("generated-corpus-cache-size", None)
+    cache = GeneratedCorpusCache(
+        os.path.dirname(output_folder),
+        max_size_in_bytes=convert_to_gib(cache_size) * 1024 * 1024 * 1024 if cache_size else None,
+    )
+    track_id = os.path.basename(output_folder)
+    # the corpus must not be evicted by other Rally processes on this host while it is generated and used in this race
+    cache.use(track_id)
+    # other Rally processes on this host wait until the client's data is complete instead of generating it as well
+    with cache.generation_lock(track_id, client_index):
+        cached = _generate_cached(track, track_data_root, client_index, client_count, cache, track_id)
+    cache.evict(keep=track_id)
+    return cached
+
+
+def _generate_cached(track, track_data_root, client_index, client_count, cache, track_id):
     generator = CorpusGenerator(
         track=track,
         track_data_root=track_data_root,
@@ -526,7 +1415,18 @@ def generate(track, track_data_root, client_index=None, client_count=None):
     )
     # This is determined at startup based on the presence of files
     if generator.complete:
-        return True
+        output_files = generator.output_files()
+        valid = cache.verify(track_id, output_files)
+        if valid is None:
+            # generated before the cache has been introduced
+            cache.publish(track_id, [f for f in output_files if os.path.exists(os.path.join(generator.output_folder, f))])
+            return True
+        if valid:
+            return True
+        generator.logger.warning("Generating data for client [%s] again as the generated data is invalid.", client_index)
+        generator.complete = False
+        # invalid data cannot be resumed
+        generator._force_generation = True
 
     # include the `doc_size_with_meta` field per doc used by _sample_corpus_stats() but not for the actual
     # generated docs stored on disk (see below)
@@ -535,5 +1435,45 @@ def generate(track, track_data_root, client_index=None, client_count=None):
 
     # don't include doc_size_with_meta field in generated docs that are stored on disk
     generator.include_doc_size_with_metadata = False
-    generator._doc_generator()
+    if generator.shard_count > 1:
+        generator._generate_shards()
+    else:
+        generator._doc_generator()
+    cache.publish(track_id, generator.output_files())
     return False
+
+
+def live_generator(track, track_data_root, client_index, client_count):
+    """
+    :return: A generator for the client's share of the docs which generates them on the fly (see
+             ``CorpusGenerator.live_batches()``), with the same seed and doc ratios as if they were written to disk.
+    """
+    generator = CorpusGenerator(
+        track=track,
+        track_data_root=track_data_root,
+        client_index=client_index,
+        client_count=client_count,
+    )
+    # see _generate_cached()
+    generator.include_doc_size_with_metadata = True
+    generator._init_internal_params()
+    generator.include_doc_size_with_metadata = False
+    return generator
+
+
+def generate_shard(
+    track, track_data_root, client_index, client_count, shard_index, corpora_doc_ratios, docs_per_shard, bytes_per_shard=None
+):
+    """
+    Generates a single shard of a client's output. Shards are independent of each other and can be generated in separate
+    processes. Sampling of the source corpora is done once per client and passed in via ``corpora_doc_ratios``.
+    """
+    generator = CorpusGenerator(
+        track=track,
+        track_data_root=track_data_root,
+        client_index=client_index,
+        client_count=client_count,
+        shard_index=shard_index,
+    )
+    generator._init_shard_params(corpora_doc_ratios, docs_per_shard, bytes_per_shard)
+    generator._doc_generator()
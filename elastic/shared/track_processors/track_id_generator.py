@@ -27,6 +27,7 @@ class TrackIdGenerator:
         "random-seed",
         "max-generated-corpus-size",
         "data-generation-clients",
+        "data-generation-shards",
         "max-total-download-per-corpus-gb",
         "start-date",
         "bulk-start-date",
@@ -34,6 +35,11 @@ class TrackIdGenerator:
         "bulk-end-date",
         "integration-ratios",
         "exclude-properties",
+        "data-generation-passthrough",
+        "data-generation-splice-index",
+        "data-generation-compression",
+        "data-generation-sampling",
+        "volume-target",
     ]
 
     def __init__(self):
@@ -18,13 +18,19 @@
 from enum import Enum
 
 from esrally import exceptions
+from shared.ts_generators.bursty import BurstyGenerator
+from shared.ts_generators.diurnal import DiurnalGenerator
 from shared.ts_generators.fixed_interval import FixedIntervalGenerator
+from shared.ts_generators.histogram import ReplayGenerator
 
 __TS_GENERATORS = {}
 
 
 class ProfileType(Enum):
     Fixed_Interval = 1
+    Diurnal = 2
+    Bursty = 3
+    Replay = 4
 
 
 def register_profiles(profiler_type, generator):
@@ -39,3 +45,6 @@ def get_ts_generator(profile_type, mean_docs_per_day, start_date, clients, **kwa
 
 
 register_profiles(ProfileType.Fixed_Interval.name.lower(), FixedIntervalGenerator)
+register_profiles(ProfileType.Diurnal.name.lower(), DiurnalGenerator)
+register_profiles(ProfileType.Bursty.name.lower(), BurstyGenerator)
+register_profiles(ProfileType.Replay.name.lower(), ReplayGenerator)
@@ -0,0 +1,77 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import math
+import random
+from array import array
+
+from esrally import exceptions
+from shared.ts_generators.generator import MICROS_PER_DAY, Generator
+from shared.utils.time import MICROS_PER_SECOND, from_epoch_micros, to_epoch_micros
+
+
+class BurstyGenerator(Generator):
+    """
+    Generates timestamps of a self-exciting (Hawkes) process with an exponential kernel: each doc triggers on average
+    ``branching-ratio`` (default 0.5) further docs within about ``burst-duration`` (default 1) seconds, which leads to
+    bursts of docs. With a branching ratio of 0, this is a Poisson process. The base rate is chosen so that the mean rate
+    is ``mean_docs_per_day``. Timestamps are drawn with Ogata's thinning algorithm.
+    """
+
+    def __init__(self, mean_docs_per_day, start_date, clients, **params):
+        super().__init__(mean_docs_per_day, start_date, clients, **params)
+        branching_ratio = self._params.get("branching-ratio", 0.5)
+        if not 0 <= branching_ratio < 1:
+            raise exceptions.TrackConfigError(
+                f'"branching-ratio" of profile [bursty] must be at least 0 and less than 1 but was [{branching_ratio}]'
+            )
+        burst_duration = self._params.get("burst-duration", 1)
+        if burst_duration <= 0:
+            raise exceptions.TrackConfigError(f'"burst-duration" of profile [bursty] must be positive but was [{burst_duration}]')
+        docs_per_micro = mean_docs_per_day / clients / MICROS_PER_DAY
+        # all rates are per microsecond
+        self._base_rate = docs_per_micro * (1 - branching_ratio)
+        self._decay = 1 / (burst_duration * MICROS_PER_SECOND)
+        self._jump = branching_ratio * self._decay
+        # the rate of docs triggered by previous docs
+        self._excitation = 0.0
+        self._now = float(to_epoch_micros(start_date))
+
+    def next_timestamp(self):
+        return from_epoch_micros(self.next_timestamps(1)[0])
+
+    def next_timestamps(self, count):
+        timestamps = array("q")
+        base_rate = self._base_rate
+        decay = self._decay
+        jump = self._jump
+        excitation = self._excitation
+        now = self._now
+        expovariate = random.expovariate
+        rand = random.random
+        exp = math.exp
+        while len(timestamps) < count:
+            # the rate only decreases until the next doc so the current rate is an upper bound
+            upper_bound = base_rate + excitation
+            wait = expovariate(upper_bound)
+            now += wait
+            excitation *= exp(-decay * wait)
+            if rand() * upper_bound <= base_rate + excitation:
+                timestamps.append(int(now))
+                excitation += jump
+        self._excitation = excitation
+        self._now = now
+        return timestamps
@@ -0,0 +1,42 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import math
+
+from esrally import exceptions
+from shared.ts_generators.histogram import HistogramGenerator
+
+# one bucket per minute
+BUCKETS_PER_DAY = 1440
+
+
+class DiurnalGenerator(HistogramGenerator):
+    """
+    Generates timestamps with a daily cycle: the rate follows a cosine which peaks at ``peak-hour`` (UTC, default 14)
+    with ``amplitude`` (default 0.5) times the mean rate above the mean, and is at its minimum twelve hours later.
+    """
+
+    profile_type = "diurnal"
+
+    def _weights(self):
+        amplitude = self._params.get("amplitude", 0.5)
+        if not 0 <= amplitude <= 1:
+            raise exceptions.TrackConfigError(f'"amplitude" of profile [diurnal] must be between 0 and 1 but was [{amplitude}]')
+        peak_hour = self._params.get("peak-hour", 14)
+        return [
+            1 + amplitude * math.cos(2 * math.pi * ((bucket + 0.5) * 24 / BUCKETS_PER_DAY - peak_hour) / 24)
+            for bucket in range(BUCKETS_PER_DAY)
+        ]
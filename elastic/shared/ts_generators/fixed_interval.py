@@ -19,6 +19,7 @@ import random
 from datetime import timedelta
 
 from shared.ts_generators.generator import Generator
+from shared.utils.time import MICROSECOND
 
 MILLISECONDS_PER_DAY = 86400000
 
@@ -30,8 +31,14 @@ class FixedIntervalGenerator(Generator):
         # subtract some uniform variance for the current time so not all clients are aligned
         self._timestamp_generator.next(timedelta(milliseconds=-random.uniform(0, self._doc_per_milli)))
         self._wait_time = (clients / mean_docs_per_day) * MILLISECONDS_PER_DAY
+        # timedelta rounds the interval to microseconds, so the interval is the same for every doc
+        self._wait_delta = timedelta(milliseconds=self._wait_time)
+        self._wait_micros = self._wait_delta // MICROSECOND
 
     def next_timestamp(self):
         # there are faster ways to do this but currently this is used in generation
         # and isn't expected to be the bottleneck
-        return self._timestamp_generator.next(timedelta(milliseconds=self._wait_time))
+        return self._timestamp_generator.next(self._wait_delta)
+
+    def next_timestamps(self, count):
+        return self._timestamp_generator.next_epoch_micros(self._wait_micros, count)
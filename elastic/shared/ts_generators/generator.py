@@ -16,8 +16,15 @@
 # under the License.
 
 import logging
+from array import array
 
-from shared.utils.time import TimestampStructGenerator
+from shared.utils.time import (
+    MICROS_PER_SECOND,
+    TimestampStructGenerator,
+    to_epoch_micros,
+)
+
+MICROS_PER_DAY = 86400 * MICROS_PER_SECOND
 
 
 class Generator:
@@ -27,3 +34,12 @@ class Generator:
         self._mean_docs_per_day = mean_docs_per_day
         self._clients = clients
         self._params = params
+
+    def next_timestamp(self):
+        raise NotImplementedError()
+
+    def next_timestamps(self, count):
+        """
+        :return: The next ``count`` timestamps as an array of epoch microseconds.
+        """
+        return array("q", [to_epoch_micros(self.next_timestamp()) for _ in range(count)])
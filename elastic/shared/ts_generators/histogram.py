@@ -0,0 +1,109 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import random
+from array import array
+
+from esrally import exceptions
+from shared.ts_generators.generator import MICROS_PER_DAY, Generator
+from shared.utils.time import from_epoch_micros, to_epoch_micros
+
+
+class HistogramGenerator(Generator):
+    """
+    Generates timestamps with a rate which follows a histogram of relative weights over a repeating period, starting at
+    midnight (UTC) of the start date. The rate is constant within each bucket of the histogram, so timestamps are
+    generated with a fixed interval per bucket. Over a whole period, the mean rate is ``mean_docs_per_day``.
+    """
+
+    profile_type = "histogram"
+
+    def __init__(self, mean_docs_per_day, start_date, clients, **params):
+        super().__init__(mean_docs_per_day, start_date, clients, **params)
+        weights = self._weights()
+        if not weights or any(weight < 0 for weight in weights) or sum(weights) == 0:
+            raise exceptions.TrackConfigError(
+                f"The histogram of profile [{self.profile_type}] must have non-negative weights and at least one positive "
+                f"weight but was {weights}"
+            )
+        period_micros = self._period_days() * MICROS_PER_DAY
+        self._bucket_micros = period_micros / len(weights)
+        mean_weight = sum(weights) / len(weights)
+        docs_per_micro = mean_docs_per_day / clients / MICROS_PER_DAY
+        # the interval between docs per bucket, None for buckets without any docs
+        self._intervals = [1 / (docs_per_micro * weight / mean_weight) if weight > 0 else None for weight in weights]
+        start = to_epoch_micros(start_date)
+        self._period_start = start - start % MICROS_PER_DAY
+        # the number of the current bucket since the start of the first period
+        self._bucket = int((start - self._period_start) // self._bucket_micros)
+        self._now = float(start)
+        # the fraction of the current interval until the next doc - random so that not all clients are aligned
+        self._pending = 1.0 - random.random()
+
+    def _weights(self):
+        raise NotImplementedError()
+
+    def _period_days(self):
+        return 1
+
+    def _bucket_end(self):
+        return self._period_start + (self._bucket + 1) * self._bucket_micros
+
+    def next_timestamp(self):
+        return from_epoch_micros(self.next_timestamps(1)[0])
+
+    def next_timestamps(self, count):
+        timestamps = array("q")
+        intervals = self._intervals
+        while len(timestamps) < count:
+            interval = intervals[self._bucket % len(intervals)]
+            bucket_end = self._bucket_end()
+            if interval is None:
+                self._now = bucket_end
+                self._bucket += 1
+                continue
+            first = self._now + self._pending * interval
+            if first > bucket_end:
+                # the interval continues with the rate of the next bucket
+                self._pending -= (bucket_end - self._now) / interval
+                self._now = bucket_end
+                self._bucket += 1
+                continue
+            docs = min(count - len(timestamps), int((bucket_end - first) // interval) + 1)
+            timestamps.extend([int(first + interval * i) for i in range(docs)])
+            self._now = first + interval * (docs - 1)
+            self._pending = 1.0
+        return timestamps
+
+
+class ReplayGenerator(HistogramGenerator):
+    """
+    Replays a histogram of relative doc counts, e.g. of the hourly ingest volume of a production cluster, given by the
+    parameter ``histogram``. The histogram covers ``period-days`` (default 1) days.
+    """
+
+    profile_type = "replay"
+
+    def _weights(self):
+        if "histogram" not in self._params:
+            raise exceptions.TrackConfigError('Profile [replay] requires the parameter "histogram"')
+        return self._params["histogram"]
+
+    def _period_days(self):
+        period_days = self._params.get("period-days", 1)
+        if period_days < 1:
+            raise exceptions.TrackConfigError(f'"period-days" of profile [replay] must be at least 1 but was [{period_days}]')
+        return period_days
@@ -0,0 +1,232 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import contextlib
+import fcntl
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+
+class GeneratedCorpusCache:
+    """
+    A cache of generated corpora with one folder per track id, i.e. per hash of the parameters which impact data
+    generation. Each folder has a manifest with the size, modification time and checksum of every file that has been
+    published to the cache as well as the time the corpus has last been used.
+
+    Concurrent Rally processes on the same host coordinate via lock files: a generation lock per client of a corpus, so
+    that a corpus is generated only once and not used before it is complete, a shared in-use lock per corpus, which is
+    held by every process that generates or reads the corpus so that it is not evicted while in use, and a lock for the
+    whole cache which is held while manifests are updated or corpora are evicted. The manifest and all other files of a
+    folder only describe complete files as they are replaced atomically.
+    """
+
+    MANIFEST = "manifest.json"
+    CACHE_LOCK = ".lock"
+    IN_USE_LOCK = ".in-use.lock"
+    CHECKSUM_CHUNK_SIZE = 1024 * 1024
+    # open in-use lock files of this process by path
+    _in_use = {}
+
+    def __init__(self, cache_dir, max_size_in_bytes=None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.max_size_in_bytes = max_size_in_bytes
+
+    @contextlib.contextmanager
+    def _lock(self, lock_file, name, blocking=True):
+        """
+        :return: A context manager holding an exclusive lock on ``lock_file``, which yields whether the lock has been
+                 acquired. Without ``blocking``, it does not wait if the lock is held by another process.
+        """
+        os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+        with open(lock_file, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                if not blocking:
+                    yield False
+                    return
+                self.logger.info("Waiting for [%s] which is locked by another process.", name)
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def generation_lock(self, track_id, client_index, blocking=True):
+        """
+        :return: A context manager holding the generation lock for a client of the corpus ``track_id``, which yields
+                 whether the lock has been acquired (see ``blocking``).
+        """
+        return self._lock(os.path.join(self.cache_dir, track_id, f"{client_index}.lock"), f"{track_id}/{client_index}", blocking)
+
+    def _cache_lock(self):
+        return self._lock(os.path.join(self.cache_dir, GeneratedCorpusCache.CACHE_LOCK), self.cache_dir)
+
+    def _in_use_lock_file(self, track_id):
+        return os.path.join(self.cache_dir, track_id, GeneratedCorpusCache.IN_USE_LOCK)
+
+    def use(self, track_id):
+        """
+        Marks the corpus ``track_id`` as used by this process so that it is not evicted by any process until ``release()``
+        is called or this process ends, i.e. for the whole race.
+        """
+        lock_file = self._in_use_lock_file(track_id)
+        if lock_file in GeneratedCorpusCache._in_use:
+            return
+        os.makedirs(os.path.dirname(lock_file), exist_ok=True)
+        # acquired with the cache lock so that the corpus is not removed by a concurrent eviction right after it is locked
+        with self._cache_lock():
+            f = open(lock_file, "a")
+            fcntl.flock(f, fcntl.LOCK_SH)
+        GeneratedCorpusCache._in_use[lock_file] = f
+
+    def release(self, track_id):
+        """
+        Releases the in-use lock of this process on the corpus ``track_id`` (see ``use()``).
+        """
+        f = GeneratedCorpusCache._in_use.pop(self._in_use_lock_file(track_id), None)
+        if f is not None:
+            # closing the file releases the lock
+            f.close()
+
+    @staticmethod
+    def _is_locked(lock_file):
+        with open(lock_file, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+
+    def _manifest_file(self, track_id):
+        return os.path.join(self.cache_dir, track_id, GeneratedCorpusCache.MANIFEST)
+
+    def _read_manifest(self, track_id):
+        try:
+            with open(self._manifest_file(track_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"last-used": 0, "files": {}}
+
+    def _write_manifest(self, track_id, manifest):
+        manifest_file = self._manifest_file(track_id)
+        with open(f"{manifest_file}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{manifest_file}.tmp", manifest_file)
+
+    @staticmethod
+    def checksum(file_name):
+        sha256 = hashlib.sha256()
+        with open(file_name, "rb") as f:
+            while chunk := f.read(GeneratedCorpusCache.CHECKSUM_CHUNK_SIZE):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @staticmethod
+    def _file_entry(file_name, checksum):
+        stat = os.stat(file_name)
+        return {"size": stat.st_size, "mtime-ns": stat.st_mtime_ns, "sha256": checksum}
+
+    def publish(self, track_id, file_names):
+        """
+        Adds complete files of the corpus ``track_id`` to its manifest and marks the corpus as used.
+
+        :param file_names: Names of files relative to the corpus folder.
+        """
+        # checksums are calculated without holding the cache lock as this might take a while for large files
+        entries = {}
+        for file_name in file_names:
+            path = os.path.join(self.cache_dir, track_id, file_name)
+            entries[file_name] = GeneratedCorpusCache._file_entry(path, GeneratedCorpusCache.checksum(path))
+        with self._cache_lock():
+            manifest = self._read_manifest(track_id)
+            manifest["files"].update(entries)
+            manifest["last-used"] = time.time()
+            self._write_manifest(track_id, manifest)
+
+    def verify(self, track_id, file_names):
+        """
+        Checks files of the corpus ``track_id`` against its manifest and marks the corpus as used if they are valid.
+        Checksums are only calculated for files which have been modified since they have been published, e.g. because
+        the corpus has been copied from another host.
+
+        :param file_names: Names of files relative to the corpus folder.
+        :return: ``True`` if all files are valid, ``False`` if any file is missing or differs from the manifest and
+                 ``None`` if any file is not in the manifest, e.g. for corpora generated with earlier versions.
+        """
+        manifest = self._read_manifest(track_id)
+        entries = {}
+        for file_name in file_names:
+            expected = manifest["files"].get(file_name)
+            if expected is None:
+                return None
+            path = os.path.join(self.cache_dir, track_id, file_name)
+            if not os.path.exists(path) or os.path.getsize(path) != expected["size"]:
+                self.logger.warning("File [%s] of generated corpus [%s] is missing or has an unexpected size.", file_name, track_id)
+                return False
+            if os.stat(path).st_mtime_ns != expected["mtime-ns"]:
+                checksum = GeneratedCorpusCache.checksum(path)
+                if checksum != expected["sha256"]:
+                    self.logger.warning("File [%s] of generated corpus [%s] has an unexpected checksum.", file_name, track_id)
+                    return False
+                entries[file_name] = GeneratedCorpusCache._file_entry(path, checksum)
+        with self._cache_lock():
+            manifest = self._read_manifest(track_id)
+            manifest["files"].update(entries)
+            manifest["last-used"] = time.time()
+            self._write_manifest(track_id, manifest)
+        return True
+
+    def evict(self, keep=None):
+        """
+        Removes least recently used corpora until the cache is not larger than ``max_size_in_bytes``. Corpora which are
+        currently being generated or used by any process and the corpus ``keep`` are never removed. Only corpora with a
+        manifest are considered.
+        """
+        if self.max_size_in_bytes is None:
+            return
+        with self._cache_lock():
+            corpora = []
+            for manifest_file in glob.glob(os.path.join(self.cache_dir, "*", GeneratedCorpusCache.MANIFEST)):
+                track_id = os.path.basename(os.path.dirname(manifest_file))
+                manifest = self._read_manifest(track_id)
+                size_in_bytes = sum(entry["size"] for entry in manifest["files"].values())
+                corpora.append((manifest["last-used"], track_id, size_in_bytes))
+            total_size_in_bytes = sum(size_in_bytes for _, _, size_in_bytes in corpora)
+            for _, track_id, size_in_bytes in sorted(corpora):
+                if total_size_in_bytes <= self.max_size_in_bytes:
+                    break
+                if track_id == keep:
+                    continue
+                if any(GeneratedCorpusCache._is_locked(f) for f in glob.glob(os.path.join(self.cache_dir, track_id, "*.lock"))):
+                    continue
+                # held until the corpus is removed as readers cannot acquire their shared lock while the cache lock is held
+                with self._lock(self._in_use_lock_file(track_id), track_id, blocking=False) as unused:
+                    if not unused:
+                        self.logger.info("Not evicting generated corpus [%s] as it is used by another process.", track_id)
+                        continue
+                    self.logger.info("Evicting generated corpus [%s] with [%d] bytes from the cache.", track_id, size_in_bytes)
+                    # the manifest is removed first so that the corpus is not considered in case removal fails halfway
+                    os.remove(self._manifest_file(track_id))
+                    shutil.rmtree(os.path.join(self.cache_dir, track_id), ignore_errors=True)
+                total_size_in_bytes -= size_in_bytes
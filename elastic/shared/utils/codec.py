@@ -0,0 +1,168 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import json
+from enum import Enum
+
+from esrally import exceptions
+
+"""
+    JSON codecs used in per-document loops. Each codec provides:
+
+    * ``loads`` - parses a document (str or UTF-8 encoded bytes).
+    * ``dumps`` and ``dumps_compact`` - serialize a document exactly like ``json.dumps`` with the default separators
+      (', ' and ': ') respectively without any whitespace. Generated corpora (and thus ``MagicNumbers`` as well as doc
+      sizes) depend on this format, so these always produce the same output irrespective of the codec.
+    * ``encode`` - serializes a document to any valid (compact) JSON as fast as possible, e.g. for bulk requests.
+
+    Codecs based on third-party libraries are only available if the respective library is installed. They fall back to
+    the standard library for documents the library cannot handle (e.g. integers exceeding 64 bit or NaN) so that results
+    are identical to the standard library. The codec "auto" selects the fastest available codec.
+"""
+
+__CODECS = {}
+__CODEC_INSTANCES = {}
+
+
+class CodecType(Enum):
+    Stdlib = 1
+    Orjson = 2
+    Ujson = 3
+    Simdjson = 4
+
+
+AUTO = "auto"
+# integers outside of the 64 bit range have at least 19 digits. Translating all digits to "0" and anything else to " "
+# allows to search for them considerably faster than with a regular expression.
+DIGITS_TABLE = bytes(ord("0") if ord("0") <= i <= ord("9") else ord(" ") for i in range(256))
+LARGE_INTEGER_DIGITS = b"0" * 19
+
+
+class StdlibCodec:
+    def __init__(self):
+        # json.dumps creates a new encoder on every call if any non-default arguments are passed
+        self._encoder = json.JSONEncoder()
+        self._compact_encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def loads(self, doc):
+        return json.loads(doc)
+
+    def dumps(self, doc):
+        return self._encoder.encode(doc)
+
+    def dumps_compact(self, doc):
+        return self._compact_encoder.encode(doc)
+
+    def encode(self, doc):
+        return self._compact_encoder.encode(doc)
+
+
+class OrjsonCodec(StdlibCodec):
+    def __init__(self):
+        super().__init__()
+        import orjson
+
+        self._orjson = orjson
+
+    def loads(self, doc):
+        raw_doc = doc if isinstance(doc, bytes) else doc.encode("utf-8", "surrogatepass")
+        # orjson silently parses integers exceeding 64 bit as floats
+        if LARGE_INTEGER_DIGITS in raw_doc.translate(DIGITS_TABLE):
+            return json.loads(doc)
+        try:
+            return self._orjson.loads(raw_doc)
+        except self._orjson.JSONDecodeError:
+            return json.loads(doc)
+
+    def encode(self, doc):
+        try:
+            return self._orjson.dumps(doc).decode("utf-8")
+        # raised e.g. for integers exceeding 64 bit
+        except self._orjson.JSONEncodeError:
+            return super().encode(doc)
+
+
+class UjsonCodec(StdlibCodec):
+    def __init__(self):
+        super().__init__()
+        import ujson
+
+        self._ujson = ujson
+
+    def loads(self, doc):
+        try:
+            return self._ujson.loads(doc)
+        except (ValueError, OverflowError):
+            return json.loads(doc)
+
+    def encode(self, doc):
+        try:
+            return self._ujson.dumps(doc, ensure_ascii=False, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return super().encode(doc)
+
+
+class SimdjsonCodec(StdlibCodec):
+    def __init__(self):
+        super().__init__()
+        import simdjson
+
+        self._simdjson = simdjson
+
+    def loads(self, doc):
+        try:
+            return self._simdjson.loads(doc)
+        except ValueError:
+            return json.loads(doc)
+
+
+def register_codec(codec_type, codec):
+    __CODECS[codec_type] = codec
+
+
+def available_codecs():
+    """
+    :return: The names of all registered codecs that can be used in this environment, in order of preference.
+    """
+    available = []
+    for codec_type in __CODECS.keys():
+        try:
+            get_codec(codec_type)
+            available.append(codec_type)
+        except exceptions.TrackConfigError:
+            pass
+    return available
+
+
+def get_codec(codec_type=AUTO):
+    if codec_type == AUTO:
+        # all codecs produce identical results so select the first available one
+        return get_codec(available_codecs()[0])
+    if codec_type not in __CODECS:
+        raise exceptions.TrackConfigError(f"[{codec_type}] is not a registered JSON codec")
+    if codec_type not in __CODEC_INSTANCES:
+        try:
+            __CODEC_INSTANCES[codec_type] = __CODECS[codec_type]()
+        except ImportError:
+            raise exceptions.TrackConfigError(f"JSON codec [{codec_type}] is not available. Install the respective library and try again.")
+    return __CODEC_INSTANCES[codec_type]
+
+
+# in order of preference for "auto"
+register_codec(CodecType.Orjson.name.lower(), OrjsonCodec)
+register_codec(CodecType.Ujson.name.lower(), UjsonCodec)
+register_codec(CodecType.Simdjson.name.lower(), SimdjsonCodec)
+register_codec(CodecType.Stdlib.name.lower(), StdlibCodec)
@@ -0,0 +1,214 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import gzip
+import io
+import zlib
+from enum import Enum
+
+from esrally import exceptions
+
+"""
+    Block compression for generated corpora. A block compressed file is a sequence of independently decompressible
+    blocks (gzip members or zstd frames), i.e. it can be decompressed as a whole with the respective standard tools but
+    also starting at the beginning of any block. Each compression provides:
+
+    * ``file_extension`` - the extension which is appended to the name of the uncompressed file.
+    * ``compressor()`` - returns an object with ``compress(data)`` and ``flush()`` which creates a single block.
+    * ``reader(raw_file)`` - returns a binary file-like object which decompresses all blocks from the current position
+      of ``raw_file`` onwards.
+
+    Compressions based on third-party libraries are only available if the respective library is installed.
+"""
+
+__COMPRESSIONS = {}
+__COMPRESSION_INSTANCES = {}
+
+
+class CompressionType(Enum):
+    Gzip = 1
+    Zstd = 2
+
+
+class GzipCompression:
+    file_extension = ".gz"
+
+    def __init__(self, level=6):
+        self.level = level
+
+    def compressor(self):
+        # a window size of 16 + MAX_WBITS writes a gzip header and trailer
+        return zlib.compressobj(self.level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def reader(self, raw_file):
+        # reads across gzip members
+        return gzip.GzipFile(fileobj=raw_file, mode="rb")
+
+
+class ZstdCompression:
+    file_extension = ".zst"
+
+    def __init__(self, level=3):
+        import zstandard
+
+        self._zstandard = zstandard
+        self.level = level
+
+    def compressor(self):
+        return _ZstdBlockCompressor(self._zstandard.ZstdCompressor(level=self.level).compressobj())
+
+    def reader(self, raw_file):
+        return io.BufferedReader(self._zstandard.ZstdDecompressor().stream_reader(raw_file, read_across_frames=True, closefd=False))
+
+
+class _ZstdBlockCompressor:
+    def __init__(self, compressobj):
+        self._compressobj = compressobj
+
+    def compress(self, data):
+        return self._compressobj.compress(data)
+
+    def flush(self):
+        # ends the frame, the default, to make it decompressible independently
+        return self._compressobj.flush()
+
+
+def register_compression(compression_type, compression):
+    __COMPRESSIONS[compression_type] = compression
+
+
+def get_compression(compression_type):
+    if compression_type not in __COMPRESSIONS:
+        raise exceptions.TrackConfigError(f"[{compression_type}] is not a registered compression")
+    if compression_type not in __COMPRESSION_INSTANCES:
+        try:
+            __COMPRESSION_INSTANCES[compression_type] = __COMPRESSIONS[compression_type]()
+        except ImportError:
+            raise exceptions.TrackConfigError(
+                f"Compression [{compression_type}] is not available. Install the respective library and try again."
+            )
+    return __COMPRESSION_INSTANCES[compression_type]
+
+
+def compression_for_file(file_name):
+    """
+    :return: The compression of a block compressed file based on its extension or ``None`` if it is not compressed.
+    """
+    for compression_type, compression in __COMPRESSIONS.items():
+        if file_name.endswith(compression.file_extension):
+            return get_compression(compression_type)
+    return None
+
+
+class BlockCompressedWriter:
+    """
+    Writes text to a block compressed file. ``start_block()`` ends the current block so that the position returned by
+    ``tell()`` afterwards is the start of a block. With ``append`` set, the file must end with a complete block.
+    """
+
+    def __init__(self, file_name, compression, append=False):
+        self._compression = compression
+        self._raw_file = open(file_name, "ab" if append else "wb")
+        self._compressor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    def writelines(self, lines):
+        if self._compressor is None:
+            self._compressor = self._compression.compressor()
+        self._raw_file.write(self._compressor.compress("".join(lines).encode("utf-8")))
+
+    def start_block(self):
+        if self._compressor is not None:
+            self._raw_file.write(self._compressor.flush())
+            self._compressor = None
+
+    def tell(self):
+        return self._raw_file.tell()
+
+    def flush(self):
+        # only data of completed blocks is written
+        self._raw_file.flush()
+
+    def close(self):
+        self.start_block()
+        self._raw_file.close()
+
+
+class BlockCompressedSource:
+    """
+    A file source (see ``esrally.utils.io.MmapSource``) for block compressed files. ``seek()`` only supports positions
+    at the start of a block, e.g. those in the ``.offset`` file written along with the compressed file.
+    """
+
+    def __init__(self, file_name, mode, encoding="utf-8"):
+        self.file_name = file_name
+        self.mode = mode
+        self.encoding = encoding
+        self._compression = compression_for_file(file_name)
+        self._raw_file = None
+        self._reader = None
+
+    def open(self):
+        self._raw_file = open(self.file_name, "rb")
+        self._reader = self._compression.reader(self._raw_file)
+        return self
+
+    def seek(self, offset):
+        self._raw_file.seek(offset)
+        # the decompressor's state is only valid for the previous position
+        self._reader = self._compression.reader(self._raw_file)
+
+    def read(self):
+        return self._reader.read()
+
+    def readline(self):
+        return self._reader.readline()
+
+    def readlines(self, num_lines):
+        lines = []
+        reader = self._reader
+        for _ in range(num_lines):
+            line = reader.readline()
+            if line == b"":
+                break
+            lines.append(line)
+        return lines
+
+    def close(self):
+        self._reader = None
+        self._raw_file.close()
+        self._raw_file = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    def __str__(self):
+        return self.file_name
+
+
+register_compression(CompressionType.Gzip.name.lower(), GzipCompression)
+register_compression(CompressionType.Zstd.name.lower(), ZstdCompression)
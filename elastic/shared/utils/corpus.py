@@ -15,11 +15,111 @@
 # specific language governing permissions and limitations
 # under the License.
 import math
+import random
 import re
+from bisect import bisect
+from itertools import accumulate, repeat
 
 from esrally.exceptions import InvalidSyntax
 
 
+class CorpusSelector:
+    """
+    Selects corpora at random by weight with the random generator ``rng`` (by default the global one). The sequence of
+    selected corpora is identical to repeated calls of ``rng.choices(corpora, weights=weights)[0]`` but cumulative
+    weights are only calculated once and corpora are drawn in blocks of ``block_size`` to avoid the overhead of a
+    function call per selection.
+    """
+
+    BLOCK_SIZE = 4096
+
+    def __init__(self, corpora, weights, block_size=BLOCK_SIZE, rng=random):
+        self._rng = rng
+        self._corpora = list(corpora)
+        self._cum_weights = list(accumulate(weights))
+        # the same conversion as random.choices()
+        self._total = self._cum_weights[-1] + 0.0
+        self._block_size = block_size
+        self._block = []
+        self._block_state = None
+        self._position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position == len(self._block):
+            self._draw_block()
+        corpus = self._block[self._position]
+        self._position += 1
+        return corpus
+
+    def _draw_block(self):
+        self._block_state = self._rng.getstate()
+        corpora = self._corpora
+        cum_weights = self._cum_weights
+        total = self._total
+        hi = len(corpora) - 1
+        rand = self._rng.random
+        self._block = [corpora[bisect(cum_weights, rand() * total, 0, hi)] for _ in repeat(None, self._block_size)]
+        self._position = 0
+
+    def random_state(self):
+        """
+        :return: The state of the random generator as if corpora had been selected one by one, i.e. the state
+                 from which the next selection continues.
+        """
+        if not self._block:
+            return self._rng.getstate()
+        state = self._rng.getstate()
+        self._rng.setstate(self._block_state)
+        rand = self._rng.random
+        for _ in repeat(None, self._position):
+            rand()
+        selection_state = self._rng.getstate()
+        self._rng.setstate(state)
+        return selection_state
+
+
+class VolumeTarget:
+    """
+    Determines when to stop reading batches of docs. With "approximate", reading stops after the batch which reaches
+    the number of docs, i.e. up to a whole batch too many docs are read. With "docs", the last batch is reduced to
+    exactly the number of docs. With "bytes", reading stops at the doc which reaches the raw data volume (the sum of
+    message sizes). As the number of docs left is estimated from the average raw size of the docs read so far, batches
+    get smaller towards the end, down to single docs.
+    """
+
+    MODES = ["approximate", "docs", "bytes"]
+
+    def __init__(self, mode, docs, size_in_bytes=None):
+        self.mode = mode
+        self.docs = docs
+        self.size_in_bytes = size_in_bytes
+
+    def reached(self, docs, size_in_bytes):
+        if self.mode == "bytes":
+            return size_in_bytes >= self.size_in_bytes
+        return docs >= self.docs
+
+    def batch_size(self, batch_size, docs, size_in_bytes):
+        """
+        :param batch_size: The current batch size.
+        :param docs: The number of docs read so far.
+        :param size_in_bytes: The raw size of the docs read so far.
+        :return: The size of the next batch, which is never larger than ``batch_size``.
+        """
+        if self.mode == "docs":
+            # the number of docs might be fractional, e.g. for a fractional number of days
+            remaining = math.ceil(self.docs - docs)
+        elif self.mode == "bytes" and size_in_bytes > 0:
+            # halving the estimate avoids overshooting the volume due to docs which are larger than average
+            remaining = int((self.size_in_bytes - size_in_bytes) * docs // (size_in_bytes * 2))
+        else:
+            return batch_size
+        return max(min(remaining, batch_size), 1)
+
+
 def calculate_integration_ratios(corpus_counts):
     total_docs = sum(corpus_counts.values())
     corpora_ratios = {}
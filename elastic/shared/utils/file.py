@@ -16,8 +16,13 @@
 # under the License.
 import json
 import logging
+import mmap
 import os
+import queue
+import threading
 import time
+import weakref
+from array import array
 
 from esrally import exceptions
 from esrally.track.params import Slice
@@ -157,6 +162,169 @@ class CorpusReader:
         # this might be called quite frequently during throttling.
         # We don't loop over the readers to save time and lazily apply
 
+    def position(self):
+        """
+        :return: The current reader and the number of lines read from each reader since it has last been reset.
+        """
+        return [self._current_reader, [reader.file_source.current_line for reader in self.readers]]
+
+    def seek(self, position):
+        """
+        Continues reading at a position returned by ``position()``, e.g. of a previous reader of the same files. Requires
+        the readers to be open.
+        """
+        self._current_reader, lines = position
+        for reader, current_line in zip(self.readers, lines):
+            reader.file_source.seek_line(current_line)
+
+
+class LiveCorpusReader:
+    """
+    Reads bulks from batches of docs which are generated on the fly instead of from files (see
+    ``CorpusGenerator.live_batches()``). Lines are processed exactly like lines read from a generated file by a
+    ``BulkFileReader``. At most one batch is buffered, so memory is bounded by the generator's batch size.
+    """
+
+    def __init__(self, batches, processor, bulk_size, corpus_name):
+        self.batches = batches
+        self.processor = processor
+        self.bulk_size = bulk_size
+        self.corpus_name = corpus_name
+        self._lines = []
+        self._position = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # bulks size must be even or we wont get meta
+        bulk_size = self.bulk_size + 1 if self.bulk_size % 2 == 1 else self.bulk_size
+        b_docs = []
+        while len(b_docs) < bulk_size:
+            if self._position == len(self._lines):
+                _, self._lines, _ = next(self.batches)
+                self._position = 0
+            end = min(self._position + bulk_size - len(b_docs), len(self._lines))
+            b_docs.extend(self._lines[self._position : end])
+            self._position = end
+        docs = []
+        total_size = 0
+        for i, line in enumerate(b_docs):
+            doc, size = self.processor(line.encode("utf-8"), i, self.corpus_name)
+            docs.append(doc)
+            total_size += size
+        return int(len(docs) / 2), docs, total_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        self.batches.close()
+
+    def set_bulk_size(self, bulk_size):
+        self.bulk_size = bulk_size
+
+
+class Prefetcher:
+    """
+    Calls ``read`` in a background thread and keeps up to ``depth`` of its results ready for the consumer, so that e.g.
+    reading and processing the next bulks overlaps with waiting for the response to the current one. Results are
+    returned in order and any error raised by ``read`` is re-raised on the consumer's side. Iteration ends when ``read``
+    raises ``StopIteration``. With a depth of 0, ``read`` is called synchronously.
+
+    ``read`` must only use state which is safe to access from another thread, or which is not accessed by the consumer.
+    The background thread only references the prefetcher weakly while it is not reading, so that it stops if the
+    prefetcher is garbage collected without having been closed, e.g. as part of an abandoned generator.
+    """
+
+    # interval in seconds in which a blocked background thread checks whether it should stop
+    STOP_CHECK_INTERVAL = 0.1
+    # marks the end of iteration in the queue of results
+    _END = object()
+
+    def __init__(self, read, depth, name="prefetcher"):
+        self.read = read
+        self.depth = depth
+        self.name = name
+        self._queue = None
+        self._stopped = threading.Event()
+        self._thread = None
+        self._error = None
+        self._exhausted = False
+
+    def __iter__(self):
+        return self
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    def start(self):
+        if self.depth > 0:
+            self._queue = queue.Queue(maxsize=self.depth)
+            self._stopped = threading.Event()
+            self._thread = threading.Thread(
+                target=Prefetcher._prefetch, args=(weakref.ref(self), self._stopped, self._queue), name=self.name, daemon=True
+            )
+            # stops the background thread if the prefetcher is garbage collected without being closed
+            weakref.finalize(self, self._stopped.set)
+            self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    @staticmethod
+    def _prefetch(prefetcher_ref, stopped, results):
+        while not stopped.is_set():
+            prefetcher = prefetcher_ref()
+            if prefetcher is None:
+                return
+            read = prefetcher.read
+            del prefetcher
+            try:
+                result = (read(), None)
+            except StopIteration:
+                result = (Prefetcher._END, None)
+            except BaseException as e:
+                result = (None, e)
+            del read
+            while not stopped.is_set():
+                try:
+                    results.put(result, timeout=Prefetcher.STOP_CHECK_INTERVAL)
+                    break
+                except queue.Full:
+                    pass
+            if result[0] is Prefetcher._END or result[1] is not None:
+                return
+
+    def __next__(self):
+        if self._thread is None:
+            return self.read()
+        # the background thread has terminated
+        if self._exhausted:
+            raise StopIteration()
+        if self._error is not None:
+            raise self._error
+        result, self._error = self._queue.get()
+        if self._error is not None:
+            raise self._error
+        if result is Prefetcher._END:
+            self._exhausted = True
+            raise StopIteration()
+        return result
+
 
 class CorporaReader:
     def __init__(self, corpus_readers):
@@ -173,15 +341,133 @@ class CorporaReader:
         return False
 
 
+class SharedMmap:
+    """
+    A process-wide registry of read-only memory maps so that all partitions of a param source which read the same file,
+    e.g. when every client reads the whole corpus, share a single mapping instead of mapping the file once per client.
+    Mappings are reference counted and closed once the last user has released them. Pages of read-only file mappings
+    are backed by the page cache, so they are also shared with the mappings of other worker processes on the same host.
+
+    Files are keyed by their path, size and modification time so that a file which has been replaced, e.g. a corpus
+    which has been generated again, gets a new mapping.
+    """
+
+    _lock = threading.Lock()
+    _mappings = {}
+
+    @classmethod
+    def acquire(cls, file_name):
+        """
+        :return: A tuple of the key of the mapping, to be passed to ``release()``, and the memory map of the file.
+        """
+        stat = os.stat(file_name)
+        key = (os.path.realpath(file_name), stat.st_size, stat.st_mtime_ns)
+        with SharedMmap._lock:
+            mapping = SharedMmap._mappings.get(key)
+            if mapping is None:
+                with open(file_name, "rb") as f:
+                    # the mapping stays valid after the file is closed
+                    mapping = [mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), 0]
+                SharedMmap._mappings[key] = mapping
+            mapping[1] += 1
+            return key, mapping[0]
+
+    @classmethod
+    def release(cls, key):
+        with SharedMmap._lock:
+            mapping = SharedMmap._mappings[key]
+            mapping[1] -= 1
+            if mapping[1] == 0:
+                del SharedMmap._mappings[key]
+                mapping[0].close()
+
+    @classmethod
+    def size(cls):
+        """
+        :return: The number of files which are currently mapped.
+        """
+        with SharedMmap._lock:
+            return len(SharedMmap._mappings)
+
+
+class SharedMmapSource:
+    """
+    A file source (see ``esrally.utils.io.MmapSource``) backed by a ``SharedMmap``. As the mapping is shared, each
+    source keeps track of its own position instead of relying on the position of the memory map.
+    """
+
+    def __init__(self, file_name, mode, encoding="utf-8"):
+        self.file_name = file_name
+        self.mode = mode
+        self.encoding = encoding
+        self.mm = None
+        self._key = None
+        self._position = 0
+
+    def open(self):
+        self._key, self.mm = SharedMmap.acquire(self.file_name)
+        self._position = 0
+        return self
+
+    def seek(self, offset):
+        self._position = offset
+
+    def read(self):
+        data = self.mm[self._position :]
+        self._position += len(data)
+        return data
+
+    def readline(self):
+        mm = self.mm
+        end = mm.find(b"\n", self._position)
+        end = len(mm) if end == -1 else end + 1
+        line = mm[self._position : end]
+        self._position = end
+        return line
+
+    def readlines(self, num_lines):
+        lines = []
+        mm = self.mm
+        size = len(mm)
+        position = self._position
+        for _ in range(num_lines):
+            if position >= size:
+                break
+            end = mm.find(b"\n", position)
+            end = size if end == -1 else end + 1
+            lines.append(mm[position:end])
+            position = end
+        self._position = position
+        return lines
+
+    def close(self):
+        self.mm = None
+        SharedMmap.release(self._key)
+        self._key = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
+        return False
+
+    def __str__(self):
+        return self.file_name
+
+
 class WrappingSlice(Slice):
     def __init__(self, source_class, offset, number_of_lines):
         super().__init__(source_class, offset, number_of_lines)
         self.logger = logging.getLogger(__name__)
+        self._file_name = None
         self._start_bytes = 0
         self._remaining_lines = 0
 
     def open(self, file_name, mode, bulk_size):
         self.bulk_size = bulk_size
+        self._file_name = file_name
         self.source = self.source_class(file_name, mode).open()
         self.logger.info(
             "Will read [%d] lines from [%s] starting from line [%d] with bulk size [%d].",
@@ -204,22 +490,45 @@ class WrappingSlice(Slice):
     def _open_skip(self, data_file_path):
         if self.offset == 0:
             return
+        # fast forward to the last known file offset
+        self._start_bytes, self._remaining_lines = self._line_position(data_file_path, self.offset)
+        self.set_position()
+
+    @staticmethod
+    def _line_position(data_file_path, line_number):
+        """
+        :return: A tuple of the closest known byte offset before the line with the given number and the number of lines
+                 that need to be skipped from there.
+        """
+        # the line index provides the exact position, so there are no lines left to skip on open or reset
+        line_position = LineIndex.position(data_file_path, line_number)
+        if line_position is not None:
+            return line_position, 0
         offset_file_path = f"{data_file_path}.offset"
         bytes_offset = 0
-        self._remaining_lines = self.offset
+        remaining_lines = line_number
         # can we fast forward?
         if os.path.exists(offset_file_path):
             with open(offset_file_path, mode="rt", encoding="utf-8") as offsets:
                 for line in offsets:
-                    line_number, offset_in_bytes = [int(i) for i in line.strip().split(";")]
-                    if line_number <= self.offset:
+                    line_number_at_offset, offset_in_bytes = [int(i) for i in line.strip().split(";")]
+                    if line_number_at_offset <= line_number:
                         bytes_offset = offset_in_bytes
-                        self._remaining_lines = self.offset - line_number
+                        remaining_lines = line_number - line_number_at_offset
                     else:
                         break
-        # fast forward to the last known file offset
-        self._start_bytes = bytes_offset
-        self.set_position()
+        return bytes_offset, remaining_lines
+
+    def seek_line(self, current_line):
+        """
+        Positions the slice at the given line relative to its start. In contrast to ``set_position()`` this does not
+        change where the slice starts after a reset.
+        """
+        bytes_offset, remaining_lines = self._line_position(self._file_name, self.offset + current_line)
+        self.source.seek(bytes_offset)
+        for line in range(remaining_lines):
+            self.source.readline()
+        self.current_line = current_line
 
     def set_bulk_size(self, bulk_size):
         self.bulk_size = bulk_size
@@ -240,12 +549,15 @@ class FileMetadata:
         if message_size is None:
             raise exceptions.DataError("message_size must not be None")
 
-        with open(FileMetadata._meta_data_file_name(output_folder, client_index), "w") as f:
+        meta_data_file = FileMetadata._meta_data_file_name(output_folder, client_index)
+        # metadata marks generated data as complete so it is replaced atomically
+        with open(f"{meta_data_file}.tmp", "w") as f:
             metadata = {
                 "number-of-documents": number_docs,
                 "message-size": message_size,
             }
             json.dump(metadata, f, indent=2)
+        os.replace(f"{meta_data_file}.tmp", meta_data_file)
 
     @classmethod
     def read(cls, filename):
@@ -256,3 +568,239 @@ class FileMetadata:
     @classmethod
     def _meta_data_file_name(cls, output_folder, client_index):
         return os.path.join(output_folder, f"{client_index}.metadata")
+
+
+class Checkpoint:
+    """
+    A sidecar file with the state of the generation of a data file at a point at which the data file and all other
+    sidecar files have been written up to the same doc. This allows to resume an interrupted generation from there.
+    """
+
+    @classmethod
+    def file_name(cls, data_file):
+        return f"{data_file}.checkpoint"
+
+    @classmethod
+    def exists(cls, data_file):
+        return os.path.exists(Checkpoint.file_name(data_file))
+
+    @classmethod
+    def remove(cls, data_file):
+        if Checkpoint.exists(data_file):
+            os.remove(Checkpoint.file_name(data_file))
+
+    @classmethod
+    def write(cls, data_file, checkpoint):
+        # replace the previous checkpoint atomically so that there is always a complete checkpoint
+        with open(f"{Checkpoint.file_name(data_file)}.tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(f"{Checkpoint.file_name(data_file)}.tmp", Checkpoint.file_name(data_file))
+
+    @classmethod
+    def read(cls, data_file):
+        """
+        :return: The checkpoint or ``None`` if there is none.
+        """
+        if not Checkpoint.exists(data_file):
+            return None
+        with open(Checkpoint.file_name(data_file), "r") as f:
+            return json.load(f)
+
+
+class LineIndex:
+    """
+    A sidecar index for generated data files with the position of every line. It is an array of unsigned 64 bit
+    integers with the byte offset of the start of each line, followed by the size of the data file. In contrast to the
+    sparse ``.offset`` file, this allows to open a slice at an arbitrary line (and to reset it) without skipping lines.
+    """
+
+    TYPECODE = "Q"
+    ITEM_SIZE = array(TYPECODE).itemsize
+
+    @classmethod
+    def file_name(cls, data_file):
+        return f"{data_file}.lines"
+
+    @classmethod
+    def exists(cls, data_file):
+        return os.path.exists(LineIndex.file_name(data_file))
+
+    @classmethod
+    def remove(cls, data_file):
+        if LineIndex.exists(data_file):
+            os.remove(LineIndex.file_name(data_file))
+
+    @classmethod
+    def position(cls, data_file, line_number):
+        """
+        :return: The byte offset of the line with the given number or ``None`` if there is no (valid) line index.
+        """
+        if not LineIndex.exists(data_file):
+            return None
+        with open(LineIndex.file_name(data_file), "rb") as f:
+            entries = os.fstat(f.fileno()).st_size // LineIndex.ITEM_SIZE
+            if line_number >= entries:
+                return None
+            positions = array(LineIndex.TYPECODE)
+            f.seek(-LineIndex.ITEM_SIZE, os.SEEK_END)
+            positions.fromfile(f, 1)
+            f.seek(line_number * LineIndex.ITEM_SIZE)
+            positions.fromfile(f, 1)
+        # an index that does not end with the size of the data file is left over from a previous run
+        if positions[0] != os.path.getsize(data_file):
+            return None
+        return positions[1]
+
+
+class SpliceIndex:
+    """
+    A sidecar index for generated data files which allows to assemble bulk bodies without decoding docs or parsing their
+    markers. The index contains a fixed size record of 64 bit integers per doc, with the fields below, as well as a table
+    of the timestamp formats used in the file. All positions are absolute byte offsets in the data file.
+    """
+
+    # start of the action and meta-data line of a doc
+    META_START = 0
+    # start of the doc (i.e. the end of the action and meta-data line including the newline)
+    DOC_START = 1
+    # start and end of the section replaced by the generated timestamp, i.e. either the `_RALLYTSNNN<...>` placeholder
+    # or the value of `@timestamp`
+    SPLICE_START = 2
+    SPLICE_END = 3
+    # end of the doc excluding the "markers" key and the closing brackets
+    TAIL_END = 4
+    MESSAGE_SIZE = 5
+    # index in the table of timestamp formats or ISO_FORMAT_ID if the value of `@timestamp` is replaced
+    FORMAT_ID = 6
+    RECORD_SIZE = 7
+
+    ISO_FORMAT_ID = -1
+    TYPECODE = "q"
+
+    @classmethod
+    def index_file_name(cls, data_file):
+        return f"{data_file}.splice"
+
+    @classmethod
+    def formats_file_name(cls, data_file):
+        return f"{data_file}.splice-formats"
+
+    @classmethod
+    def exists(cls, data_file):
+        return os.path.exists(SpliceIndex.index_file_name(data_file)) and os.path.exists(SpliceIndex.formats_file_name(data_file))
+
+    @classmethod
+    def remove(cls, data_file):
+        for file_name in [SpliceIndex.index_file_name(data_file), SpliceIndex.formats_file_name(data_file)]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    @classmethod
+    def write_formats(cls, data_file, formats):
+        with open(SpliceIndex.formats_file_name(data_file), "w") as f:
+            json.dump(formats, f, indent=2)
+
+    @classmethod
+    def read_formats(cls, data_file):
+        with open(SpliceIndex.formats_file_name(data_file), "r") as f:
+            return json.load(f)
+
+
+class SpliceSlice:
+    """
+    Provides the docs at [offset, offset + number_of_docs) of a generated data file with a splice index. Instead of
+    lines, bulks are returned as ranges of doc numbers. The data file and its index are memory-mapped and exposed via
+    ``data`` and ``index``.
+    """
+
+    def __init__(self, offset, number_of_docs):
+        self.logger = logging.getLogger(__name__)
+        self.offset = offset
+        self.number_of_docs = number_of_docs
+        self.current_doc = 0
+        self.bulk_size = None
+        self.data = None
+        self.index = None
+        self.formats = None
+        self._mmap_keys = []
+
+    def open(self, file_name, mode, bulk_size):
+        self.set_bulk_size(bulk_size)
+        self.data = self._mmap(file_name)
+        self.index = memoryview(self._mmap(SpliceIndex.index_file_name(file_name))).cast(SpliceIndex.TYPECODE)
+        self.formats = SpliceIndex.read_formats(file_name)
+        self.logger.info(
+            "Will read [%d] docs from [%s] starting from doc [%d] with bulk size [%d] using its splice index.",
+            self.number_of_docs,
+            file_name,
+            self.offset,
+            self.bulk_size,
+        )
+        self.current_doc = 0
+        return self
+
+    def _mmap(self, file_name):
+        key, mm = SharedMmap.acquire(file_name)
+        self._mmap_keys.append(key)
+        return mm
+
+    def close(self):
+        if self.index is not None:
+            self.index.release()
+        self.index = None
+        self.data = None
+        for key in self._mmap_keys:
+            SharedMmap.release(key)
+        self._mmap_keys = []
+
+    def set_bulk_size(self, bulk_size):
+        # bulk sizes are specified in lines, i.e. two lines per doc
+        self.bulk_size = max(bulk_size // 2, 1)
+
+    def set_position(self):
+        self.current_doc = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.current_doc >= self.number_of_docs:
+            raise StopIteration()
+        start = self.offset + self.current_doc
+        docs = min(self.bulk_size, self.number_of_docs - self.current_doc)
+        self.current_doc += docs
+        return range(start, start + docs)
+
+    def __str__(self):
+        return "%s[%d;%d]" % (self.data, self.offset, self.offset + self.number_of_docs)
+
+
+class SpliceFileReader(FileReader):
+    """
+    Reads generated docs via a ``SpliceSlice``. The processor is called for each doc with the slice, the position of the
+    doc's record in the index and the line number of the doc in the bulk. It returns the doc as bytes and its size.
+    """
+
+    def open(self, bulk_size):
+        self.file_source.open(self.data_file, "rb", bulk_size)
+
+    def __next__(self):
+        try:
+            doc_numbers = next(self.file_source)
+            data = self.file_source.data
+            index = self.file_source.index
+            docs = []
+            total_size = 0
+            for i, doc_number in enumerate(doc_numbers):
+                record = doc_number * SpliceIndex.RECORD_SIZE
+                # action and meta-data line without the newline
+                docs.append(data[index[record + SpliceIndex.META_START] : index[record + SpliceIndex.DOC_START] - 1])
+                doc, size = self.processor(self.file_source, record, i * 2 + 1)
+                docs.append(doc)
+                total_size += size
+            return docs, total_size
+        except IOError:
+            self.logger.exception("Could not read [%s]", self.data_file)
+            raise
+        except StopIteration:
+            return None, 0
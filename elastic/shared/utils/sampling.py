@@ -0,0 +1,221 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import hashlib
+import json
+import math
+import mmap
+import os
+import random
+
+from esrally import exceptions
+from shared.utils.cache import GeneratedCorpusCache
+
+# sampling is independent of the random seed of data generation so that sampled stats can be shared
+SAMPLING_SEED = 13
+
+
+def sample_lines(data_files, sample_size, seed=SAMPLING_SEED):
+    """
+    Samples lines at random positions across files, as if the files were concatenated. The files are split into
+    ``sample_size`` strata of equal size in bytes and one line is sampled per stratum, so that the sample covers the
+    files evenly. For a random position, the line *after* the one containing the position is sampled as the line
+    containing it would be chosen with a probability proportional to its length. Lines are sampled in file order.
+
+    :param data_files: Paths to files with one document per line.
+    :param sample_size: Number of lines to sample. Lines might be sampled multiple times if the files have fewer lines.
+    :param seed: Seed for the random positions.
+    :return: A generator of the sampled lines as bytes.
+    """
+    sizes = [os.path.getsize(data_file) for data_file in data_files]
+    total_size = sum(sizes)
+    if total_size == 0:
+        raise exceptions.DataError(f"Cannot sample lines from empty files {data_files}")
+    rng = random.Random(seed)
+    stratum_size = total_size / sample_size
+    positions = [min(int((stratum + rng.random()) * stratum_size), total_size - 1) for stratum in range(sample_size)]
+    file_start = 0
+    sampled = 0
+    for data_file, size in zip(data_files, sizes):
+        if size == 0:
+            continue
+        with open(data_file, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            while sampled < sample_size and positions[sampled] < file_start + size:
+                mm.seek(positions[sampled] - file_start)
+                # skip the remainder of the line containing the position
+                mm.readline()
+                line = mm.readline()
+                if not line:
+                    # wrap around to the first line of the file
+                    mm.seek(0)
+                    line = mm.readline()
+                sampled += 1
+                yield line
+        file_start += size
+
+
+class CorpusStats:
+    """
+    A cache of sampled stats of a source corpus, stored in the corpus' folder. Stats are stored by a key which
+    includes the checksums of the corpus' files. Checksums are calculated once per file and are only calculated again
+    if the size or modification time of the file changes.
+    """
+
+    @classmethod
+    def file_name(cls, corpus_folder):
+        return os.path.join(corpus_folder, "sample-stats.json")
+
+    @classmethod
+    def _read(cls, corpus_folder):
+        try:
+            with open(CorpusStats.file_name(corpus_folder), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"files": {}, "stats": {}}
+
+    @classmethod
+    def _write(cls, corpus_folder, cache):
+        os.makedirs(corpus_folder, exist_ok=True)
+        # concurrent writers (e.g. generators of multiple clients) might overwrite each other's entries but the file is
+        # always complete
+        file_name = CorpusStats.file_name(corpus_folder)
+        with open(f"{file_name}.{os.getpid()}.tmp", "w") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(f"{file_name}.{os.getpid()}.tmp", file_name)
+
+    @classmethod
+    def key(cls, corpus_folder, data_files, parameters):
+        """
+        :param data_files: The files of the corpus.
+        :param parameters: Any other parameters the stats depend on.
+        :return: The key of the stats of the current contents of ``data_files``.
+        """
+        cache = CorpusStats._read(corpus_folder)
+        checksums = []
+        modified = False
+        for data_file in data_files:
+            stat = os.stat(data_file)
+            entry = cache["files"].get(data_file)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime-ns"] != stat.st_mtime_ns:
+                entry = {"size": stat.st_size, "mtime-ns": stat.st_mtime_ns, "sha256": GeneratedCorpusCache.checksum(data_file)}
+                cache["files"][data_file] = entry
+                modified = True
+            checksums.append(entry["sha256"])
+        if modified:
+            CorpusStats._write(corpus_folder, cache)
+        return hashlib.sha256(json.dumps({"checksums": checksums, "parameters": parameters}, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def read(cls, corpus_folder, key):
+        """
+        :return: The stats stored by ``key`` or ``None`` if there are none.
+        """
+        return CorpusStats._read(corpus_folder)["stats"].get(key)
+
+    @classmethod
+    def write(cls, corpus_folder, key, stats):
+        cache = CorpusStats._read(corpus_folder)
+        cache["stats"][key] = stats
+        CorpusStats._write(corpus_folder, cache)
+
+
+class CorpusStatsIndex:
+    """
+    Stats of all docs of a source corpus file, stored in ``{corpus_folder}/{file_name}.stats``. Stats depend on how
+    docs are processed for data generation, so they are only valid for the same parameters and as long as the size and
+    modification time of the file are unchanged. Stats of multiple files can be merged (see ``merge()``):
+
+    * ``number-of-documents``
+    * ``total-message-size``, ``total-doc-size`` and ``total-doc-size-with-meta`` - as reported by the processor
+    * ``message-size-histogram`` and ``doc-size-histogram`` - counts by bucket (see ``bucket()``)
+    * ``field-presence`` - the number of docs with each top-level field of the source docs
+    """
+
+    # buckets grow by a factor of 2 ** (1 / BUCKETS_PER_DOUBLING), i.e. by about 19%
+    BUCKETS_PER_DOUBLING = 4
+
+    @classmethod
+    def file_name(cls, corpus_folder, data_file):
+        return os.path.join(corpus_folder, f"{os.path.basename(data_file)}.stats")
+
+    @classmethod
+    def read(cls, corpus_folder, data_file, parameters):
+        """
+        :return: The stats of ``data_file`` or ``None`` if there are no stats or they are stale.
+        """
+        try:
+            with open(CorpusStatsIndex.file_name(corpus_folder, data_file), "r") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return None
+        stat = os.stat(data_file)
+        if index["size"] != stat.st_size or index["mtime-ns"] != stat.st_mtime_ns or index["parameters"] != parameters:
+            return None
+        return index["stats"]
+
+    @classmethod
+    def write(cls, corpus_folder, data_file, parameters, stats):
+        os.makedirs(corpus_folder, exist_ok=True)
+        stat = os.stat(data_file)
+        file_name = CorpusStatsIndex.file_name(corpus_folder, data_file)
+        with open(f"{file_name}.{os.getpid()}.tmp", "w") as f:
+            json.dump({"size": stat.st_size, "mtime-ns": stat.st_mtime_ns, "parameters": parameters, "stats": stats}, f, indent=2)
+        os.replace(f"{file_name}.{os.getpid()}.tmp", file_name)
+
+    @classmethod
+    def bucket(cls, value):
+        """
+        :return: The histogram bucket of a positive value. Bucket ``b`` holds values up to ``upper_bound(b)``.
+        """
+        return max(math.ceil(math.log2(max(value, 1)) * CorpusStatsIndex.BUCKETS_PER_DOUBLING), 0)
+
+    @classmethod
+    def upper_bound(cls, bucket):
+        return 2 ** (bucket / CorpusStatsIndex.BUCKETS_PER_DOUBLING)
+
+    @classmethod
+    def percentile(cls, histogram, percentile):
+        """
+        :param histogram: Counts by bucket, with buckets as strings as read from an index.
+        :return: The upper bound of the bucket which contains the given percentile (0-100).
+        """
+        buckets = sorted((int(bucket), count) for bucket, count in histogram.items())
+        rank = sum(count for _, count in buckets) * percentile / 100
+        seen = 0
+        for bucket, count in buckets:
+            seen += count
+            if seen >= rank:
+                return CorpusStatsIndex.upper_bound(bucket)
+        return None
+
+    @classmethod
+    def merge(cls, stats):
+        merged = {
+            "number-of-documents": 0,
+            "total-message-size": 0,
+            "total-doc-size": 0,
+            "total-doc-size-with-meta": 0,
+            "message-size-histogram": {},
+            "doc-size-histogram": {},
+            "field-presence": {},
+        }
+        for file_stats in stats:
+            for key in ["number-of-documents", "total-message-size", "total-doc-size", "total-doc-size-with-meta"]:
+                merged[key] += file_stats[key]
+            for key in ["message-size-histogram", "doc-size-histogram", "field-presence"]:
+                for name, count in file_stats[key].items():
+                    merged[key][name] = merged[key].get(name, 0) + count
+        return merged
@@ -16,13 +16,19 @@
 # under the License.
 import random
 import re
+import time
+from array import array
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from functools import cached_property
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Optional, Tuple
 
 from esrally import exceptions
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+MICROS_PER_SECOND = 1000000
+
 
 class TimeParsingError(Exception):
     """Exception raised for parameter parsing errors.
@@ -35,16 +41,103 @@ class TimeParsingError(Exception):
 
 
 class TimestampStructGenerator:
+    """
+    Generates points in time at given intervals from a starting point. The current point in time is kept as epoch
+    microseconds so that advancing it is an integer addition. ``datetime`` objects are only created by ``next()``.
+    """
+
     def __init__(self, starting_point):
-        self._starting_point = starting_point
+        self._epoch_micros = to_epoch_micros(starting_point)
+        self._tzinfo = starting_point.tzinfo
 
     def utcnow(self):
         # datetime.datetime.utcnow is not tz aware
         return datetime.now(timezone.utc)
 
+    def _to_datetime(self, epoch_micros):
+        point = from_epoch_micros(epoch_micros)
+        # points in time are returned in the time zone of the starting point
+        if self._tzinfo is None:
+            return point.replace(tzinfo=None)
+        if self._tzinfo is not timezone.utc:
+            return point.astimezone(self._tzinfo)
+        return point
+
     def next(self, delta):
-        self._starting_point = self._starting_point + delta
-        return self._starting_point
+        self._epoch_micros += delta // MICROSECOND
+        return self._to_datetime(self._epoch_micros)
+
+    def next_epoch_micros(self, delta, count):
+        """
+        Equivalent to calling ``next(delta)`` ``count`` times but avoids creating intermediate datetime objects.
+
+        :param delta: The interval as ``timedelta`` or as an integer number of microseconds.
+        :return: An array of the resulting points in time as epoch microseconds.
+        """
+        step = delta if isinstance(delta, int) else delta // MICROSECOND
+        start = self._epoch_micros
+        self._epoch_micros = start + step * count
+        if step == 0:
+            return array("q", [start] * count)
+        return array("q", range(start + step, start + step * (count + 1), step))
+
+
+def to_epoch_micros(point: datetime) -> int:
+    # naive points in time are interpreted as UTC
+    if point.tzinfo is None:
+        point = point.replace(tzinfo=timezone.utc)
+    return (point - EPOCH) // MICROSECOND
+
+
+def from_epoch_micros(micros: int) -> datetime:
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def to_epoch_millis(point: datetime) -> int:
+    return to_epoch_micros(point) // 1000
+
+
+def from_epoch_millis(millis: int) -> datetime:
+    return EPOCH + timedelta(milliseconds=millis)
+
+
+class TimestampFormatter:
+    """
+    Formats timestamps given as epoch microseconds. Except for "%s", formatted values only depend on the second of a
+    timestamp and consecutive docs mostly share it, so the most recently formatted value is cached per format.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._iso_cache = (None, None)
+
+    def strftime(self, ts_format: str, epoch_micros: int) -> str:
+        # %s is spuriously supported/implemented, depending on the platform's implementation of strftime. Here we
+        # specifically implement handling to mean timezone-less interpretation of the epoch
+        if ts_format == "%s":
+            # turns out float.__trunc__ is faster than builtins.int(<float>) per microbenchmark
+            return str((epoch_micros / MICROS_PER_SECOND).__trunc__())
+        seconds = epoch_micros // MICROS_PER_SECOND
+        cached = self._cache.get(ts_format)
+        if cached is None or cached[0] != seconds:
+            cached = (seconds, time.strftime(ts_format, from_epoch_micros(seconds * MICROS_PER_SECOND).timetuple()))
+            self._cache[ts_format] = cached
+        return cached[1]
+
+    def isoformat_seconds(self, epoch_micros: int) -> str:
+        """
+        :return: The timestamp formatted as ``yyyy-MM-ddTHH:mm:ss``, i.e. without fractional seconds and time zone.
+        """
+        seconds = epoch_micros // MICROS_PER_SECOND
+        cached = self._iso_cache
+        if cached[0] != seconds:
+            point = from_epoch_micros(seconds * MICROS_PER_SECOND)
+            cached = (
+                seconds,
+                "%04d-%02d-%02dT%02d:%02d:%02d" % (point.year, point.month, point.day, point.hour, point.minute, point.second),
+            )
+            self._iso_cache = cached
+        return cached[1]
 
 
 def random_duration_for_max(average_duration: int, min_seconds: int, max_seconds: int) -> Optional[int]:
@@ -116,6 +209,43 @@ def parse_date_optional_time(date_time: str):
     raise TimeParsingError(f"Invalid time format: {date_time}")
 
 
+def format_date_optional_time(point: datetime) -> str:
+    return f"{point.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]}Z"
+
+
+# units of Elasticsearch date math. Months and years are approximated.
+DATE_MATH_UNITS = {
+    "y": timedelta(days=365),
+    "M": timedelta(days=30),
+    "w": timedelta(weeks=1),
+    "d": timedelta(days=1),
+    "h": timedelta(hours=1),
+    "H": timedelta(hours=1),
+    "m": timedelta(minutes=1),
+    "s": timedelta(seconds=1),
+}
+RELATIVE_DATE_MATH_PATTERN = re.compile(r"^now(?:([+-])(\d+)([yMwdhHms]))?(?:/([yMwdhHms]))?$")
+
+
+def parse_relative_date_math(expression: Any, now: datetime) -> Optional[Tuple[datetime, Optional[str]]]:
+    """
+    Parses date math relative to now with at most one offset and an optional rounding, e.g. ``now-15m/m``. Rounding is
+    not applied to the returned point in time.
+
+    :return: A tuple of (point: datetime, rounding unit) or ``None`` if ``expression`` is not relative date math.
+    """
+    if not isinstance(expression, str):
+        return None
+    match = RELATIVE_DATE_MATH_PATTERN.match(expression)
+    if not match:
+        return None
+    sign, amount, unit, rounding = match.groups()
+    if amount is None:
+        return now, rounding
+    offset = int(amount) * DATE_MATH_UNITS[unit]
+    return (now + offset if sign == "+" else now - offset), rounding
+
+
 @dataclass
 class DateTimeValues:
     """
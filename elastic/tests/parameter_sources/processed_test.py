@@ -16,10 +16,15 @@
 # under the License.
 import json
 import os
+import random
+import shutil
 
 import pytest
 from esrally.exceptions import DataError, InvalidSyntax, TrackConfigError
 from shared.parameter_sources.processed import ProcessedCorpusParamSource
+from shared.track_processors.data_generator import CorpusGenerator
+from shared.utils.compression import BlockCompressedWriter, get_compression
+from shared.utils.file import FileMetadata, SpliceIndex
 from shared.utils.time import TimeParsingError
 from tests.parameter_sources import StaticTrack
 
@@ -724,3 +729,332 @@ def test_timestamp_corpus_read_from_multiple_integrations():
     expected_idx_name = "system-syslog-logs-2"
     assert idx_name == expected_idx_name
     assert doc_message == timestamps[expected_idx_name] + " workstation-03 systemd: Started Docker Cleanup."
+
+
+def test_splice_index_corpus_read(tmp_path):
+    cwd = os.path.dirname(__file__)
+    source_folder = os.path.join(cwd, "resources", "processed_test", "test_corpus_read_multiple_integrations")
+    # create a copy of the docs with markers (the remaining docs in this file have none) with a splice index
+    with open(os.path.join(source_folder, "0.json"), "rt") as f:
+        lines = f.readlines()[:36]
+    data_file = os.path.join(tmp_path, "0.json")
+    with open(data_file, "wt") as f:
+        f.writelines(lines)
+    FileMetadata.write(tmp_path, 0, len(lines) // 2, 600)
+    formats = {}
+    records, total_bytes = CorpusGenerator._splice_records(lines, 0, formats)
+    assert total_bytes == os.path.getsize(data_file)
+    with open(SpliceIndex.index_file_name(data_file), "wb") as f:
+        records.tofile(f)
+    SpliceIndex.write_formats(data_file, list(formats.keys()))
+    # and an identical copy without
+    os.mkdir(os.path.join(tmp_path, "plain"))
+    plain_data_file = os.path.join(tmp_path, "plain", "0.json")
+    shutil.copy(data_file, plain_data_file)
+    shutil.copy(os.path.join(tmp_path, "0.metadata"), os.path.join(tmp_path, "plain", "0.metadata"))
+
+    def create_param_source(document_path, partition_index):
+        test_track = StaticTrack(
+            parameters={
+                "track-id": "test_file_write",
+                "end-date": "2020-09-01:00:00:00",
+                "start-date": "2020-08-31:00:00:00",
+                "raw-data-volume-per-day": "0.01MB",
+                "random-seed": 13,
+            },
+            generated_document_paths=[document_path],
+        )
+        param_source = ProcessedCorpusParamSource(
+            track=test_track,
+            params={
+                "time-format": "milliseconds",
+                "profile": "fixed_interval",
+                "bulk-size": 3,
+            },
+        )
+        return param_source.partition(partition_index=partition_index, total_partitions=2)
+
+    def read_bulks(document_path, partition_index):
+        param_source = create_param_source(document_path, partition_index)
+        # the timestamp generator draws its initial offset from the global random generator
+        random.seed(13)
+        bulks = []
+        while True:
+            try:
+                params = param_source.params()
+            except StopIteration:
+                return bulks
+            bulks.append(
+                (
+                    [line.decode("utf-8") if isinstance(line, bytes) else line for line in params["body"]],
+                    params["bulk-size"],
+                    params["param-source-stats"]["raw-size-bytes"],
+                    params["param-source-stats"]["min-timestamp"],
+                    params["param-source-stats"]["max-timestamp"],
+                )
+            )
+
+    for partition_index in range(0, 2):
+        bulks = read_bulks(plain_data_file, partition_index)
+        assert len(bulks) > 1
+        # bulk bodies are assembled as bytes but are otherwise identical
+        assert read_bulks(data_file, partition_index) == bulks
+
+
+def test_prefetched_corpus_read():
+    cwd = os.path.dirname(__file__)
+
+    def read_bulks(prefetch_bulks, bulk_sizes):
+        test_track = StaticTrack(
+            parameters={
+                "track-id": "test_file_write",
+                "end-date": "2020-09-01:00:00:00",
+                "start-date": "2020-08-31:00:00:00",
+                "raw-data-volume-per-day": "0.01MB",
+                "random-seed": 13,
+            },
+            generated_document_paths=[os.path.join(cwd, "resources", "processed_test", "test_corpus_read", "0.json")],
+        )
+        param_source = ProcessedCorpusParamSource(
+            track=test_track,
+            params={
+                "time-format": "milliseconds",
+                "profile": "fixed_interval",
+                "bulk-size": 5,
+                "prefetch-bulks": prefetch_bulks,
+            },
+        ).partition(partition_index=0, total_partitions=1)
+        # the timestamp generator draws its initial offset from the global random generator
+        random.seed(13)
+        bulks = []
+        while True:
+            try:
+                params = param_source.params()
+            except StopIteration:
+                return bulks
+            bulks.append(
+                (
+                    params["body"],
+                    params["param-source-stats"]["min-timestamp"],
+                    params["param-source-stats"]["max-timestamp"],
+                    param_source.event_time_span,
+                )
+            )
+            if len(bulks) in bulk_sizes:
+                param_source.set_bulk_size(bulk_sizes[len(bulks)])
+
+    bulks = read_bulks(prefetch_bulks=0, bulk_sizes={})
+    assert len(bulks) > 10
+    # stats refer to the bulk handed out, not to the bulks read ahead
+    assert read_bulks(prefetch_bulks=2, bulk_sizes={}) == bulks
+
+    # bulk size changes apply at the latest after the bulks which have already been read ahead
+    docs_per_bulk = [len(bulk[0]) // 2 for bulk in read_bulks(prefetch_bulks=2, bulk_sizes={3: 2, 9: 3})]
+    assert docs_per_bulk[:3] == [5] * 3
+    assert docs_per_bulk[3:5] in [[5, 5], [5, 2], [2, 2]]
+    assert docs_per_bulk[5:9] == [2] * 4
+    assert docs_per_bulk[9:11] in [[2, 2], [2, 3], [3, 3]]
+    assert docs_per_bulk[11:13] == [3] * 2
+
+
+@pytest.mark.parametrize("prefetch_bulks", [0, 2])
+def test_exact_volume_target(prefetch_bulks):
+    cwd = os.path.dirname(__file__)
+
+    def read_bulks(volume_target):
+        test_track = StaticTrack(
+            parameters={
+                "track-id": "test_file_write",
+                "end-date": "2020-09-01:00:00:00",
+                "start-date": "2020-08-31:00:00:00",
+                "raw-data-volume-per-day": "0.01MB",
+                "volume-target": volume_target,
+            },
+            generated_document_paths=[os.path.join(cwd, "resources", "processed_test", "test_corpus_read", "0.json")],
+        )
+        param_source = ProcessedCorpusParamSource(
+            track=test_track,
+            params={"bulk-size": 7, "prefetch-bulks": prefetch_bulks},
+        ).partition(partition_index=0, total_partitions=1)
+        bulks = []
+        while True:
+            try:
+                params = param_source.params()
+            except StopIteration:
+                return param_source, bulks
+            assert len(params["body"]) == params["bulk-size"] * 2
+            bulks.append((params["bulk-size"], params["param-source-stats"]["raw-size-bytes"]))
+
+    param_source, bulks = read_bulks("approximate")
+    # the last bulk is not trimmed
+    assert sum(docs for docs, _ in bulks) > param_source.docs_per_client
+    assert bulks[-1][0] == 7
+
+    param_source, bulks = read_bulks("docs")
+    assert sum(docs for docs, _ in bulks) == param_source.docs_per_client
+    assert bulks[-1][0] < 7
+    assert param_source.percent_completed == 1.0
+
+    param_source, bulks = read_bulks("bytes")
+    assert param_source.bytes_per_client == int(0.01 * 1024 * 1024)
+    # stops at the doc which reaches the raw volume
+    assert sum(size for _, size in bulks[:-1]) < param_source.bytes_per_client <= sum(size for _, size in bulks)
+    assert bulks[-1][0] == 1
+
+
+def test_live_corpus_read():
+    def read_bulks(partition_index):
+        test_track = StaticTrack(
+            parameters={
+                "track-id": "test_live_corpus_read",
+                "end-date": "2020-09-01:00:00:00",
+                "start-date": "2020-08-31:00:00:00",
+                "raw-data-volume-per-day": "0.1MB",
+                "integration-ratios": {"system": {"corpora": {"system-logs": 0.5}}, "agent": {"corpora": {"agent-logs": 0.5}}},
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 7,
+                "data-generation-mode": "live",
+                "volume-target": "docs",
+                "track-data-root": os.path.join(os.path.dirname(__file__), "resources"),
+            }
+        )
+        param_source = ProcessedCorpusParamSource(track=test_track, params={"bulk-size": 5}).partition(
+            partition_index=partition_index, total_partitions=2
+        )
+        bulks = []
+        while True:
+            try:
+                params = param_source.params()
+            except StopIteration:
+                return param_source, bulks
+            assert len(params["body"]) == params["bulk-size"] * 2
+            bulks.append(params["body"])
+
+    param_source, bulks = read_bulks(0)
+    assert param_source.total_docs_per_day > 0
+    assert sum(len(bulk) // 2 for bulk in bulks) == param_source.docs_per_client
+    for bulk in bulks:
+        for action, doc in zip(bulk[::2], bulk[1::2]):
+            assert json.loads(action)["create"]["_index"] in ["logs-system.test", "logs-agent.test"]
+            assert json.loads(doc)["@timestamp"].startswith("2020-08-31")
+    # deterministic per client
+    assert read_bulks(0)[1] == bulks
+    assert read_bulks(1)[1] != bulks
+
+
+def test_live_corpus_read_without_track_data_root():
+    test_track = StaticTrack(
+        parameters={
+            "track-id": "test_live_corpus_read",
+            "raw-data-volume-per-day": "0.1MB",
+            "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+            "data-generation-mode": "live",
+        }
+    )
+    param_source = ProcessedCorpusParamSource(track=test_track, params={"bulk-size": 5}).partition(partition_index=0, total_partitions=1)
+    with pytest.raises(TrackConfigError) as config_error:
+        param_source.params()
+    assert config_error.value.message == (
+        'Live data generation requires the parameter "track-data-root" which is set by the data generator track processor'
+    )
+
+
+def test_profile_params():
+    cwd = os.path.dirname(__file__)
+    test_track = StaticTrack(
+        parameters={
+            "track-id": "test_file_write",
+            "end-date": "2020-09-01:00:00:00",
+            "start-date": "2020-08-31:00:00:00",
+            "raw-data-volume-per-day": "0.01MB",
+            "profile-params": {"histogram": [0, 1]},
+        },
+        generated_document_paths=[os.path.join(cwd, "resources", "processed_test", "test_corpus_read", "0.json")],
+    )
+    param_source = ProcessedCorpusParamSource(track=test_track, params={"bulk-size": 5, "profile": "replay"}).partition(
+        partition_index=0, total_partitions=1
+    )
+    params = param_source.params()
+    # no docs in the first half of the day
+    assert all(json.loads(doc)["@timestamp"] >= "2020-08-31T12:00:00" for doc in params["body"][1::2])
+
+
+def test_invalid_volume_target():
+    with pytest.raises(InvalidSyntax) as invalid_syntax:
+        ProcessedCorpusParamSource(
+            track=StaticTrack(
+                parameters={
+                    "track-id": "test_file_write",
+                    "raw-data-volume-per-day": "0.01MB",
+                }
+            ),
+            params={"bulk-size": 1, "volume-target": "lines"},
+        )
+    assert invalid_syntax.value.message == '"volume-target" must be one of [approximate, docs, bytes] but was [lines]'
+
+
+def test_negative_prefetch_bulks():
+    with pytest.raises(InvalidSyntax) as invalid_syntax:
+        ProcessedCorpusParamSource(
+            track=StaticTrack(
+                parameters={
+                    "track-id": "test_file_write",
+                    "raw-data-volume-per-day": "0.01MB",
+                }
+            ),
+            params={"bulk-size": 1, "prefetch-bulks": -1},
+        )
+    assert invalid_syntax.value.message == '"prefetch-bulks" must not be negative but was -1'
+
+
+@pytest.mark.parametrize("compression_type", ["gzip", "zstd"])
+def test_compressed_corpus_read(tmp_path, compression_type):
+    cwd = os.path.dirname(__file__)
+    source_folder = os.path.join(cwd, "resources", "processed_test", "test_corpus_read")
+    compression = get_compression(compression_type)
+    # create a block compressed copy with a block (and offset) every 10 lines
+    data_file = os.path.join(tmp_path, f"0.json{compression.file_extension}")
+    with open(os.path.join(source_folder, "0.json"), "rt") as f:
+        lines = f.readlines()
+    with BlockCompressedWriter(data_file, compression) as compressed_file, open(f"{data_file}.offset", "wt") as offset_file:
+        for line_number in range(0, len(lines), 10):
+            compressed_file.start_block()
+            if line_number > 0:
+                print("%d;%d" % (line_number, compressed_file.tell()), file=offset_file)
+            compressed_file.writelines(lines[line_number : line_number + 10])
+    shutil.copy(os.path.join(source_folder, "0.metadata"), os.path.join(tmp_path, "0.metadata"))
+
+    def read_bulks(document_path, partition_index):
+        test_track = StaticTrack(
+            parameters={
+                "track-id": "test_file_write",
+                "end-date": "2020-09-01:00:00:00",
+                "start-date": "2020-08-31:00:00:00",
+                "raw-data-volume-per-day": "0.01MB",
+                "random-seed": 13,
+            },
+            generated_document_paths=[document_path],
+        )
+        param_source = ProcessedCorpusParamSource(
+            track=test_track,
+            params={
+                "time-format": "milliseconds",
+                "profile": "fixed_interval",
+                "bulk-size": 4,
+            },
+        ).partition(partition_index=partition_index, total_partitions=2)
+        # the timestamp generator draws its initial offset from the global random generator
+        random.seed(13)
+        bulks = []
+        while True:
+            try:
+                params = param_source.params()
+            except StopIteration:
+                return bulks
+            bulks.append((params["body"], params["param-source-stats"]["max-timestamp"]))
+
+    for partition_index in range(0, 2):
+        bulks = read_bulks(os.path.join(source_folder, "0.json"), partition_index)
+        assert len(bulks) > 1
+        assert read_bulks(data_file, partition_index) == bulks
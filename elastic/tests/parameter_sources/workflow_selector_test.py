@@ -22,7 +22,11 @@ from math import ceil
 import pytest
 from esrally.exceptions import DataError, TrackConfigError
 from shared.parameter_sources import DEFAULT_MAX_DATE
-from shared.parameter_sources.workflow_selector import WorkflowSelectorParamSource
+from shared.parameter_sources.workflow_selector import (
+    ActionIndex,
+    ActionTemplate,
+    WorkflowSelectorParamSource,
+)
 from shared.utils.time import parse_date_optional_time
 from tests.parameter_sources import StaticTrack
 
@@ -671,3 +675,96 @@ def test_stringify_bool():
     WorkflowSelectorParamSource.stringify_bool(parameters)
     assert parameters["request_cache"] == "true"
     assert parameters["search_type"] == "query_then_fetch"
+
+
+def test_action_index():
+    action = {
+        "id": "1",
+        "requests": [
+            {
+                "stream": [
+                    {"operation-type": "search", "body": {"query": {"range": {"@timestamp": {"gte": "a", "lte": "b"}}}}},
+                    {"operation-type": "field-caps", "index": "logs-*"},
+                ]
+            },
+            {
+                "operation-type": "search",
+                "body": {"aggs": {"timeseries": {"date_histogram": {"field": "@timestamp"}}}},
+            },
+        ],
+    }
+    action_index = ActionIndex(action)
+    assert action_index.operation_paths == [("requests", 0, "stream", 0), ("requests", 0, "stream", 1), ("requests", 1)]
+    assert action_index.handler_paths == [
+        ("requests", 0, "stream", 0, "body", "query", "range"),
+        ("requests", 1, "body", "aggs", "timeseries", "date_histogram"),
+    ]
+    assert action_index.operations("search") == [action["requests"][0]["stream"][0], action["requests"][1]]
+    assert len(action_index.operations()) == 3
+    assert ActionIndex.get(action, action_index.handler_paths[1]) == {"field": "@timestamp"}
+    assert [query_handler.request_body for query_handler in action_index.query_handlers()] == [
+        {"@timestamp": {"gte": "a", "lte": "b"}},
+        {"field": "@timestamp"},
+    ]
+
+
+def test_action_template():
+    action = {
+        "id": "1",
+        "requests": [
+            {
+                "operation-type": "search",
+                "body": {
+                    "query": {"range": {"@timestamp": {"gte": "a", "lte": "b"}}},
+                    "aggs": {"timeseries": {"date_histogram": {"field": "@timestamp"}, "aggs": {"max": {"max": {"field": "x"}}}}},
+                },
+            }
+        ],
+    }
+    template = ActionTemplate(ActionIndex(action))
+    assert [type(query_handler).__name__ for query_handler in template.query_handlers] == ["RangeQueryHandler", "DateHistogramHandler"]
+    assert template.render([{"@timestamp": {"gte": "c"}}, {"field": "@timestamp", "fixed_interval": "1m"}]) == {
+        "id": "1",
+        "requests": [
+            {
+                "operation-type": "search",
+                "body": {
+                    "query": {"range": {"@timestamp": {"gte": "c"}}},
+                    "aggs": {
+                        "timeseries": {
+                            "date_histogram": {"field": "@timestamp", "fixed_interval": "1m"},
+                            "aggs": {"max": {"max": {"field": "x"}}},
+                        }
+                    },
+                },
+            }
+        ],
+    }
+    # every rendered action is a new object
+    rendered = template.render([{}, {}])
+    rendered["requests"][0]["body"]["aggs"]["timeseries"]["aggs"]["max"]["max"]["field"] = "y"
+    assert template.render([{}, {}])["requests"][0]["body"]["aggs"]["timeseries"]["aggs"]["max"]["max"]["field"] == "x"
+
+
+@pytest.mark.asyncio
+async def test_params_do_not_modify_loaded_actions():
+    param_source = WorkflowSelectorParamSource(
+        track=StaticTrack(parameters={"query-max-date-start": "2020-09-30T00:00:00", "random-seed": 13, "number-of-workflows": 1}),
+        params={
+            "workflow": "a",
+            "workflows-folder": "tests/parameter_sources/resources/workflows",
+            "task-offset": 0,
+        },
+    )
+    range_query = {
+        "@timestamp": {
+            "gte": "2020-11-30T12:16:59.340Z",
+            "lte": "2020-12-01T12:16:59.340Z",
+            "format": "strict_date_optional_time",
+        }
+    }
+    assert param_source.workflow_handlers["5"][0].request_body == range_query
+    action = param_source.params()
+    assert action["requests"][0]["stream"][0]["body"]["query"]["bool"]["must"][0]["range"] != range_query
+    assert param_source.workflow_handlers["5"][0].request_body == range_query
+    assert param_source.workflows[0][1]["requests"][0]["stream"][0]["body"]["query"]["bool"]["must"][0]["range"] == range_query
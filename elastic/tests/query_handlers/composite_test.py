@@ -0,0 +1,59 @@
+import copy
+import datetime
+
+import pytest
+from shared.query_handlers import CompositeHandler
+from shared.utils.time import DateTimeValues
+
+date_data = DateTimeValues(min_date=None, max_date=datetime.datetime(year=2020, month=12, day=2), duration=None)
+
+
+def test_remove_date_after_key():
+    composite_agg = {
+        "size": 10,
+        "sources": [
+            {"timestamp": {"date_histogram": {"field": "@timestamp", "fixed_interval": "1h"}}},
+            {"host": {"terms": {"field": "host.name"}}},
+        ],
+        "after": {"timestamp": 1606780800000, "host": "a"},
+    }
+    composite_handler = CompositeHandler(composite_agg)
+    assert composite_handler.get_time_interval() is None
+    assert "after" not in composite_handler.render(date_data)
+    assert "after" in composite_agg
+    composite_handler.process(date_data)
+    assert "after" not in composite_agg
+    assert len(composite_agg["sources"]) == 2
+
+
+def test_remove_formatted_date_after_key():
+    composite_agg = {
+        "sources": [{"day": {"date_histogram": {"field": "@timestamp", "calendar_interval": "1d", "format": "strict_date_optional_time"}}}],
+        "after": {"day": "2020-12-01T00:00:00.000Z"},
+    }
+    assert "after" not in CompositeHandler(composite_agg).render(date_data)
+
+
+@pytest.mark.parametrize(
+    "composite_agg",
+    [
+        # no date_histogram sources
+        {"sources": [{"host": {"terms": {"field": "host.name"}}}], "after": {"host": "a"}},
+        # the after key of a date_histogram source is in a custom format
+        {
+            "sources": [{"day": {"date_histogram": {"field": "@timestamp", "calendar_interval": "1d", "format": "yyyy-MM-dd"}}}],
+            "after": {"day": "2020-12-01"},
+        },
+        # a histogram on a date field, which is not a date_histogram source
+        {
+            "sources": [{"ts": {"histogram": {"field": "@timestamp", "interval": 3600000}}}],
+            "after": {"ts": 1606780800000},
+        },
+    ],
+)
+def test_pass_through_without_date_after_key(composite_agg):
+    expected = copy.deepcopy(composite_agg)
+    composite_handler = CompositeHandler(composite_agg)
+    assert composite_handler.render(date_data) == expected
+    composite_handler.process(date_data)
+    assert composite_agg == expected
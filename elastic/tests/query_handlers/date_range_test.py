@@ -0,0 +1,78 @@
+import copy
+import datetime
+
+import pytest
+from shared.query_handlers import DateRangeHandler
+from shared.utils.time import DateTimeValues
+
+start = datetime.datetime(
+    year=2020,
+    month=12,
+    day=2,
+    hour=12,
+    minute=33,
+    second=0,
+    tzinfo=datetime.timezone.utc,
+)
+
+
+def test_process_absolute_ranges():
+    date_range_agg = {
+        "field": "@timestamp",
+        "format": "strict_date_optional_time||epoch_millis",
+        "ranges": [
+            {"from": "2020-11-30T12:00:00.000Z", "to": "2020-12-01T00:00:00.000Z"},
+            {"from": 1606780800000, "to": "2020-12-01T12:00:00.000Z"},
+        ],
+    }
+    date_range_handler = DateRangeHandler(date_range_agg)
+    assert date_range_handler.get_time_interval().total_seconds() == 86400
+    date_range_handler.process(DateTimeValues(min_date=None, max_date=start, duration=None))
+    assert date_range_agg["ranges"] == [
+        {"from": "2020-12-01T12:33:00.000Z", "to": "2020-12-02T00:33:00.000Z"},
+        {"from": 1606869180000, "to": "2020-12-02T12:33:00.000Z"},
+    ]
+
+
+def test_process_relative_ranges_with_duration():
+    date_range_agg = {
+        "field": "@timestamp",
+        "ranges": [{"to": "now-1d/d"}, {"from": "now-1d/d", "to": "now"}],
+    }
+    date_range_handler = DateRangeHandler(date_range_agg)
+    assert date_range_handler.get_time_interval().total_seconds() == 86400
+    date_range_handler.process(DateTimeValues(min_date=None, max_date=start, duration=datetime.timedelta(days=2)))
+    # ranges are scaled to the new duration
+    assert date_range_agg["ranges"] == [
+        {"to": "2020-11-30T12:33:00.000Z||/d"},
+        {"from": "2020-11-30T12:33:00.000Z||/d", "to": "2020-12-02T12:33:00.000Z"},
+    ]
+
+
+def test_process_single_bound():
+    date_range_agg = {"field": "@timestamp", "format": "epoch_millis", "ranges": [{"to": 1606780800000}]}
+    date_range_handler = DateRangeHandler(date_range_agg)
+    assert date_range_handler.get_time_interval() is None
+    date_range_handler.process(DateTimeValues(min_date=None, max_date=start, duration=None))
+    assert date_range_agg["ranges"] == [{"to": 1606912380000}]
+
+
+@pytest.mark.parametrize(
+    "date_range_agg",
+    [
+        # bounds in a custom format
+        {"field": "@timestamp", "format": "yyyy-MM-dd", "ranges": [{"from": "2020-11-30", "to": "2020-12-01"}]},
+        # bounds which would be valid strict_date_optional_time but are formatted differently with date_time
+        {"field": "@timestamp", "format": "date_time", "ranges": [{"from": "2020-11-30T12:00:00.000Z", "to": "now"}]},
+        # absolute bounds without a format depend on the field's format
+        {"field": "@timestamp", "ranges": [{"from": "2020-11-30T12:00:00.000Z", "to": "now"}]},
+        {"field": "@timestamp", "format": "strict_date_optional_time", "ranges": [{"from": "yesterday"}]},
+    ],
+)
+def test_pass_through_other_formats(date_range_agg):
+    expected = copy.deepcopy(date_range_agg)
+    date_range_handler = DateRangeHandler(date_range_agg)
+    assert date_range_handler.get_time_interval() is None
+    assert date_range_handler.render(DateTimeValues(min_date=None, max_date=start, duration=None)) == expected
+    date_range_handler.process(DateTimeValues(min_date=None, max_date=start, duration=None))
+    assert date_range_agg == expected
@@ -14,6 +14,7 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import copy
 import datetime
 
 import pytest
@@ -197,3 +198,89 @@ def test_get_time_interval_is_idempotent():
     time_interval = range_query_handler.get_time_interval()
     range_query_handler.process(DateTimeValues(max_date=max, min_date=None, duration=None))
     assert time_interval == range_query_handler.get_time_interval()
+
+
+def test_process_epoch_millis():
+    max = datetime.datetime(year=2020, month=12, day=2, hour=12, minute=33, second=0, tzinfo=datetime.timezone.utc)
+    range_query = {
+        "@timestamp": {
+            "gte": 1606738619340,
+            "lte": "1606825019340",
+            "format": "epoch_millis",
+        }
+    }
+    range_query_handler = RangeQueryHandler(range_query)
+    assert range_query_handler.get_time_interval().total_seconds() == 86400
+    range_query_handler.process(DateTimeValues(max_date=max, min_date=None, duration=None))
+    assert range_query["@timestamp"]["gte"] == 1606825980000
+    assert range_query["@timestamp"]["lte"] == "1606912380000"
+
+
+def test_process_strict_date_optional_time_or_epoch_millis():
+    max = datetime.datetime(year=2020, month=12, day=2, hour=12, minute=33, second=0)
+    range_query = {
+        "@timestamp": {
+            "gte": "2020-11-30T12:16:59.340Z",
+            "lte": "2020-12-01T12:16:59.340Z",
+            "format": "strict_date_optional_time||epoch_millis",
+        }
+    }
+    range_query_handler = RangeQueryHandler(range_query)
+    range_query_handler.process(DateTimeValues(max_date=max, min_date=None, duration=None))
+    assert range_query["@timestamp"]["gte"] == "2020-12-01T12:33:00.000Z"
+    assert range_query["@timestamp"]["lte"] == "2020-12-02T12:33:00.000Z"
+
+
+def test_process_relative():
+    max = datetime.datetime(year=2020, month=12, day=2, hour=12, minute=33, second=0)
+    range_query = {"@timestamp": {"gt": "now-15m/m", "lte": "now"}}
+    range_query_handler = RangeQueryHandler(range_query)
+    assert not range_query_handler.lower_inclusive
+    assert range_query_handler.get_time_interval().total_seconds() == 900
+    range_query_handler.process(DateTimeValues(max_date=max, min_date=None, duration=None))
+    # rounding is preserved on the absolute bounds
+    assert range_query["@timestamp"] == {"gt": "2020-12-02T12:18:00.000Z||/m", "lte": "2020-12-02T12:33:00.000Z"}
+
+
+@pytest.mark.parametrize(
+    "range_query",
+    [
+        {"@timestamp": {"gte": "now-15m", "lte": "2020-12-01T12:16:59.340Z"}},
+        {"@timestamp": {"gte": "now-15m", "lte": "2020-12-01T12:16:59.340Z", "format": "strict_date_optional_time"}},
+        {"@timestamp": {"gte": "2020-01-01T00:00:00Z", "lte": "now", "format": "strict_date_optional_time||epoch_millis"}},
+    ],
+)
+def test_pass_through_partially_relative(range_query):
+    expected = copy.deepcopy(range_query)
+    range_query_handler = RangeQueryHandler(range_query)
+    assert range_query_handler.get_time_interval() is None
+    assert range_query_handler.render(DateTimeValues(max_date=datetime.datetime.utcnow(), min_date=None, duration=None)) == expected
+
+
+@pytest.mark.parametrize("date_format", ["epoch_second", "yyyy-MM-dd", "date_time"])
+def test_pass_through_relative_in_other_formats(date_format):
+    range_query = {"@timestamp": {"gte": "now-15m", "lte": "now", "format": date_format}}
+    expected = copy.deepcopy(range_query)
+    range_query_handler = RangeQueryHandler(range_query)
+    assert range_query_handler.get_time_interval() is None
+    date_data = DateTimeValues(
+        max_date=datetime.datetime(year=2020, month=1, day=1, tzinfo=datetime.timezone.utc), min_date=None, duration=None
+    )
+    assert range_query_handler.render(date_data) == expected
+    range_query_handler.process(date_data)
+    assert range_query == expected
+
+
+def test_render_does_not_modify_body():
+    max = datetime.datetime(year=2020, month=12, day=2, hour=12, minute=33, second=0)
+    range_query = {
+        "@timestamp": {
+            "gte": "2020-11-30T12:16:59.340Z",
+            "lte": "2020-12-01T12:16:59.340Z",
+            "format": "strict_date_optional_time",
+        }
+    }
+    range_query_handler = RangeQueryHandler(range_query)
+    rendered = range_query_handler.render(DateTimeValues(max_date=max, min_date=None, duration=None))
+    assert rendered["@timestamp"]["lte"] == "2020-12-02T12:33:00.000Z"
+    assert range_query["@timestamp"]["lte"] == "2020-12-01T12:16:59.340Z"
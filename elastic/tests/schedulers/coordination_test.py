@@ -0,0 +1,96 @@
+import multiprocessing
+import os
+
+import pytest
+from esrally import track
+from shared.schedulers import coordination
+from shared.schedulers.coordination import SharedThrottleState
+from shared.schedulers.indexing import TimestampThrottler
+
+
+def write_state(file_name, client_index, client_count, start_time, event_time_span):
+    SharedThrottleState(file_name, client_index, client_count).update(start_time, event_time_span)
+
+
+def test_shared_state_across_processes(tmp_path):
+    file_name = os.path.join(tmp_path, "throttle.state")
+    state = SharedThrottleState(file_name, 0, 3)
+    state.update(10.0, 4.0)
+    # client 1 runs in another process, client 2 has not started yet
+    process = multiprocessing.get_context("spawn").Process(target=write_state, args=(file_name, 1, 3, 8.0, 2.0))
+    process.start()
+    process.join()
+    assert process.exitcode == 0
+    assert state.aggregate() == (8.0, 3.0)
+    state.close()
+
+
+def test_stale_slots_are_ignored(tmp_path, monkeypatch):
+    file_name = os.path.join(tmp_path, "throttle.state")
+    clock = [1000.0]
+    monkeypatch.setattr(coordination.time, "time", lambda: clock[0])
+    previous = SharedThrottleState(file_name, 1, 2, timeout=30)
+    previous.update(1.0, 100.0)
+    clock[0] += 31
+    state = SharedThrottleState(file_name, 0, 2, timeout=30)
+    state.update(50.0, 2.0)
+    assert state.aggregate() == (50.0, 2.0)
+
+
+def test_slots_of_previous_runs_are_ignored(tmp_path):
+    file_name = os.path.join(tmp_path, "throttle.state")
+    previous = [SharedThrottleState(file_name, client_index, 2) for client_index in range(2)]
+    previous[0].update(1.0, 100.0)
+    previous[1].update(2.0, 200.0)
+    assert previous[0].aggregate() == (1.0, 150.0)
+    # the next run starts right after the previous one with the same file, client 1 before client 0
+    state = [SharedThrottleState(file_name, client_index, 2) for client_index in [1, 0]][::-1]
+    state[0].update(50.0, 2.0)
+    assert state[0].aggregate() == (50.0, 2.0)
+    # client 1 joins the run with its first update
+    state[1].update(51.0, 4.0)
+    assert state[0].aggregate() == (50.0, 3.0)
+    assert state[1].aggregate() == (50.0, 3.0)
+
+
+def test_coordinated_timestamp_throttler(tmp_path):
+    class MockParameterSource:
+        bulk_size = 1000
+
+        def __init__(self, client_index):
+            self.client_index = client_index
+            self.client_count = 2
+            self.event_time_span = 0
+
+        def set_bulk_size(self, bulk_size):
+            self.bulk_size = bulk_size
+
+    throttlers = []
+    for client_index in range(2):
+        throttler = TimestampThrottler(
+            track.Task(
+                name="test-task",
+                operation=track.Operation(
+                    name="bulk-index",
+                    operation_type=track.OperationType.Bulk.name,
+                    params={"bulk-size": 1000},
+                ),
+                params={"max-delay-secs": 1, "coordinated": True, "coordination-file": os.path.join(tmp_path, "throttle.state")},
+            )
+        )
+        throttler.parameter_source = MockParameterSource(client_index)
+        throttlers.append(throttler)
+
+    throttlers[0].before_request(0)
+    throttlers[1].before_request(0)
+    # client 0 starts the run
+    throttlers[0].after_request(now=0.5, weight=1000, unit="docs", request_meta_data={})
+    # client 0 is behind and client 1 is ahead of the data but all clients together are ahead
+    throttlers[1].parameter_source.event_time_span = 4
+    throttlers[1].after_request(now=1, weight=1000, unit="docs", request_meta_data={})
+    throttlers[0].parameter_source.event_time_span = 0.5
+    throttlers[0].after_request(now=1, weight=1000, unit="docs", request_meta_data={})
+    assert throttlers[0].last_error == pytest.approx(1 - (0.5 + 4) / 2)
+    # both clients slow down
+    assert throttlers[0].rate > 0
+    assert throttlers[1].rate > 0
@@ -1,9 +1,12 @@
+import gc
+import os
 import unittest
 
 import pytest
 from esrally import track
 from esrally.exceptions import DataError
-from shared.schedulers.indexing import TimestampThrottler
+from shared.schedulers.indexing import PidThrottler, TimestampThrottler
+from shared.schedulers.simulation import read_trace, simulate
 
 assertions = unittest.TestCase("__init__")
 
@@ -177,3 +180,131 @@ def test_no_bulk_size():
                 params={"max-delay": 1},
             )
         )
+
+
+def pid_throttler(**params):
+    return PidThrottler(
+        track.Task(
+            name="test-task",
+            operation=track.Operation(
+                name="bulk-index",
+                operation_type=track.OperationType.Bulk.name,
+                params={"bulk-size": 1000},
+            ),
+            params={"max-delay-secs": 1, **params},
+        )
+    )
+
+
+def test_pid_throttler():
+    class MockParameterSource:
+        bulk_size = 1000
+        event_time_span = 0
+
+        def set_bulk_size(self, bulk_size):
+            self.bulk_size = bulk_size
+
+    parameter_source = MockParameterSource()
+    throttler = pid_throttler(kp=0.1, ki=0.01)
+    throttler.parameter_source = parameter_source
+    # un-throttled initially
+    assert throttler.next(0) == 0
+
+    # ahead of the data by 9s - the delay is increased first
+    throttler.before_request(0)
+    parameter_source.event_time_span = 10
+    throttler.after_request(now=1, weight=1000, unit="docs", request_meta_data={})
+    assertions.assertAlmostEqual(throttler.position, 2 - 0.1 * 9 - 0.01 * 9)
+    assertions.assertAlmostEqual(throttler.rate, 0.99)
+    assert parameter_source.bulk_size == 1000
+    assertions.assertAlmostEqual(throttler.next(1), 1.99)
+
+    # still ahead - the bulk size is decreased once the delay is at its maximum
+    throttler.before_request(2)
+    parameter_source.event_time_span = 30
+    throttler.after_request(now=3, weight=1000, unit="docs", request_meta_data={})
+    assert throttler.rate == 1
+    assert parameter_source.bulk_size == 1
+    # the position does not wind up below the minimum
+    assert throttler.position == 0
+
+    # behind the data - speeds up again
+    throttler.before_request(3)
+    parameter_source.event_time_span = 30.001
+    throttler.after_request(now=33, weight=1, unit="docs", request_meta_data={})
+    assert throttler.position == 2
+    assert throttler.rate == 0
+    assert parameter_source.bulk_size == 1000
+
+    assert throttler.convergence.as_dict() == {
+        "samples": 3,
+        "mean-abs-error": pytest.approx((9 + 27 + 2.999) / 3),
+        "max-abs-error": 27,
+        "oscillations": 1,
+        "settled-since": None,
+    }
+
+
+def test_pid_throttler_trace(tmp_path):
+    class MockParameterSource:
+        event_time_span = 0
+
+        def set_bulk_size(self, bulk_size):
+            pass
+
+    trace_file = os.path.join(tmp_path, "trace.json")
+    throttler = pid_throttler(**{"trace-file": trace_file})
+    throttler.parameter_source = MockParameterSource()
+    for request in range(0, 2):
+        throttler.before_request(request)
+        throttler.parameter_source.event_time_span += 1
+        throttler.after_request(now=request + 0.5, weight=1000, unit="docs", request_meta_data={})
+    # buffered until the throttler is closed
+    assert read_trace(trace_file) == []
+    throttler.close()
+    assert read_trace(trace_file) == [
+        {"service-time": 0.5, "weight": 1000, "event-time-span": 1},
+        {"service-time": 0.5, "weight": 1000, "event-time-span": 2},
+    ]
+    # closed when the throttler is collected at the latest
+    throttler = pid_throttler(**{"trace-file": trace_file})
+    throttler.parameter_source = MockParameterSource()
+    throttler.before_request(2)
+    throttler.after_request(now=2.5, weight=1000, unit="docs", request_meta_data={})
+    del throttler
+    gc.collect()
+    assert len(read_trace(trace_file)) == 3
+
+
+def test_pid_throttler_no_bulk_size():
+    with pytest.raises(DataError):
+        PidThrottler(
+            track.Task(
+                name="test-task",
+                operation=track.Operation(
+                    name="bulk-index",
+                    operation_type=track.OperationType.Bulk.name,
+                    params={},
+                ),
+                params={"max-delay-secs": 1},
+            )
+        )
+
+
+@pytest.mark.parametrize("event_time_span_per_request", [1.5, 10])
+def test_simulation(event_time_span_per_request):
+    trace = [{"service-time": 1.0, "weight": 1000, "event-time-span": event_time_span_per_request * (i + 1)} for i in range(1000)]
+    convergence = simulate(pid_throttler(), trace)
+    assert convergence.samples == 1000
+    # settles within the first minutes and stays within the tolerance of 1s
+    assert convergence.settled_since < 120
+    assert convergence.oscillations <= 1
+    # requests need to cover 1s of data each, which requires smaller bulks if even 1s of delay is not sufficient
+    throttler = pid_throttler()
+    simulate(throttler, trace)
+    if event_time_span_per_request == 10:
+        assert throttler.rate == 1
+        assert throttler.bulk_size == pytest.approx(100, abs=5)
+    else:
+        assert throttler.rate == 1
+        assert throttler.bulk_size == pytest.approx(667, abs=10)
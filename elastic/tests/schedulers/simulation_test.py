@@ -0,0 +1,84 @@
+import os
+
+import pytest
+from esrally import track
+from shared.schedulers.indexing import PidThrottler, TimestampThrottler
+from shared.schedulers.query import WorkflowScheduler
+from shared.schedulers.simulation import (
+    ClusterModel,
+    SimulatedIndexingSource,
+    SimulatedWorkflowSource,
+    Simulator,
+)
+
+
+def bulk_task(**params):
+    return track.Task(
+        name="test-task",
+        operation=track.Operation(
+            name="bulk-index",
+            operation_type=track.OperationType.Bulk.name,
+            params={"bulk-size": 1000},
+        ),
+        params={"max-delay-secs": 1, **params},
+    )
+
+
+def test_cluster_model_queues_requests():
+    cluster = ClusterModel(base_latency=0.1, latency_per_unit=0.001, max_throughput=1000)
+    assert cluster.complete(0, 100) == pytest.approx(0.1 + 0.1 + 0.1)
+    # the cluster is still busy with the first request
+    assert cluster.complete(0, 100) == pytest.approx(0.2 + 0.1 + 0.1)
+    assert cluster.complete(10, 100) == pytest.approx(10.1 + 0.1 + 0.1)
+
+
+@pytest.mark.parametrize("throttler_class", [TimestampThrottler, PidThrottler])
+def test_simulated_indexing(throttler_class):
+    simulator = Simulator(ClusterModel(base_latency=0.05, latency_per_unit=0.0002, max_throughput=20000, jitter=0.2))
+    # the data covers 5000 docs per second, the cluster can handle 20000
+    for client_index in range(4):
+        simulator.add_client(throttler_class(bulk_task()), SimulatedIndexingSource(1000, 4 / 5000, client_index, 4))
+    result = simulator.run(300)
+    assert result["throughput"] == pytest.approx(5000, rel=0.02)
+    assert result["convergence"]["settled-since"] < 100
+    assert result["oscillation-amplitude"] < 1
+
+
+def test_simulated_coordinated_indexing(tmp_path):
+    simulator = Simulator(ClusterModel(base_latency=0.05, latency_per_unit=0.0002))
+    for client_index in range(4):
+        throttler = PidThrottler(bulk_task(**{"coordinated": True, "coordination-file": os.path.join(tmp_path, "throttle.state")}))
+        # clients get docs of different density, e.g. due to different corpora
+        simulator.add_client(throttler, SimulatedIndexingSource(1000, (client_index + 1) / 5000, client_index, 4))
+    result = simulator.run(300)
+    assert result["convergence"]["settled-since"] < 100
+    assert result["oscillation-amplitude"] < 1
+
+
+def test_simulated_overloaded_cluster():
+    simulator = Simulator(ClusterModel(base_latency=0.05, max_throughput=2000))
+    for client_index in range(4):
+        simulator.add_client(PidThrottler(bulk_task()), SimulatedIndexingSource(1000, 4 / 5000, client_index, 4))
+    result = simulator.run(300)
+    # the cluster cannot keep up with the data
+    assert result["throughput"] == pytest.approx(2000, rel=0.02)
+    assert result["convergence"]["settled-since"] is None
+    assert result["convergence"]["max-abs-error"] > 100
+
+
+def test_simulated_workflows():
+    simulator = Simulator(ClusterModel(base_latency=0.5))
+    for task_offset in range(2):
+        scheduler = WorkflowScheduler(
+            track.Task(
+                name="test-task",
+                operation=track.Operation(name="composite", operation_type="composite", params={}),
+                params={"workflow-interval": 20, "think-time-interval": 2},
+            )
+        )
+        simulator.add_client(scheduler, SimulatedWorkflowSource(5, task_offset=task_offset, number_of_tasks=2))
+    result = simulator.run(3600)
+    assert result["mean-latency"] == pytest.approx(0.5)
+    assert "convergence" not in result
+    # each workflow takes about 20s + 4 * 2s between actions plus the latency of 5 actions
+    assert result["throughput"] == pytest.approx(2 * 5 / 30.5, rel=0.2)
@@ -14,17 +14,27 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import bz2
 import datetime
+import glob
 import json
 import os
 import random
+import shutil
+from array import array
 
 import pytest
 from esrally.exceptions import DataError, RallyAssertionError, TrackConfigError
+from esrally.track import DocumentCorpus, Documents
+from esrally.track.loader import Decompressor
 from shared.parameter_sources.processed import MagicNumbers, ProcessedCorpusParamSource
+from shared.track_processors import data_generator
 from shared.track_processors.data_generator import CorpusGenerator, DataGenerator
+from shared.utils.cache import GeneratedCorpusCache
+from shared.utils.compression import BlockCompressedSource, get_compression
+from shared.utils.file import LineIndex, SpliceIndex
 from shared.utils.time import TimeParsingError
-from tests.parameter_sources import StaticTrack
+from tests.parameter_sources import EmptyTrack, StaticTrack
 
 
 def read_file(path):
@@ -704,7 +714,7 @@ def test_json_processor(tmp_path):
     processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
     assert message_size == 5
     assert (
-        json.dumps(processed_doc) == '{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "message": "dummy", "rally":'
+        processed_doc == '{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "message": "dummy", "rally":'
         ' {"message_size": 5, "doc_size": 66,'
         ' "doc_size_with_meta": 131, '
         '"markers": "-0000000010000000010000000002800000000620000000063"}}'
@@ -713,13 +723,121 @@ def test_json_processor(tmp_path):
     doc = json.dumps({"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1}).encode("utf-8")
     processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
     assert (
-        json.dumps(processed_doc) == '{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "rally": '
+        processed_doc == '{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "rally": '
         '{"message_size": 48, '
         '"doc_size": 48, "doc_size_with_meta": 114, '
         '"markers": "-00000000100000000100000000028000000004e0000000050"}}'
     )
 
 
+def test_passthrough_json_processor(tmp_path):
+    test_track = StaticTrack(
+        parameters={
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "123",
+            "integration-ratios": {
+                "system": {"corpora": {"system-logs": 0.5}},
+                "agent": {"corpora": {"agent-logs": 0.5}},
+            },
+            "exclude-properties": {"excluded-corpus": ["id"]},
+            "sample-size": 10,
+            "generator-batch-size": 10000,
+            "data-generation-clients": 1,
+            "data-generation-passthrough": True,
+        },
+        challenge_parameters={"output-folder": tmp_path},
+    )
+    generator = CorpusGenerator(test_track, tmp_path)
+    generator.include_doc_size_with_metadata = True
+
+    doc = b'{"@timestamp":"2020-09-03T15:16:17.406Z","msglen":5, "id":1,"message":"dummy"}\n'
+    processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
+    assert message_size == 5
+    # written as is, apart from msglen
+    assert (
+        processed_doc == '{"@timestamp":"2020-09-03T15:16:17.406Z","id":1,"message":"dummy", "rally": {"message_size": 5, '
+        '"doc_size": 66, "doc_size_with_meta": 131, "markers": "-000000001000000000f0000000027000000005d000000005e"}}'
+    )
+    assert processed_doc[0x0F:0x27] == "2020-09-03T15:16:17.406Z"
+    # the sampled size with meta-data is the same as for regular processing of the same doc
+    assert generator._rally_properties(processed_doc)["doc_size_with_meta"] == len(
+        json.dumps(
+            {
+                "@timestamp": "2020-09-03T15:16:17.406Z",
+                "id": 1,
+                "message": "dummy",
+                "rally": {"message_size": 5, "doc_size": 66, "doc_size_with_meta": 66},
+            },
+            separators=(",", ":"),
+        )
+    )
+
+    # msglen as last key
+    doc = b'{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "msglen": 5}'
+    processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
+    assert message_size == 5
+    assert processed_doc.startswith('{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "rally": {"message_size": 5, "doc_size": 51,')
+
+    # no msglen
+    doc = b'{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1}'
+    processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
+    assert message_size == 51
+    assert processed_doc.startswith('{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "rally": {"message_size": 51, "doc_size": 51,')
+
+    # docs which cannot be processed on string level fall back to regular processing
+    for doc in [
+        '{"@timestamp":"2020-09-03T15:16:17.406Z","msglen":5,"message":"\u00fcber"}'.encode("utf-8"),
+        b'{"@timestamp":"2020-09-03T15:16:17.406Z","msglen":"5","message":"dummy"}',
+        b'{"@timestamp":"2020-09-03T15:16:17.406Z","nested":{"msglen":5},"message":"dummy"}',
+        b'{"@timestamp":"2020-09-03T15:16:17.406Z","nested":{"msglen":5,"id":1},"message":"dummy"}',
+        b'{"@timestamp":"2020-09-03T15:16:17.406Z","nested":[{"msglen":5,"id":1}],"message":"dummy"}',
+    ]:
+        processed_doc, message_size = generator._json_processor(doc, 0, "test-corpus")
+        expected_doc = json.loads(doc)
+        # a nested msglen is neither removed nor used as message size
+        assert (message_size == 5) == (expected_doc.pop("msglen", None) is not None)
+        assert processed_doc.startswith(json.dumps(expected_doc)[:-1])
+    doc = b'{"@timestamp":"2020-09-03T15:16:17.406Z","id":1,"message":"dummy"}'
+    processed_doc, _ = generator._json_processor(doc, 0, "excluded-corpus")
+    assert processed_doc.startswith('{"@timestamp": "2020-09-03T15:16:17.406Z", "message": "dummy", "rally": ')
+
+
+def test_passthrough_data_generation(tmp_path):
+    test_track = StaticTrack(
+        parameters={
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "test_passthrough_data_generation",
+            "integration-ratios": {
+                "system": {"corpora": {"system-logs": 0.5}},
+                "agent": {"corpora": {"agent-logs": 0.5}},
+            },
+            "sample-size": 10,
+            "generator-batch-size": 10000,
+            "data-generation-clients": 1,
+            "data-generation-passthrough": True,
+        }
+    )
+
+    generate(test_track, tmp_path)
+    generated_corpus = find_generated_corpus(test_track)
+    lines_in_data_file = read_file(generated_corpus.documents[0].document_file)
+
+    assert len(lines_in_data_file) == generated_corpus.documents[0].number_of_documents * 2
+    assert_rally_properties(lines_in_data_file)
+    for line, doc in zip(lines_in_data_file[1::2], docs(lines_in_data_file)):
+        line = line.strip()
+        assert "msglen" not in doc
+        msgsize_start = int(line[MagicNumbers.MSGLEN_BEGIN_IDX : MagicNumbers.MSGLEN_END_IDX], 16)
+        msgsize_end = int(line[MagicNumbers.MSGLEN_END_IDX : MagicNumbers.MSGLEN_END_IDX + 10], 16)
+        assert int(line[msgsize_start:msgsize_end]) == doc["rally"]["message_size"]
+        if "@timestamp" in doc:
+            ts_start = int(line[MagicNumbers.TS_BEGIN_IDX : MagicNumbers.TS_END_IDX], 16)
+            ts_end = int(line[MagicNumbers.TS_END_IDX : MagicNumbers.MSGLEN_BEGIN_IDX], 16)
+            assert line[ts_start:ts_end] == doc["@timestamp"]
+
+
 def test_serialized_doc_markers():
     test_data = [
         # example doc with placeholder present -- most integration
@@ -783,3 +901,818 @@ def test_serialized_doc_markers():
 
             timestamp = new_raw_doc[ts_value_start_pos:ts_value_end_pos]
             assert timestamp == data["@timestamp"]
+
+
+def test_sharded_data_generation(tmp_path):
+    def generate_corpus(processes):
+        root_path = os.path.join(tmp_path, f"processes_{processes}")
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {
+                    "system": {"corpora": {"system-logs": 0.5}},
+                    "agent": {"corpora": {"agent-logs": 0.5}},
+                },
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": "test_sharded_data_generation",
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 1,
+                "offset-increment": 10,
+                "data-generation-clients": 2,
+                "data-generation-shards": 3,
+                "data-generation-processes": processes,
+            }
+        )
+        generate(test_track, root_path)
+        return find_generated_corpus(test_track)
+
+    sequential_corpus = generate_corpus(processes=1)
+    parallel_corpus = generate_corpus(processes=2)
+
+    for sequential_docs, parallel_docs in zip(sequential_corpus.documents, parallel_corpus.documents):
+        # output is independent of the number of processes
+        with open(sequential_docs.document_file, "rb") as f1, open(parallel_docs.document_file, "rb") as f2:
+            assert f1.read() == f2.read()
+        assert sequential_docs.metadata == parallel_docs.metadata
+        # shards are merged and removed
+        assert not os.path.exists(f"{sequential_docs.document_file[: -len('.json')]}.parts")
+
+        lines_in_data_file = read_file(sequential_docs.document_file)
+        assert len(lines_in_data_file) == sequential_docs.number_of_documents * 2
+        assert sequential_docs.message_size == sum([doc["rally"]["message_size"] for doc in docs(lines_in_data_file)])
+        assert_rally_properties(lines_in_data_file)
+        assert_line_index(sequential_docs.document_file)
+        # every offset must point to the start of the respective line in the merged file
+        offsets = read_file(f"{sequential_docs.document_file}.offset")
+        assert len(offsets) > 0
+        with open(sequential_docs.document_file, "rb") as data_file:
+            raw_lines = data_file.readlines()
+            for offset in offsets:
+                line_number, offset_in_bytes = [int(i) for i in offset.split(";")]
+                assert offset_in_bytes == sum(len(line) for line in raw_lines[:line_number])
+
+
+@pytest.mark.parametrize("shards", [1, 2])
+def test_splice_index_data_generation(tmp_path, shards):
+    test_track = StaticTrack(
+        parameters={
+            "integration-ratios": {
+                "system": {"corpora": {"system-logs": 0.5}},
+                "agent": {"corpora": {"agent-logs": 0.5}},
+            },
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "test_splice_index_data_generation",
+            "random-seed": 13,
+            "sample-size": 10,
+            "generator-batch-size": 1,
+            "offset-increment": 10,
+            "data-generation-clients": 2,
+            "data-generation-shards": shards,
+            "data-generation-processes": 1,
+            "data-generation-splice-index": True,
+        }
+    )
+    generate(test_track, tmp_path)
+    corpus = find_generated_corpus(test_track)
+
+    for generated_docs in corpus.documents:
+        assert_line_index(generated_docs.document_file)
+        assert SpliceIndex.exists(generated_docs.document_file)
+        formats = SpliceIndex.read_formats(generated_docs.document_file)
+        records = array(SpliceIndex.TYPECODE)
+        with open(SpliceIndex.index_file_name(generated_docs.document_file), "rb") as f:
+            records.frombytes(f.read())
+        assert len(records) == generated_docs.number_of_documents * SpliceIndex.RECORD_SIZE
+        with open(generated_docs.document_file, "rb") as f:
+            raw_lines = f.readlines()
+        position = 0
+        for doc_number in range(generated_docs.number_of_documents):
+            record = records[doc_number * SpliceIndex.RECORD_SIZE : (doc_number + 1) * SpliceIndex.RECORD_SIZE]
+            meta_line = raw_lines[doc_number * 2]
+            doc_line = raw_lines[doc_number * 2 + 1]
+            assert record[SpliceIndex.META_START] == position
+            assert record[SpliceIndex.DOC_START] == position + len(meta_line)
+            position += len(meta_line) + len(doc_line)
+            doc = json.loads(doc_line)
+            assert record[SpliceIndex.MESSAGE_SIZE] == doc["rally"]["message_size"]
+            # positions relative to the start of the doc
+            splice_start, splice_end, tail_end = [
+                record[field] - record[SpliceIndex.DOC_START]
+                for field in [SpliceIndex.SPLICE_START, SpliceIndex.SPLICE_END, SpliceIndex.TAIL_END]
+            ]
+            spliced = doc_line[splice_start:splice_end].decode("utf-8")
+            if record[SpliceIndex.FORMAT_ID] == SpliceIndex.ISO_FORMAT_ID:
+                assert spliced == doc["@timestamp"]
+            else:
+                assert spliced.startswith("_RALLYTS")
+                assert spliced.endswith(f"<{formats[record[SpliceIndex.FORMAT_ID]]}>")
+            # the tail ends right before the "markers" key
+            assert doc_line[tail_end:].startswith(b', "markers"')
+
+
+@pytest.mark.parametrize("compression_type", ["gzip", "zstd"])
+@pytest.mark.parametrize("shards", [1, 3])
+def test_compressed_data_generation(tmp_path, compression_type, shards):
+    def generate_corpus(compression_type):
+        parameters = {
+            "integration-ratios": {
+                "system": {"corpora": {"system-logs": 0.5}},
+                "agent": {"corpora": {"agent-logs": 0.5}},
+            },
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": f"test_compressed_data_generation_{compression_type}",
+            "random-seed": 13,
+            "sample-size": 10,
+            "generator-batch-size": 1,
+            "offset-increment": 10,
+            "data-generation-clients": 2,
+            "data-generation-shards": shards,
+            "data-generation-processes": 1,
+        }
+        if compression_type:
+            parameters["data-generation-compression"] = compression_type
+        test_track = StaticTrack(parameters=parameters)
+        generate(test_track, os.path.join(tmp_path, str(compression_type)))
+        return find_generated_corpus(test_track)
+
+    corpus = generate_corpus(None)
+    compressed_corpus = generate_corpus(compression_type)
+    compression = get_compression(compression_type)
+
+    for docs, compressed_docs in zip(corpus.documents, compressed_corpus.documents):
+        assert os.path.basename(compressed_docs.document_file) == f"{os.path.basename(docs.document_file)}{compression.file_extension}"
+        assert compressed_docs.metadata == docs.metadata
+        assert not LineIndex.exists(compressed_docs.document_file)
+        with open(docs.document_file, "rb") as f:
+            raw_lines = f.readlines()
+        with open(compressed_docs.document_file, "rb") as f:
+            # all blocks can be decompressed as a whole
+            assert compression.reader(f).read() == b"".join(raw_lines)
+        # every offset must point to the start of a block which starts with the respective line
+        offsets = read_file(f"{compressed_docs.document_file}.offset")
+        assert len(offsets) == len(read_file(f"{docs.document_file}.offset"))
+        source = BlockCompressedSource(compressed_docs.document_file, "rt").open()
+        for offset in offsets:
+            line_number, offset_in_bytes = [int(i) for i in offset.split(";")]
+            source.seek(offset_in_bytes)
+            assert source.readlines(2) == raw_lines[line_number : line_number + 2]
+        source.close()
+
+
+def test_compression_with_splice_index(tmp_path):
+    with pytest.raises(TrackConfigError) as track_config_error:
+        test_track = StaticTrack(
+            parameters={
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": "test_compression_with_splice_index",
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+                "data-generation-compression": "gzip",
+                "data-generation-splice-index": True,
+            }
+        )
+        generate(test_track, tmp_path)
+    assert track_config_error.value.message == '"data-generation-splice-index" cannot be used with "data-generation-compression"'
+
+
+def assert_same_files(data_file, expected_data_file):
+    for extension in ["", ".offset", ".lines", ".splice", ".splice-formats"]:
+        assert os.path.exists(f"{data_file}{extension}") == os.path.exists(f"{expected_data_file}{extension}")
+        if os.path.exists(f"{expected_data_file}{extension}"):
+            with open(f"{data_file}{extension}", "rb") as f1, open(f"{expected_data_file}{extension}", "rb") as f2:
+                assert f1.read() == f2.read()
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {},
+        {"data-generation-splice-index": True},
+        {"data-generation-compression": "gzip"},
+        {"data-generation-shards": 2},
+    ],
+)
+def test_resumed_data_generation(tmp_path, monkeypatch, parameters):
+    def generate_corpus(root_path):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {
+                    "system": {"corpora": {"system-logs": 0.5}},
+                    "agent": {"corpora": {"agent-logs": 0.5}},
+                },
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": "test_resumed_data_generation",
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 1,
+                "offset-increment": 10,
+                "data-generation-clients": 2,
+                "data-generation-processes": 1,
+                **parameters,
+            }
+        )
+        cached = generate(test_track, os.path.join(tmp_path, root_path))
+        return cached, find_generated_corpus(test_track)
+
+    _, expected_corpus = generate_corpus("uninterrupted")
+
+    reader_generator = CorpusGenerator._reader_generator
+
+    def interrupted_reader_generator(self, corpus_selector):
+        for batch, docs in enumerate(reader_generator(self, corpus_selector)):
+            if batch == 17:
+                raise RuntimeError("interrupted")
+            yield docs
+
+    monkeypatch.setattr(CorpusGenerator, "_reader_generator", interrupted_reader_generator)
+    with pytest.raises(RuntimeError):
+        generate_corpus("interrupted")
+    monkeypatch.undo()
+    checkpoints = glob.glob(os.path.join(tmp_path, "interrupted", "**", "*.checkpoint"), recursive=True)
+    assert len(checkpoints) == 1
+    with open(checkpoints[0], "rt") as f:
+        checkpoint = json.load(f)
+    assert not checkpoint["complete"]
+    assert checkpoint["docs"] > 0
+
+    cached, corpus = generate_corpus("interrupted")
+    assert not cached
+    for docs, expected_docs in zip(corpus.documents, expected_corpus.documents):
+        # the output is identical to an uninterrupted generation
+        assert_same_files(docs.document_file, expected_docs.document_file)
+        assert docs.metadata == expected_docs.metadata
+
+    cached, _ = generate_corpus("interrupted")
+    assert cached
+
+
+def test_extended_data_generation(tmp_path, monkeypatch):
+    def generate_corpus(root_path, track_id, end_date):
+        test_track = StaticTrack(
+            parameters={
+                # the doc ratios of multiple corpora would depend on the number of docs due to rounding
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "1MB",
+                "track-id": track_id,
+                "start-date": "2020-08-01:00:00:00",
+                "end-date": end_date,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 1,
+                "offset-increment": 10,
+                "data-generation-clients": 1,
+            }
+        )
+        generate(test_track, os.path.join(tmp_path, root_path))
+        return find_generated_corpus(test_track)
+
+    reader_generator = CorpusGenerator._reader_generator
+    batches = []
+
+    def counting_reader_generator(self, corpus_selector):
+        for docs in reader_generator(self, corpus_selector):
+            batches.append(docs)
+            yield docs
+
+    monkeypatch.setattr(CorpusGenerator, "_reader_generator", counting_reader_generator)
+    short_corpus = generate_corpus("extended", "short", "2020-08-02:00:00:00")
+    short_batches = len(batches)
+    extended_corpus = generate_corpus("extended", "long", "2020-08-03:00:00:00")
+    extended_batches = len(batches) - short_batches
+    expected_corpus = generate_corpus("fresh", "long", "2020-08-03:00:00:00")
+    expected_batches = len(batches) - short_batches - extended_batches
+
+    # only the missing docs have been generated
+    assert extended_batches == expected_batches - short_batches
+    assert short_corpus.documents[0].number_of_documents < extended_corpus.documents[0].number_of_documents
+    assert_same_files(extended_corpus.documents[0].document_file, expected_corpus.documents[0].document_file)
+    assert extended_corpus.documents[0].metadata == expected_corpus.documents[0].metadata
+
+
+def test_extended_data_generation_requires_unlocked_and_valid_corpus(tmp_path, monkeypatch):
+    def generate_corpus(track_id, end_date):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "1MB",
+                "track-id": track_id,
+                "start-date": "2020-08-01:00:00:00",
+                "end-date": end_date,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+            }
+        )
+        generate(test_track, tmp_path)
+        return find_generated_corpus(test_track)
+
+    copied = []
+    copy_generated_files = CorpusGenerator._copy_generated_files
+
+    def recording_copy_generated_files(self, source_file, target_file):
+        copied.append(source_file)
+        copy_generated_files(self, source_file, target_file)
+
+    monkeypatch.setattr(CorpusGenerator, "_copy_generated_files", recording_copy_generated_files)
+    short_corpus = generate_corpus("short", "2020-08-02:00:00:00")
+    generated_folder = os.path.dirname(os.path.dirname(short_corpus.documents[0].document_file))
+    # the corpus is locked, e.g. because another process generates it
+    with GeneratedCorpusCache(generated_folder).generation_lock("short", 0):
+        generate_corpus("locked", "2020-08-03:00:00:00")
+    assert copied == []
+
+    # the corpus differs from its manifest
+    with open(short_corpus.documents[0].document_file, "ab") as f:
+        f.write(b"\n")
+    generate_corpus("invalid", "2020-08-03:00:00:00")
+    # the valid corpus generated meanwhile is copied instead
+    assert [os.path.basename(os.path.dirname(f)) for f in copied] == ["locked"]
+
+
+def test_generated_corpus_cache(tmp_path):
+    def generate_corpus(track_id):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": track_id,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+                "generated-corpus-cache-size": "0.2MB",
+            }
+        )
+        cached = generate(test_track, tmp_path)
+        return cached, find_generated_corpus(test_track).documents[0]
+
+    cached, docs = generate_corpus("first")
+    assert not cached
+    with open(docs.document_file, "rb") as f:
+        expected_data = f.read()
+    with open(os.path.join(os.path.dirname(docs.document_file), "manifest.json"), "rt") as f:
+        manifest = json.load(f)
+    assert manifest["files"]["0.json"]["size"] == len(expected_data)
+    assert sorted(manifest["files"].keys()) == ["0.json", "0.json.checkpoint", "0.json.lines", "0.json.offset", "0.metadata"]
+
+    cached, docs = generate_corpus("first")
+    assert cached
+    # invalid data is generated again
+    with open(docs.document_file, "r+b") as f:
+        f.truncate(len(expected_data) // 2)
+    cached, docs = generate_corpus("first")
+    assert not cached
+    with open(docs.document_file, "rb") as f:
+        assert f.read() == expected_data
+
+    # the cache can hold only one corpus but the first one is still used
+    generate_corpus("second")
+    assert os.path.exists(os.path.dirname(docs.document_file))
+    # the race which has used it has ended
+    GeneratedCorpusCache(os.path.dirname(os.path.dirname(docs.document_file))).release("first")
+    cached, _ = generate_corpus("second")
+    assert cached
+    assert not os.path.exists(os.path.dirname(docs.document_file))
+
+
+def test_random_sampling(tmp_path, monkeypatch):
+    def generate_corpus(track_id):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {
+                    "system": {"corpora": {"system-logs": 0.5}},
+                    "agent": {"corpora": {"agent-logs": 0.5}},
+                },
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": track_id,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 2,
+                "data-generation-sampling": "random",
+            }
+        )
+        generate(test_track, tmp_path)
+        return find_generated_corpus(test_track)
+
+    corpus_stats = []
+    sample_corpus_stats = CorpusGenerator._sample_corpus_stats
+
+    def recording_sample_corpus_stats(self):
+        corpus_stats.append(sample_corpus_stats(self))
+        return corpus_stats[-1]
+
+    monkeypatch.setattr(CorpusGenerator, "_sample_corpus_stats", recording_sample_corpus_stats)
+    corpus = generate_corpus("sampled")
+    # stats are sampled across whole corpora and are thus identical for all clients
+    assert len(corpus_stats) == 2
+    assert corpus_stats[0] == corpus_stats[1]
+    for generated_docs in corpus.documents:
+        assert_rally_properties(read_file(generated_docs.document_file))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("stats should have been cached")
+
+    # stats are cached along with the source corpora
+    monkeypatch.setattr(data_generator, "sample_lines", fail)
+    cached_corpus = generate_corpus("cached")
+    assert corpus_stats[2] == corpus_stats[0]
+    for generated_docs, cached_docs in zip(corpus.documents, cached_corpus.documents):
+        assert_same_files(cached_docs.document_file, generated_docs.document_file)
+
+
+def test_random_sampling_once_before_clients(tmp_path, monkeypatch):
+    test_track = StaticTrack(
+        parameters={
+            "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "sampled",
+            "random-seed": 13,
+            "sample-size": 10,
+            "generator-batch-size": 10000,
+            "data-generation-clients": 2,
+            "data-generation-sampling": "random",
+        }
+    )
+    generator = DataGenerator()
+    generator.on_after_load_track(test_track)
+    tasks = generator.on_prepare_track(test_track, data_root_dir=tmp_path)
+
+    checksummed = []
+    checksum = GeneratedCorpusCache.checksum
+
+    def recording_checksum(file_name):
+        checksummed.append(file_name)
+        return checksum(file_name)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("stats should have been sampled before")
+
+    monkeypatch.setattr(GeneratedCorpusCache, "checksum", staticmethod(recording_checksum))
+    monkeypatch.setattr(data_generator, "sample_lines", fail)
+    for task, params in tasks:
+        task(**params)
+    # clients only calculate checksums of the generated corpus but not of the source corpus
+    generated_folder = test_track.selected_challenge_or_default.parameters["output-folder"]
+    assert checksummed
+    assert all(file_name.startswith(generated_folder) for file_name in checksummed)
+
+
+def test_indexed_corpus_stats(tmp_path, monkeypatch):
+    def generate_corpus(track_id):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {
+                    "system": {"corpora": {"system-logs": 0.5}},
+                    "agent": {"corpora": {"agent-logs": 0.5}},
+                },
+                "exclude-properties": {"agent-logs": ["host"]},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": track_id,
+                "random-seed": 13,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 2,
+                "data-generation-sampling": "index",
+            }
+        )
+        generate(test_track, tmp_path)
+        return test_track
+
+    calculated = []
+    file_stats = CorpusGenerator._file_stats
+
+    def recording_file_stats(self, data_file, corpus_name):
+        calculated.append(corpus_name)
+        return file_stats(self, data_file, corpus_name)
+
+    monkeypatch.setattr(CorpusGenerator, "_file_stats", recording_file_stats)
+    test_track = generate_corpus("first")
+    # stats are calculated once for all clients
+    assert sorted(calculated) == ["agent-logs", "system-logs"]
+    for corpus_name in ["system-logs", "agent-logs"]:
+        corpus = next(c for c in test_track.corpora if c.name == corpus_name)
+        data_file = corpus.documents[0].document_file
+        with open(os.path.join(tmp_path, "test_track", corpus_name, f"{os.path.basename(data_file)}.stats"), "rt") as f:
+            index = json.load(f)
+        assert index["size"] == os.path.getsize(data_file)
+        assert index["parameters"]["exclude-properties"] == (["host"] if corpus_name == "agent-logs" else [])
+        with open(data_file, "rt") as f:
+            source_docs = [json.loads(line) for line in f]
+        stats = index["stats"]
+        assert stats["number-of-documents"] == len(source_docs)
+        assert sum(stats["message-size-histogram"].values()) == len(source_docs)
+        assert stats["field-presence"]["@timestamp"] == len([doc for doc in source_docs if "@timestamp" in doc])
+        assert_rally_properties(read_file(find_generated_corpus(test_track).documents[0].document_file))
+
+    # stats are re-used
+    generate_corpus("second")
+    assert len(calculated) == 2
+
+
+def test_exact_volume_target(tmp_path):
+    source_file = os.path.join(tmp_path, "system-logs.json")
+    with open(os.path.join(os.path.dirname(__file__), "..", "parameter_sources", "resources", "documents", "test-system.json"), "rt") as f:
+        doc = f.readline().strip()
+    with open(source_file, "wt") as f:
+        f.writelines([f"{doc}\n"] * 100)
+
+    def generate_corpus(volume_target):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": volume_target,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 40,
+                "offset-increment": 40,
+                "data-generation-clients": 1,
+                "volume-target": volume_target,
+            }
+        )
+        test_track.corpora[0].documents[0].document_file = source_file
+        test_track.corpora[0].documents[0].number_of_documents = 100
+        generate(test_track, tmp_path)
+        corpus = find_generated_corpus(test_track)
+        data_file = corpus.documents[0].document_file
+        with open(f"{data_file}.checkpoint", "rt") as f:
+            checkpoint = json.load(f)
+        return data_file, corpus.documents[0], checkpoint
+
+    data_file, documents, checkpoint = generate_corpus("approximate")
+    assert documents.number_of_documents > checkpoint["docs-target"]
+    approximate_lines = read_file(data_file)
+
+    data_file, documents, checkpoint = generate_corpus("docs")
+    lines = read_file(data_file)
+    assert documents.number_of_documents == checkpoint["docs-target"] == len(lines) / 2
+    # only the last batch is trimmed
+    assert lines == approximate_lines[: len(lines)]
+    with open(f"{data_file}.offset", "rt") as f:
+        assert all(int(offset.split(";")[0]) < len(lines) for offset in f)
+    assert os.path.getsize(LineIndex.file_name(data_file)) == (len(lines) + 1) * LineIndex.ITEM_SIZE
+
+    data_file, documents, checkpoint = generate_corpus("bytes")
+    message_sizes = [doc["rally"]["message_size"] for doc in docs(read_file(data_file))]
+    assert len(message_sizes) == documents.number_of_documents
+    assert sum(message_sizes) == documents.metadata[1]
+    # stops at the doc which reaches the raw data volume
+    assert sum(message_sizes[:-1]) < checkpoint["bytes-target"] <= sum(message_sizes)
+
+
+def test_invalid_volume_target(tmp_path):
+    test_track = StaticTrack(
+        parameters={
+            "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "test_invalid_volume_target",
+            "generator-batch-size": 10000,
+            "volume-target": "lines",
+        }
+    )
+    with pytest.raises(TrackConfigError) as config_error:
+        generate(test_track, tmp_path)
+    assert config_error.value.message == '"volume-target" must be one of [approximate, docs, bytes] but was [lines]'
+
+
+def test_live_data_generation(tmp_path):
+    parameters = {
+        "integration-ratios": {"system": {"corpora": {"system-logs": 0.5}}, "agent": {"corpora": {"agent-logs": 0.5}}},
+        "raw-data-volume-per-day": "0.1MB",
+        "max-generated-corpus-size": "0.1MB",
+        "track-id": "test_live_data_generation",
+        "random-seed": 13,
+        "sample-size": 10,
+        "generator-batch-size": 7,
+        "data-generation-clients": 2,
+    }
+    files_track = StaticTrack(parameters=parameters)
+    generate(files_track, tmp_path)
+    generated_corpus = find_generated_corpus(files_track)
+
+    live_track = StaticTrack(parameters={**parameters, "data-generation-mode": "live"})
+    generator = DataGenerator()
+    generator.on_after_load_track(live_track)
+    assert generator.on_prepare_track(live_track, data_root_dir=tmp_path) == []
+    assert live_track.selected_challenge_or_default.parameters["track-data-root"] == os.path.join(tmp_path, live_track.name)
+    # no generated corpus is injected
+    assert [corpus.name for corpus in live_track.corpora] == ["system-logs", "agent-logs", "kafka-logs"]
+
+    # the same docs as in the generated files, per client
+    for client_index, documents in enumerate(generated_corpus.documents):
+        expected_lines = [line[:-1] for line in read_file(documents.document_file)]
+        batches = data_generator.live_generator(live_track, os.path.join(tmp_path, live_track.name), client_index, 2).live_batches()
+        lines = []
+        while len(lines) < len(expected_lines):
+            _, batch_lines, _ = next(batches)
+            lines.extend(batch_lines)
+        batches.close()
+        assert lines[: len(expected_lines)] == expected_lines
+
+
+def test_invalid_data_generation_mode(tmp_path):
+    test_track = StaticTrack(
+        parameters={
+            "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+            "raw-data-volume-per-day": "0.1MB",
+            "max-generated-corpus-size": "0.1MB",
+            "track-id": "test_invalid_data_generation_mode",
+            "generator-batch-size": 10000,
+            "data-generation-mode": "stream",
+        }
+    )
+    with pytest.raises(TrackConfigError) as config_error:
+        generate(test_track, tmp_path)
+    assert config_error.value.message == '"data-generation-mode" must be one of [files, live] but was [stream]'
+
+
+def test_invalid_sampling(tmp_path):
+    with pytest.raises(TrackConfigError) as track_config_error:
+        test_track = StaticTrack(
+            parameters={
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": "test_invalid_sampling",
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+                "data-generation-sampling": "head",
+            }
+        )
+        generate(test_track, tmp_path)
+    assert track_config_error.value.message == '"data-generation-sampling" must be one of [sequential, random, index] but was [head]'
+
+
+def test_copied_complete_data_generation(tmp_path):
+    def generate_corpus(track_id):
+        test_track = StaticTrack(
+            parameters={
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "1MB",
+                "track-id": track_id,
+                "random-seed": 13,
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+                "data-generation-splice-index": True,
+            }
+        )
+        generate(test_track, tmp_path)
+        return find_generated_corpus(test_track)
+
+    corpus = generate_corpus("first")
+    # a complete corpus of a sibling track id is copied including its metadata
+    copied_corpus = generate_corpus("second")
+    assert_same_files(copied_corpus.documents[0].document_file, corpus.documents[0].document_file)
+    assert copied_corpus.documents[0].metadata == corpus.documents[0].metadata
+    assert os.path.exists(f"{copied_corpus.documents[0].document_file}.checkpoint")
+
+
+def assert_line_index(data_file):
+    line_positions = array(LineIndex.TYPECODE)
+    with open(LineIndex.file_name(data_file), "rb") as f:
+        line_positions.frombytes(f.read())
+    with open(data_file, "rb") as f:
+        raw_lines = f.readlines()
+    assert len(line_positions) == len(raw_lines) + 1
+    assert line_positions[-1] == os.path.getsize(data_file)
+    for line_number, raw_line in enumerate(raw_lines):
+        assert line_positions[line_number + 1] - line_positions[line_number] == len(raw_line)
+
+
+def test_invalid_shard_count(tmp_path):
+    with pytest.raises(TrackConfigError) as track_config_error:
+        test_track = StaticTrack(
+            parameters={
+                "raw-data-volume-per-day": "0.1MB",
+                "max-generated-corpus-size": "0.1MB",
+                "track-id": "test_invalid_shard_count",
+                "integration-ratios": {"system": {"corpora": {"system-logs": 1.0}}},
+                "sample-size": 10,
+                "generator-batch-size": 10000,
+                "data-generation-clients": 1,
+                "data-generation-shards": 0,
+            }
+        )
+        generate(test_track, tmp_path)
+    assert track_config_error.value.message == '"data-generation-shards" must be at least 1 but was [0]'
+
+
+class LocalDownloader:
+    """
+    Stands in for a file server by copying files from a local folder.
+    """
+
+    def __init__(self, fail=None):
+        self.downloads = []
+        self.fail = fail
+
+    def download(self, base_url, target_path, size_in_bytes=None):
+        file_name = os.path.basename(target_path)
+        if file_name == self.fail:
+            raise DataError(f"Could not download [{file_name}]")
+        self.downloads.append(file_name)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copyfile(os.path.join(base_url, file_name), target_path)
+
+
+def document_sets_track(server_path, corpora, lines_per_file, parameters=None):
+    with open(os.path.join(os.path.dirname(__file__), "..", "parameter_sources", "resources", "documents", "test-system.json"), "rt") as f:
+        doc = f.readline().strip()
+    test_track = EmptyTrack(parameters={"track-id": "test_prepare_document_sets", **(parameters or {})})
+    test_track.corpora = []
+    for corpus_name, num_files in corpora.items():
+        corpus = DocumentCorpus(name=corpus_name)
+        for file_index in range(num_files):
+            document_file = f"{corpus_name}-{file_index}.json"
+            uncompressed_file = os.path.join(server_path, "uncompressed", document_file)
+            os.makedirs(os.path.dirname(uncompressed_file), exist_ok=True)
+            with open(uncompressed_file, "wt") as f:
+                f.writelines([f"{doc}\n"] * lines_per_file)
+            with open(uncompressed_file, "rb") as f, bz2.open(os.path.join(server_path, f"{document_file}.bz2"), "wb") as archive:
+                shutil.copyfileobj(f, archive)
+            corpus.documents.append(
+                Documents(
+                    source_format=Documents.SOURCE_FORMAT_BULK,
+                    document_file=document_file,
+                    document_archive=f"{document_file}.bz2",
+                    base_url=server_path,
+                    number_of_documents=lines_per_file,
+                    compressed_size_in_bytes=os.path.getsize(os.path.join(server_path, f"{document_file}.bz2")),
+                    uncompressed_size_in_bytes=os.path.getsize(uncompressed_file),
+                    target_data_stream="logs-system.test",
+                )
+            )
+        test_track.corpora.append(corpus)
+    return test_track
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_prepare_document_sets(tmp_path, processes):
+    server_path = os.path.join(tmp_path, "server")
+    test_track = document_sets_track(
+        server_path,
+        {"system-logs": 3, "agent-logs": 2},
+        lines_per_file=10,
+        parameters={"data-preparation-threads": 3, "data-preparation-processes": processes},
+    )
+    generator = DataGenerator()
+    generator.downloader = LocalDownloader()
+    generator.decompressor = Decompressor()
+    data_root = os.path.join(tmp_path, "data")
+    tasks = generator.on_prepare_track(test_track, data_root_dir=data_root)
+    assert len(tasks) == 2
+    assert sorted(generator.downloader.downloads) == sorted(
+        f"{corpus.name}-{i}.json.bz2" for corpus in test_track.corpora for i in range(len(corpus.documents))
+    )
+    for corpus in test_track.corpora:
+        for docs in corpus.documents:
+            document_file = os.path.join(data_root, test_track.name, corpus.name, docs.document_file)
+            assert len(read_file(document_file)) == 10
+            assert os.path.exists(f"{document_file}.offset")
+
+    # prepared document sets are not downloaded again
+    generator.downloader = LocalDownloader()
+    generator.on_prepare_track(test_track, data_root_dir=data_root)
+    assert generator.downloader.downloads == []
+
+
+def test_prepare_document_sets_failure(tmp_path):
+    server_path = os.path.join(tmp_path, "server")
+    test_track = document_sets_track(server_path, {"system-logs": 4}, lines_per_file=10, parameters={"data-preparation-threads": 2})
+    generator = DataGenerator()
+    generator.downloader = LocalDownloader(fail="system-logs-1.json.bz2")
+    generator.decompressor = Decompressor()
+    with pytest.raises(DataError) as data_error:
+        generator.on_prepare_track(test_track, data_root_dir=os.path.join(tmp_path, "data"))
+    assert data_error.value.message == "Could not download [system-logs-1.json.bz2]"
+
+
+def test_invalid_data_preparation_threads(tmp_path):
+    test_track = document_sets_track(
+        os.path.join(tmp_path, "server"), {"system-logs": 1}, lines_per_file=1, parameters={"data-preparation-threads": 0}
+    )
+    generator = DataGenerator()
+    generator.downloader = LocalDownloader()
+    generator.decompressor = Decompressor()
+    with pytest.raises(TrackConfigError) as config_error:
+        generator.on_prepare_track(test_track, data_root_dir=os.path.join(tmp_path, "data"))
+    assert config_error.value.message == '"data-preparation-threads" must be at least 1 but was [0]'
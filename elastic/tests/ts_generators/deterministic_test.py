@@ -18,6 +18,8 @@ import datetime
 import random
 
 from shared.ts_generators import FixedIntervalGenerator
+from shared.ts_generators.generator import Generator
+from shared.utils.time import from_epoch_micros
 
 
 def test_generate_from_now():
@@ -36,3 +38,26 @@ def test_generate_from_now_multiple_clients():
     assert generator.next_timestamp().isoformat(sep="T", timespec="milliseconds") == "2019-01-05T15:00:00.014+00:00"
     assert generator.next_timestamp().isoformat(sep="T", timespec="milliseconds") == "2019-01-05T15:00:00.034+00:00"
     assert generator.next_timestamp().isoformat(sep="T", timespec="milliseconds") == "2019-01-05T15:00:00.054+00:00"
+
+
+def test_generate_batch():
+    start_date = datetime.datetime(year=2019, month=1, day=5, hour=15, tzinfo=datetime.timezone.utc)
+    random.seed(13)
+    generator = FixedIntervalGenerator(8640000, start_date, 1)
+    random.seed(13)
+    expected = FixedIntervalGenerator(8640000, start_date, 1)
+    for count in [1, 7, 1000]:
+        timestamps = generator.next_timestamps(count)
+        assert [from_epoch_micros(ts) for ts in timestamps] == [expected.next_timestamp() for _ in range(count)]
+    assert generator.next_timestamp() == expected.next_timestamp()
+
+
+def test_generate_batch_default():
+    class SingleTimestampGenerator(Generator):
+        def next_timestamp(self):
+            return self._timestamp_generator.next(datetime.timedelta(milliseconds=1.5))
+
+    start_date = datetime.datetime(year=2019, month=1, day=5, hour=15, tzinfo=datetime.timezone.utc)
+    generator = SingleTimestampGenerator(8640000, start_date, 1)
+    expected = SingleTimestampGenerator(8640000, start_date, 1)
+    assert [from_epoch_micros(ts) for ts in generator.next_timestamps(3)] == [expected.next_timestamp() for _ in range(3)]
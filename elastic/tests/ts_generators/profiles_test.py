@@ -0,0 +1,124 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import datetime
+import random
+import statistics
+
+import pytest
+from esrally.exceptions import TrackConfigError
+from shared.ts_generators import get_ts_generator
+from shared.utils.time import from_epoch_micros
+
+START_DATE = datetime.datetime(year=2019, month=1, day=5, tzinfo=datetime.timezone.utc)
+
+
+def docs_per_hour(timestamps):
+    counts = [0] * 24
+    for timestamp in timestamps:
+        counts[from_epoch_micros(timestamp).hour] += 1
+    return counts
+
+
+@pytest.mark.parametrize("profile, params", [("diurnal", {}), ("bursty", {}), ("replay", {"histogram": [1, 2, 3]})])
+def test_mean_rate(profile, params):
+    random.seed(13)
+    generator = get_ts_generator(profile, 86400, START_DATE, 2, **params)
+    timestamps = generator.next_timestamps(432)
+    timestamps.extend(generator.next_timestamps(42768))
+    assert all(previous <= current for previous, current in zip(timestamps, timestamps[1:]))
+    assert from_epoch_micros(timestamps[0]) >= START_DATE
+    # half of the docs per day as there are two clients
+    end_date = from_epoch_micros(timestamps[-1])
+    assert START_DATE + datetime.timedelta(hours=23) < end_date < START_DATE + datetime.timedelta(hours=25)
+
+
+def test_deterministic():
+    timestamps = []
+    for _ in range(0, 2):
+        random.seed(13)
+        generator = get_ts_generator("bursty", 864000, START_DATE, 1)
+        timestamps.append([from_epoch_micros(ts) for ts in generator.next_timestamps(10)] + [generator.next_timestamp()])
+    assert timestamps[0] == timestamps[1]
+
+
+def test_diurnal():
+    random.seed(13)
+    generator = get_ts_generator("diurnal", 86400, START_DATE, 1, **{"amplitude": 1.0, "peak-hour": 12})
+    counts = docs_per_hour(generator.next_timestamps(86400))
+    assert counts.index(max(counts)) in [11, 12]
+    assert counts.index(min(counts)) in [0, 23]
+    # the rate at the peak is twice the mean
+    assert max(counts) == pytest.approx(2 * 3600, rel=0.01)
+    assert min(counts) < 0.02 * 3600
+
+
+def test_replay():
+    random.seed(13)
+    generator = get_ts_generator("replay", 86400, START_DATE, 1, **{"histogram": [2, 0, 0, 2]})
+    counts = docs_per_hour(generator.next_timestamps(86400))
+    assert counts == [7200] * 6 + [0] * 12 + [7200] * 6
+
+
+def test_replay_period():
+    random.seed(13)
+    generator = get_ts_generator("replay", 86400, START_DATE, 1, **{"histogram": [1, 0], "period-days": 2})
+    timestamps = generator.next_timestamps(172801)
+    # all docs of the period are on its first day
+    assert from_epoch_micros(timestamps[172799]).date() == datetime.date(2019, 1, 5)
+    assert from_epoch_micros(timestamps[172800]).date() == datetime.date(2019, 1, 7)
+
+
+def test_bursty():
+    random.seed(13)
+    poisson = get_ts_generator("bursty", 864000, START_DATE, 1, **{"branching-ratio": 0})
+    random.seed(13)
+    bursty = get_ts_generator("bursty", 864000, START_DATE, 1, **{"branching-ratio": 0.9, "burst-duration": 10})
+
+    def docs_per_ten_seconds(timestamps):
+        counts = {}
+        for timestamp in timestamps:
+            counts[timestamp // 10000000] = counts.get(timestamp // 10000000, 0) + 1
+        return list(counts.values())
+
+    # both have a mean of 100 docs per ten seconds but bursts lead to a considerably higher variation
+    poisson_deviation = statistics.pstdev(docs_per_ten_seconds(poisson.next_timestamps(100000)))
+    bursty_deviation = statistics.pstdev(docs_per_ten_seconds(bursty.next_timestamps(100000)))
+    # the standard deviation of a Poisson distribution is the square root of its mean
+    assert poisson_deviation == pytest.approx(10, rel=0.1)
+    assert bursty_deviation > 2 * poisson_deviation
+
+
+@pytest.mark.parametrize(
+    "profile, params, message",
+    [
+        ("diurnal", {"amplitude": 2}, '"amplitude" of profile [diurnal] must be between 0 and 1 but was [2]'),
+        ("bursty", {"branching-ratio": 1}, '"branching-ratio" of profile [bursty] must be at least 0 and less than 1 but was [1]'),
+        ("bursty", {"burst-duration": 0}, '"burst-duration" of profile [bursty] must be positive but was [0]'),
+        ("replay", {}, 'Profile [replay] requires the parameter "histogram"'),
+        (
+            "replay",
+            {"histogram": [0, -1]},
+            "The histogram of profile [replay] must have non-negative weights and at least one positive weight but was [0, -1]",
+        ),
+        ("replay", {"histogram": [1], "period-days": 0}, '"period-days" of profile [replay] must be at least 1 but was [0]'),
+        ("poisson", {}, "[poisson] is not a registered profile"),
+    ],
+)
+def test_invalid_profile(profile, params, message):
+    with pytest.raises(TrackConfigError) as config_error:
+        get_ts_generator(profile, 864000, START_DATE, 1, **params)
+    assert config_error.value.message == message
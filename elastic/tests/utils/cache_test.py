@@ -0,0 +1,117 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import fcntl
+import os
+import time
+
+from shared.utils.cache import GeneratedCorpusCache
+
+
+def write_corpus(cache_dir, track_id, size_in_bytes):
+    os.makedirs(os.path.join(cache_dir, track_id), exist_ok=True)
+    for file_name in ["0.json", "0.metadata"]:
+        with open(os.path.join(cache_dir, track_id, file_name), "wb") as f:
+            f.write(b"x" * size_in_bytes)
+    return ["0.json", "0.metadata"]
+
+
+def test_verify(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path))
+    files = write_corpus(tmp_path, "corpus", 10)
+    # not published yet
+    assert cache.verify("corpus", files) is None
+    cache.publish("corpus", files)
+    assert cache.verify("corpus", files) is True
+
+    data_file = os.path.join(tmp_path, "corpus", "0.json")
+    # modified without changing the contents, e.g. by copying the corpus from another host
+    os.utime(data_file, ns=(0, 0))
+    assert cache.verify("corpus", files) is True
+    # contents are modified
+    with open(data_file, "wb") as f:
+        f.write(b"y" * 10)
+    assert cache.verify("corpus", files) is False
+    # truncated
+    with open(data_file, "wb") as f:
+        f.write(b"x" * 5)
+    assert cache.verify("corpus", files) is False
+    os.remove(data_file)
+    assert cache.verify("corpus", files) is False
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path), max_size_in_bytes=60)
+    for track_id in ["a", "b", "c", "d"]:
+        cache.publish(track_id, write_corpus(tmp_path, track_id, 10))
+        # ensure distinct timestamps
+        time.sleep(0.01)
+    # "a" is used again and "b" is being generated
+    assert cache.verify("a", ["0.json", "0.metadata"]) is True
+    with cache.generation_lock("b", 0):
+        cache.evict(keep="d")
+        # "b" and "c" are the least recently used ones but "b" is locked
+        assert sorted(os.listdir(tmp_path)) == [".lock", "a", "b", "d"]
+        # no more corpora can be evicted
+        cache.evict(keep="d")
+        assert sorted(os.listdir(tmp_path)) == [".lock", "a", "b", "d"]
+    cache.publish("e", write_corpus(tmp_path, "e", 10))
+    cache.evict(keep="e")
+    assert sorted(os.listdir(tmp_path)) == [".lock", "a", "d", "e"]
+
+
+def test_no_eviction_without_limit(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path))
+    for track_id in ["a", "b"]:
+        cache.publish(track_id, write_corpus(tmp_path, track_id, 1000))
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == [".lock", "a", "b"]
+
+
+def test_generation_lock(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path))
+    lock_file = os.path.join(tmp_path, "corpus", "0.lock")
+    with cache.generation_lock("corpus", 0):
+        assert GeneratedCorpusCache._is_locked(lock_file)
+        assert not GeneratedCorpusCache._is_locked(os.path.join(tmp_path, "corpus", "1.lock"))
+    assert not GeneratedCorpusCache._is_locked(lock_file)
+
+
+def test_evict_skips_corpora_in_use(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path), max_size_in_bytes=20)
+    for track_id in ["a", "b", "c"]:
+        cache.publish(track_id, write_corpus(tmp_path, track_id, 10))
+        time.sleep(0.01)
+    # "a" is read by another process, which holds a shared lock for the whole race
+    with open(os.path.join(tmp_path, "a", GeneratedCorpusCache.IN_USE_LOCK), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH)
+        cache.evict(keep="c")
+        assert sorted(os.listdir(tmp_path)) == [".lock", "a", "c"]
+    cache.evict(keep="c")
+    assert sorted(os.listdir(tmp_path)) == [".lock", "c"]
+
+
+def test_use_and_release(tmp_path):
+    cache = GeneratedCorpusCache(str(tmp_path), max_size_in_bytes=0)
+    cache.publish("a", write_corpus(tmp_path, "a", 10))
+    cache.use("a")
+    # idempotent
+    cache.use("a")
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == [".lock", "a"]
+    cache.release("a")
+    cache.evict()
+    assert sorted(os.listdir(tmp_path)) == [".lock"]
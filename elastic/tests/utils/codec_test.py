@@ -0,0 +1,85 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import json
+import os
+
+import pytest
+from esrally.exceptions import TrackConfigError
+from shared.utils.codec import available_codecs, get_codec, register_codec
+
+# documents covering the cases in which third-party libraries differ from the standard library
+DOCS = [
+    '{"@timestamp": "2020-09-03T15:16:17.406Z", "id": 1, "message": "dummy", "msglen": 5}',
+    '{"message":"\\u00fcber caf\\u00e9 \\u2028 \\ud83d\\ude00","path":"/var/log/system.log","ctrl":"\\u001f\\n\\t\\"\\\\"}',
+    '{"message":"über café 😀"}',
+    '{"floats":[0.1,123.456,1.0,100.0,-0.0,1e16,1e-05,2.5e-7,1.7976931348623157e308,5e-324,1E+22]}',
+    '{"ints":[0,-1,9223372036854775807,-9223372036854775808,18446744073709551616,123456789012345678901234567890]}',
+    '{"special":[NaN,Infinity,-Infinity]}',
+    '{"duplicate":1,"duplicate":2}',
+    '{"nested":{"a":[{"b":null,"c":true,"d":false}],"e":{}},"empty":[]}',
+    '{"lone_surrogate":"\\ud800"}',
+    "{}",
+]
+
+
+def load_resource_docs():
+    cwd = os.path.dirname(__file__)
+    docs = []
+    for name in ["test-agent.json", "test-kafka.json", "test-system.json"]:
+        with open(os.path.join(cwd, "..", "parameter_sources", "resources", "documents", name), "rb") as f:
+            docs.extend(line.decode("utf-8") for line in f)
+    return docs
+
+
+@pytest.mark.parametrize("codec_type", available_codecs())
+def test_codec_parity(codec_type):
+    codec = get_codec(codec_type)
+    for doc in DOCS + load_resource_docs():
+        expected = json.loads(doc)
+        for raw_doc in [doc, doc.encode("utf-8", "surrogatepass")]:
+            actual = codec.loads(raw_doc)
+            # compare the serialized form as NaN != NaN
+            assert json.dumps(actual) == json.dumps(expected)
+            assert type(actual) == type(expected)
+        assert codec.dumps(expected) == json.dumps(expected)
+        assert codec.dumps_compact(expected) == json.dumps(expected, separators=(",", ":"))
+        # any valid JSON is fine here
+        if "NaN" not in doc and "Infinity" not in doc:
+            assert json.dumps(json.loads(codec.encode(expected))) == json.dumps(expected)
+
+
+def test_auto_codec():
+    assert get_codec("auto") is get_codec(available_codecs()[0])
+    assert "stdlib" in available_codecs()
+
+
+def test_unknown_codec():
+    with pytest.raises(TrackConfigError) as track_config_error:
+        get_codec("unknown")
+    assert track_config_error.value.message == "[unknown] is not a registered JSON codec"
+
+
+def test_unavailable_codec():
+    class UnavailableCodec:
+        def __init__(self):
+            raise ImportError("No module named 'unavailable'")
+
+    register_codec("unavailable", UnavailableCodec)
+    assert "unavailable" not in available_codecs()
+    with pytest.raises(TrackConfigError) as track_config_error:
+        get_codec("unavailable")
+    assert track_config_error.value.message == "JSON codec [unavailable] is not available. Install the respective library and try again."
@@ -0,0 +1,71 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import pytest
+from esrally.exceptions import TrackConfigError
+from shared.utils.compression import (
+    BlockCompressedSource,
+    BlockCompressedWriter,
+    compression_for_file,
+    get_compression,
+    register_compression,
+)
+
+
+@pytest.mark.parametrize("compression_type", ["gzip", "zstd"])
+def test_block_compression(tmp_path, compression_type):
+    compression = get_compression(compression_type)
+    data_file = str(tmp_path / f"test.json{compression.file_extension}")
+    assert compression_for_file(data_file) is compression
+
+    block_starts = []
+    with BlockCompressedWriter(data_file, compression) as writer:
+        for block in range(0, 3):
+            writer.start_block()
+            block_starts.append(writer.tell())
+            # a block can consist of several writes
+            writer.writelines([f'{{"block": {block}, "line": {line}}}\n' for line in range(0, 2)])
+            writer.writelines([f'{{"block": {block}, "line": {line}}}\n' for line in range(2, 4)])
+
+    with BlockCompressedSource(data_file, "rt") as source:
+        assert len(source.readlines(20)) == 12
+        for block in [2, 0, 1]:
+            source.seek(block_starts[block])
+            assert source.readline() == f'{{"block": {block}, "line": 0}}\n'.encode("utf-8")
+        assert source.readlines(3) == [f'{{"block": 1, "line": {line}}}\n'.encode("utf-8") for line in range(1, 4)]
+
+
+def test_uncompressed_file():
+    assert compression_for_file("test.json") is None
+
+
+def test_unknown_compression():
+    with pytest.raises(TrackConfigError) as track_config_error:
+        get_compression("unknown")
+    assert track_config_error.value.message == "[unknown] is not a registered compression"
+
+
+def test_unavailable_compression():
+    class UnavailableCompression:
+        file_extension = ".unavailable"
+
+        def __init__(self):
+            raise ImportError("No module named 'unavailable'")
+
+    register_compression("unavailable", UnavailableCompression)
+    with pytest.raises(TrackConfigError) as track_config_error:
+        compression_for_file("test.json.unavailable")
+    assert track_config_error.value.message == "Compression [unavailable] is not available. Install the respective library and try again."
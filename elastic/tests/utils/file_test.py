@@ -14,12 +14,25 @@
 # KIND, either express or implied.  See the License for the
 # specific language governing permissions and limitations
 # under the License.
+import gc
 import json
 import os
+import shutil
+import threading
+from array import array
 
 import pytest
 from esrally.utils import io
-from shared.utils.file import CorpusReader, FileMetadata, JsonFileReader, WrappingSlice
+from shared.utils.file import (
+    CorpusReader,
+    FileMetadata,
+    JsonFileReader,
+    LineIndex,
+    Prefetcher,
+    SharedMmap,
+    SharedMmapSource,
+    WrappingSlice,
+)
 
 cwd = os.path.dirname(__file__)
 
@@ -125,3 +138,185 @@ def test_set_bulk_size():
             assert len(docs) == 4
             assert i == docs[1]["id"]
             assert i + 1 == docs[3]["id"]
+
+
+def test_corpus_reader_position(tmp_path):
+    data_file = os.path.join(tmp_path, "sample-3.json")
+    shutil.copy(os.path.join(cwd, "resources", "sample-3.json"), data_file)
+    with open(data_file, "rb") as f:
+        line_lengths = [len(line) for line in f]
+    # allows to fast forward to line 4
+    with open(f"{data_file}.offset", "wt") as f:
+        print("4;%d" % sum(line_lengths[:4]), file=f)
+
+    def corpus_reader():
+        readers = [
+            JsonFileReader(data_file, WrappingSlice(io.MmapSource, 2, 5), json_test_processor, "test-index", "test-corpus"),
+            JsonFileReader(
+                os.path.join(cwd, "resources", "sample-1.json"),
+                WrappingSlice(io.MmapSource, 0, 2),
+                json_test_processor,
+                "test-index",
+                "test-corpus",
+            ),
+        ]
+        return CorpusReader(readers, 2)
+
+    def read_ids(reader, bulks):
+        return [[doc["id"] for doc in next(reader)[1][1::2]] for _ in range(bulks)]
+
+    for bulks in range(0, 6):
+        with corpus_reader() as reader:
+            read_ids(reader, bulks)
+            position = reader.position()
+            expected = read_ids(reader, 5)
+        with corpus_reader() as reader:
+            reader.seek(position)
+            assert read_ids(reader, 5) == expected
+
+
+def test_wrapping_slice_with_line_index(tmp_path):
+    data_file = os.path.join(tmp_path, "sample-3.json")
+    shutil.copy(os.path.join(cwd, "resources", "sample-3.json"), data_file)
+    with open(data_file, "rb") as f:
+        line_lengths = [len(line) for line in f]
+    with open(LineIndex.file_name(data_file), "wb") as f:
+        array(LineIndex.TYPECODE, [sum(line_lengths[:i]) for i in range(len(line_lengths) + 1)]).tofile(f)
+    assert LineIndex.position(data_file, 0) == 0
+    assert LineIndex.position(data_file, 7) == sum(line_lengths[:7])
+    assert LineIndex.position(data_file, 11) is None
+    # the offset file is not read if the line index is valid
+    with open(f"{data_file}.offset", "wt") as f:
+        f.write("unparsable")
+
+    source = WrappingSlice(io.MmapSource, 7, 3)
+    reader = JsonFileReader(data_file, source, json_test_processor, "test-index", "test-corpus")
+    reader.open(2)
+    # no lines need to be skipped on open or reset
+    assert source._remaining_lines == 0
+    for _ in range(0, 2):
+        docs, _ = next(reader)
+        assert [doc["id"] for doc in docs[1::2]] == [7, 8]
+        docs, _ = next(reader)
+        assert [doc["id"] for doc in docs[1::2]] == [9]
+        docs, _ = next(reader)
+        assert docs is None
+        reader.reset()
+    reader.close()
+
+
+def test_stale_line_index(tmp_path):
+    data_file = os.path.join(tmp_path, "sample-3.json")
+    shutil.copy(os.path.join(cwd, "resources", "sample-3.json"), data_file)
+    # does not end with the size of the data file
+    with open(LineIndex.file_name(data_file), "wb") as f:
+        array(LineIndex.TYPECODE, [0, 3, 5]).tofile(f)
+    assert LineIndex.position(data_file, 1) is None
+
+    source = WrappingSlice(io.MmapSource, 7, 3)
+    reader = JsonFileReader(data_file, source, json_test_processor, "test-index", "test-corpus")
+    reader.open(3)
+    docs, _ = next(reader)
+    assert [doc["id"] for doc in docs[1::2]] == [7, 8, 9]
+    reader.close()
+
+
+def test_shared_mmap_source():
+    data_file = os.path.join(cwd, "resources", "sample-3.json")
+    with io.MmapSource(data_file, "rb") as expected:
+        expected_lines = expected.readlines(100)
+    mapped_files = SharedMmap.size()
+    with SharedMmapSource(data_file, "rb") as first, SharedMmapSource(data_file, "rb") as second:
+        # both sources share a mapping but have their own position
+        assert first.mm is second.mm
+        assert SharedMmap.size() == mapped_files + 1
+        assert first.readlines(3) == expected_lines[:3]
+        assert second.readline() == expected_lines[0]
+        assert first.readline() == expected_lines[3]
+        second.seek(len(expected_lines[0]) + len(expected_lines[1]))
+        assert second.readlines(100) == expected_lines[2:]
+        assert second.readline() == b""
+        first.seek(0)
+        assert first.read() == b"".join(expected_lines)
+    # the mapping is closed with the last source
+    assert SharedMmap.size() == mapped_files
+
+
+def test_shared_mmap_of_replaced_file(tmp_path):
+    data_file = os.path.join(tmp_path, "data.json")
+    with open(data_file, "wb") as f:
+        f.write(b"a\n")
+    with SharedMmapSource(data_file, "rb") as first:
+        with open(f"{data_file}.tmp", "wb") as f:
+            f.write(b"bb\n")
+        os.replace(f"{data_file}.tmp", data_file)
+        with SharedMmapSource(data_file, "rb") as second:
+            assert first.mm is not second.mm
+            assert first.readline() == b"a\n"
+            assert second.readline() == b"bb\n"
+
+
+@pytest.mark.parametrize("depth", [0, 1, 3])
+def test_prefetcher(depth):
+    items = iter(range(0, 10))
+
+    def read():
+        return next(items)
+
+    with Prefetcher(read, depth) as prefetcher:
+        assert [next(prefetcher) for _ in range(0, 10)] == list(range(0, 10))
+        # errors are raised on the consumer's side, also on subsequent calls
+        for _ in range(0, 2):
+            with pytest.raises(StopIteration):
+                next(prefetcher)
+
+
+def test_prefetcher_ends_iteration_once():
+    items = iter(range(0, 3))
+
+    def read():
+        return next(items)
+
+    def consume():
+        with Prefetcher(read, 2) as prefetcher:
+            # next() with a default ends iteration without a StopIteration escaping the generator
+            while (item := next(prefetcher, None)) is not None:
+                yield item
+
+    assert list(consume()) == [0, 1, 2]
+
+
+def test_prefetcher_stops_when_abandoned():
+    class Source:
+        def __init__(self):
+            # the generator and the prefetcher's read function reference each other via the source
+            self.items = self._items()
+
+        def _read(self):
+            return 1
+
+        def _items(self):
+            with Prefetcher(self._read, 2, "abandoned-prefetcher") as prefetcher:
+                while True:
+                    yield next(prefetcher)
+
+    source = Source()
+    assert next(source.items) == 1
+    [thread] = [t for t in threading.enumerate() if t.name == "abandoned-prefetcher"]
+    # neither the generator nor the prefetcher are closed explicitly
+    del source
+    gc.collect()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_prefetcher_stops_blocked_thread():
+    def read():
+        return 1
+
+    prefetcher = Prefetcher(read, 2)
+    prefetcher.start()
+    assert next(prefetcher) == 1
+    # the background thread is blocked as the queue is full
+    prefetcher.close()
+    assert prefetcher._thread is None
@@ -0,0 +1,143 @@
+# Licensed to Elasticsearch B.V. under one or more contributor
+# license agreements. See the NOTICE file distributed with
+# this work for additional information regarding copyright
+# ownership. Elasticsearch B.V. licenses this file to you under
+# the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+import os
+import shutil
+
+import pytest
+from esrally.exceptions import DataError
+from shared.utils import sampling
+from shared.utils.sampling import CorpusStats, CorpusStatsIndex, sample_lines
+
+cwd = os.path.dirname(__file__)
+
+
+def test_sample_lines():
+    data_files = [os.path.join(cwd, "resources", f"sample-{i}.json") for i in range(1, 4)]
+    lines = []
+    for data_file in data_files:
+        with open(data_file, "rb") as f:
+            lines.extend(f.readlines())
+    sample = list(sample_lines(data_files, 8))
+    assert len(sample) == 8
+    assert all(line in lines for line in sample)
+    # strata cover all files
+    assert set(sample) & set(lines[:2])
+    assert set(sample) & set(lines[-10:])
+    # sampling is deterministic
+    assert list(sample_lines(data_files, 8)) == sample
+    assert list(sample_lines(data_files, 8, seed=1)) != sample
+
+
+def test_sample_lines_wraps_around(tmp_path):
+    data_file = os.path.join(tmp_path, "docs.json")
+    with open(data_file, "wb") as f:
+        f.write(b'{"id": 0}\n')
+    # the line after the only line is the first line again
+    assert list(sample_lines([data_file], 3)) == [b'{"id": 0}\n'] * 3
+
+
+def test_sample_empty_files(tmp_path):
+    data_file = os.path.join(tmp_path, "docs.json")
+    open(data_file, "wb").close()
+    with pytest.raises(DataError):
+        list(sample_lines([data_file], 3))
+
+
+def test_corpus_stats(tmp_path, monkeypatch):
+    corpus_folder = os.path.join(tmp_path, "corpus")
+    data_file = os.path.join(tmp_path, "sample-3.json")
+    shutil.copy(os.path.join(cwd, "resources", "sample-3.json"), data_file)
+    checksum = sampling.GeneratedCorpusCache.checksum
+    checksums = []
+
+    def counting_checksum(file_name):
+        checksums.append(file_name)
+        return checksum(file_name)
+
+    monkeypatch.setattr(sampling.GeneratedCorpusCache, "checksum", counting_checksum)
+    key = CorpusStats.key(corpus_folder, [data_file], {"sample-size": 10})
+    assert CorpusStats.read(corpus_folder, key) is None
+    CorpusStats.write(corpus_folder, key, {"avg_doc_size": 10})
+    assert CorpusStats.key(corpus_folder, [data_file], {"sample-size": 10}) == key
+    assert CorpusStats.read(corpus_folder, key) == {"avg_doc_size": 10}
+    # the checksum is only calculated once for unmodified files
+    assert len(checksums) == 1
+    assert CorpusStats.key(corpus_folder, [data_file], {"sample-size": 20}) != key
+
+    # modified without changing the contents
+    os.utime(data_file, ns=(0, 0))
+    assert CorpusStats.key(corpus_folder, [data_file], {"sample-size": 10}) == key
+    assert len(checksums) == 2
+    with open(data_file, "ab") as f:
+        f.write(b'{"id": 10}\n')
+    assert CorpusStats.key(corpus_folder, [data_file], {"sample-size": 10}) != key
+
+
+def test_corpus_stats_index(tmp_path):
+    corpus_folder = os.path.join(tmp_path, "corpus")
+    data_file = os.path.join(tmp_path, "sample-3.json")
+    shutil.copy(os.path.join(cwd, "resources", "sample-3.json"), data_file)
+    assert CorpusStatsIndex.read(corpus_folder, data_file, {"passthrough": False}) is None
+    stats = CorpusStatsIndex.merge([])
+    stats["number-of-documents"] = 10
+    CorpusStatsIndex.write(corpus_folder, data_file, {"passthrough": False}, stats)
+    assert CorpusStatsIndex.read(corpus_folder, data_file, {"passthrough": False}) == stats
+    assert CorpusStatsIndex.read(corpus_folder, data_file, {"passthrough": True}) is None
+    # stale once the file is modified
+    os.utime(data_file, ns=(0, 0))
+    assert CorpusStatsIndex.read(corpus_folder, data_file, {"passthrough": False}) is None
+
+
+def test_merge_corpus_stats_index():
+    stats = [
+        {
+            "number-of-documents": 2,
+            "total-message-size": 30,
+            "total-doc-size": 100,
+            "total-doc-size-with-meta": 150,
+            "message-size-histogram": {"4": 1, "16": 1},
+            "doc-size-histogram": {"20": 2},
+            "field-presence": {"@timestamp": 2, "message": 1},
+        },
+        {
+            "number-of-documents": 1,
+            "total-message-size": 10,
+            "total-doc-size": 50,
+            "total-doc-size-with-meta": 75,
+            "message-size-histogram": {"16": 1},
+            "doc-size-histogram": {"24": 1},
+            "field-presence": {"@timestamp": 1},
+        },
+    ]
+    assert CorpusStatsIndex.merge(stats) == {
+        "number-of-documents": 3,
+        "total-message-size": 40,
+        "total-doc-size": 150,
+        "total-doc-size-with-meta": 225,
+        "message-size-histogram": {"4": 1, "16": 2},
+        "doc-size-histogram": {"20": 2, "24": 1},
+        "field-presence": {"@timestamp": 3, "message": 1},
+    }
+
+
+def test_histogram_buckets():
+    for value in [1, 2, 3, 100, 1000, 123456]:
+        bucket = CorpusStatsIndex.bucket(value)
+        assert CorpusStatsIndex.upper_bound(bucket - 1) < value <= CorpusStatsIndex.upper_bound(bucket) * (1 + 1e-9)
+    histogram = {str(CorpusStatsIndex.bucket(value)): 1 for value in [1, 10, 100, 1000]}
+    assert CorpusStatsIndex.percentile(histogram, 50) == pytest.approx(CorpusStatsIndex.upper_bound(CorpusStatsIndex.bucket(10)))
+    assert CorpusStatsIndex.percentile(histogram, 100) == pytest.approx(CorpusStatsIndex.upper_bound(CorpusStatsIndex.bucket(1000)))
@@ -16,14 +16,19 @@
 # under the License.
 
 import datetime
+import time
 
 import pytest
 from shared.utils.time import (
     DateTimeValues,
     TimeParsingError,
+    TimestampFormatter,
     TimestampStructGenerator,
+    from_epoch_micros,
     parse_date_optional_time,
     parse_date_time,
+    parse_relative_date_math,
+    to_epoch_micros,
 )
 
 
@@ -47,6 +52,56 @@ def test_generate_from_now():
     assert g.next(datetime.timedelta(seconds=2)) == datetime.datetime(year=2019, month=1, day=5, hour=15, minute=0, second=17)
 
 
+def test_generate_epoch_micros():
+    start = datetime.datetime(year=2019, month=1, day=5, hour=15, tzinfo=datetime.timezone.utc)
+    g = TimestampStructGenerator(starting_point=start)
+    expected = TimestampStructGenerator(starting_point=start)
+    delta = datetime.timedelta(milliseconds=10.0000005)
+
+    assert list(g.next_epoch_micros(delta, 3)) == [to_epoch_micros(expected.next(delta)) for _ in range(3)]
+    # continues where the previous batch ended
+    assert g.next(delta) == expected.next(delta)
+    assert list(g.next_epoch_micros(datetime.timedelta(0), 2)) == [to_epoch_micros(expected.next(datetime.timedelta(0)))] * 2
+
+
+def test_generate_in_time_zone_of_starting_point():
+    time_zone = datetime.timezone(datetime.timedelta(hours=2))
+    start = datetime.datetime(year=2019, month=1, day=5, hour=15, tzinfo=time_zone)
+    g = TimestampStructGenerator(starting_point=start)
+
+    point = g.next(datetime.timedelta(seconds=5))
+    assert point.tzinfo == time_zone
+    assert point.isoformat() == "2019-01-05T15:00:05+02:00"
+    # intervals can also be given as microseconds
+    assert list(g.next_epoch_micros(1000, 2)) == [to_epoch_micros(point) + 1000, to_epoch_micros(point) + 2000]
+
+
+def test_epoch_micros_roundtrip():
+    point = datetime.datetime(year=2020, month=8, day=31, hour=4, minute=12, second=26, microsecond=435123, tzinfo=datetime.timezone.utc)
+    assert to_epoch_micros(point) == 1598847146435123
+    assert from_epoch_micros(1598847146435123) == point
+    # naive points in time are interpreted as UTC
+    assert to_epoch_micros(point.replace(tzinfo=None)) == 1598847146435123
+
+
+@pytest.mark.parametrize(
+    "ts_format",
+    ["%s", "%d/%b/%Y:%H:%M:%S +0000", "%a %b %d %H:%M:%S %Y", "%Y-%m-%d %H:%M:%S", "%j %U %w %Z %z"],
+)
+def test_timestamp_formatter(ts_format):
+    formatter = TimestampFormatter()
+    start = datetime.datetime(year=1969, month=12, day=31, hour=23, minute=59, second=58, tzinfo=datetime.timezone.utc)
+    for i in range(0, 50):
+        # covers several docs within the same second as well as negative epoch values
+        timestamp = start + datetime.timedelta(milliseconds=i * 123)
+        if ts_format == "%s":
+            expected = str(timestamp.timestamp().__trunc__())
+        else:
+            expected = time.strftime(ts_format, timestamp.timetuple())
+        assert formatter.strftime(ts_format, to_epoch_micros(timestamp)) == expected
+        assert formatter.isoformat_seconds(to_epoch_micros(timestamp)) == timestamp.strftime("%Y-%m-%dT%H:%M:%S")
+
+
 def test_parse_date_time():
     date_time = parse_date_time("2018-05-01T00:59:56Z")
     assert date_time == datetime.datetime(
@@ -204,3 +259,13 @@ def test_fixed_intervals():
 
     date_data = DateTimeValues(None, utc_now, datetime.timedelta(days=100))
     assert date_data.fixed_interval == "1d"
+
+
+def test_parse_relative_date_math():
+    now = datetime.datetime(year=2019, month=1, day=5, hour=15, tzinfo=datetime.timezone.utc)
+    assert parse_relative_date_math("now", now) == (now, None)
+    assert parse_relative_date_math("now-15m", now) == (now - datetime.timedelta(minutes=15), None)
+    assert parse_relative_date_math("now+1w/d", now) == (now + datetime.timedelta(weeks=1), "d")
+    assert parse_relative_date_math("now/M", now) == (now, "M")
+    assert parse_relative_date_math("2019-01-05", now) is None
+    assert parse_relative_date_math(1546700400000, now) is None
@@ -15,8 +15,12 @@
 # specific language governing permissions and limitations
 # under the License.
 
+import random
+
 from esrally.track import DocumentCorpus, Documents, Track
 from shared.utils.corpus import (
+    CorpusSelector,
+    VolumeTarget,
     bounds,
     calculate_corpus_counts,
     calculate_integration_ratios,
@@ -153,3 +157,47 @@ def test_convert_to_gib():
     assert convert_to_gib("2T") == 2048
     assert convert_to_gib("1PB") == 1048576
     assert convert_to_gib("2P") == 2097152
+
+
+def test_corpus_selector():
+    corpora = ["system-logs", "agent-logs", "kafka-logs"]
+    weights = [0.2, 0.5, 0.3]
+    random.seed(13)
+    expected = [random.choices(corpora, weights=weights)[0] for _ in range(25)]
+    expected_state = random.getstate()
+
+    random.seed(13)
+    selector = CorpusSelector(corpora, weights, block_size=10)
+    assert [next(selector) for _ in range(25)] == expected
+    # blocks are drawn ahead
+    assert random.getstate() != expected_state
+    assert selector.random_state() == expected_state
+    # continues from the state of the next selection
+    random.setstate(selector.random_state())
+    assert [next(selector) for _ in range(5)] == [random.choices(corpora, weights=weights)[0] for _ in range(5)]
+
+
+def test_corpus_selector_state_before_first_selection():
+    random.seed(13)
+    state = random.getstate()
+    assert CorpusSelector(["system-logs"], [1.0]).random_state() == state
+
+
+def test_volume_target():
+    approximate = VolumeTarget("approximate", 100)
+    assert not approximate.reached(99, 10000)
+    assert approximate.reached(100, 0)
+    assert approximate.batch_size(10, 95, 0) == 10
+
+    docs = VolumeTarget("docs", 100)
+    assert docs.batch_size(10, 80, 0) == 10
+    assert docs.batch_size(10, 95, 0) == 5
+
+    size_in_bytes = VolumeTarget("bytes", 100, 1000)
+    assert not size_in_bytes.reached(200, 999)
+    assert size_in_bytes.reached(1, 1000)
+    # unknown doc sizes
+    assert size_in_bytes.batch_size(10, 0, 0) == 10
+    # half of the 50 docs estimated to be left
+    assert size_in_bytes.batch_size(100, 50, 500) == 25
+    assert size_in_bytes.batch_size(100, 99, 990) == 1